@@ -4,6 +4,7 @@ from ui import register_routes
 import os
 import threading
 import gc # 🛠️ RAM Management ke liye
+import memory_governor
 
 # Bot ki memory ko control mein rakhne ke liye Garbage Collection enable karein
 gc.enable()
@@ -19,6 +20,9 @@ bot = TalkinChatBot()
 # UI Routes ko Bot se connect karein
 register_routes(app, bot)
 
+# Hot path pe gc.collect() nahi - governor RSS dekh ke background me collect karta hai
+memory_governor.start()
+
 if __name__ == "__main__":
     # Port handling for Render or Local
     port = int(os.environ.get("PORT", 5000))
@@ -0,0 +1,575 @@
+"""
+Offline micro-benchmarks for the bot's hot paths.
+
+Usage: python bench.py <name> [<name> ...]   (no name = run everything)
+"""
+import io
+import os
+import sys
+import time
+import hashlib
+import contextlib
+import threading
+import tracemalloc
+import multiprocessing
+import http.server
+import concurrent.futures
+
+import utils
+import render_pool
+
+
+def _report(title, **vals):
+    utils.safe_print(f"[{title}] " + " | ".join(f"{k}={v}" for k, v in vals.items()))
+
+
+# --- FONTS: get_font under concurrent render threads ---
+def bench_fonts(threads=8, calls=20000):
+    utils.preload_fonts()
+    pairs = utils.PRELOAD_FONTS
+    start_evt = threading.Event()
+
+    def worker(seed):
+        start_evt.wait()
+        for i in range(calls):
+            name, size = pairs[(i + seed) % len(pairs)]
+            utils.get_font(name, size)
+
+    ts = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in ts: t.start()
+    t0 = time.perf_counter(); start_evt.set()
+    for t in ts: t.join()
+    elapsed = time.perf_counter() - t0
+    total = threads * calls
+    _report("fonts", threads=threads, calls=total, ns_per_call=int(elapsed / total * 1e9), **utils.font_stats())
+
+
+# --- RENDER: thread path vs process pool, renders/sec ---
+def sample_scenes():
+    """(renderer, scene, image kind) for every selectable renderer, no avatar downloads"""
+    ttt = render_pool._load_module("tictactoe")
+    sl = render_pool._load_module("snake_ladder")
+    spin = render_pool._load_module("spin")
+    stats = render_pool._load_module("stats")
+    mines = render_pool._load_module("mines_revenge")
+    pm = render_pool._load_module("image_pm")
+    return [
+        (ttt.draw_board, {'board': ["X", " ", "O", " ", "X", " ", " ", "O", " "]}, "flat"),
+        (ttt.draw_winner_card, {'name': "bench", 'av': "", 'sym': "X", 'amt': 500}, "photo"),
+        (sl.draw_board, {'pos': {"P1": 37, "P2": 64}, 'avatars': {"P1": "", "P2": ""}}, "photo"),
+        (sl.draw_winner, {'name': "bench", 'av': "", 'amt': 1000}, "photo"),
+        (spin.draw_wheel, {'result': 3, 'icon': ""}, "flat"),
+        (stats.draw_profile_card, {'name': "bench", 'icon': "", 'score': 12345, 'wins': 42, 'rank_pos': 7}, "photo"),
+        (mines.draw_board, {'board': ['C', 'B'] * 6, 'revealed': [True, False, False] * 4}, "flat"),
+        (pm.generate_image, {'sender': "bench", 'text': "hello " * 20, 'theme': 0}, "photo"),
+    ]
+
+def bench_render(rounds=6):
+    scenes = sample_scenes()
+    workers = os.cpu_count() or 2
+    jobs = scenes * rounds
+    results = {}
+    for backend in ("thread", "process"):
+        render_pool.RENDER_BACKEND = backend
+        render_pool.start()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as ex:
+            t0 = time.perf_counter()
+            list(ex.map(lambda j: render_pool.render(*j), jobs))
+            results[backend] = len(jobs) / (time.perf_counter() - t0)
+    render_pool.shutdown()
+    _report("render", cores=workers, renders=len(jobs),
+            thread_per_sec=round(results["thread"], 1), process_per_sec=round(results["process"], 1))
+
+
+# --- ENCODE: old quantize+progressive JPEG vs per-class encoder ---
+def _legacy_encode(image):
+    with io.BytesIO() as buf:
+        image.convert("RGB").quantize(colors=256).convert("RGB").save(buf, format='JPEG', quality=75, optimize=True, progressive=True)
+        return buf.getvalue()
+
+def _time_ms(fn, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat): out = fn()
+    return (time.perf_counter() - t0) / repeat * 1000, out
+
+def bench_encode(repeat=5):
+    for fn, scene, kind in sample_scenes():
+        img = fn(scene)
+        old_ms, old = _time_ms(lambda: _legacy_encode(img), repeat)
+        new_ms, new = _time_ms(lambda: utils.encode_image(img, kind), repeat)
+        _report("encode", renderer=render_pool.renderer_name(fn), kind=kind,
+                old_ms=round(old_ms, 1), old_bytes=len(old), new_ms=round(new_ms, 1), new_bytes=len(new),
+                fmt=utils.image_type(new)[0])
+
+
+# --- UPLOAD ROUTER: local stand-in hosts (slow / failing / fast) ---
+def stand_in_server(delay=0.0, status=200, reply=None):
+    """Local multipart upload host. Reply body = URL (ya `reply(body)` ka result)."""
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(delay)
+            out = (reply(body) if reply else f"http://stand-in/{len(body)}.png").encode()
+            self.send_response(status); self.send_header("Content-Length", str(len(out))); self.end_headers()
+            self.wfile.write(out)
+        def log_message(self, *args): pass
+    srv = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f"http://127.0.0.1:{srv.server_port}/upload"
+
+def bench_upload(images=20):
+    slow, slow_url = stand_in_server(delay=1.0)
+    broken, broken_url = stand_in_server(status=500)
+    fast, fast_url = stand_in_server(delay=0.02)
+    router = utils.UploadRouter([utils.FormBackend("slow", slow_url), utils.FormBackend("broken", broken_url),
+                                 utils.FormBackend("fast", fast_url)], hedge_ms=200)
+    served = {}
+    t0 = time.perf_counter()
+    for i in range(images):
+        url, backend = router.upload(b"\x89PNG" + bytes(2000 + i), f"bench_{i}.png", "image/png")
+        served[backend] = served.get(backend, 0) + 1
+    _report("upload", images=images, avg_ms=round((time.perf_counter() - t0) / images * 1000, 1), served=served)
+    for name, st in router.stats().items(): _report("upload", backend=name, **st)
+    for srv in (slow, broken, fast): srv.shutdown()
+
+
+def _serve_in_process(reply=None):
+    """stand_in_server alag process me, taaki uski allocations tracemalloc me na gini jayein"""
+    ctx = multiprocessing.get_context("fork")
+    parent, child = ctx.Pipe()
+    def run():
+        srv, url = stand_in_server(reply=reply)
+        child.send(url)
+        threading.Event().wait()
+    proc = ctx.Process(target=run, daemon=True)
+    proc.start()
+    return proc, parent.recv()
+
+def _file_part_sha1(body):
+    """multipart body se pehle file part ke bytes ka sha1 (stream sahi bana ya nahi)"""
+    part = body.split(b"\r\n\r\n", 1)[1].rsplit(b"\r\n--", 1)[0]
+    return f"http://stand-in/{hashlib.sha1(part).hexdigest()}"
+
+def _legacy_encode_bytes(image):
+    """Purana path: naya BytesIO -> getvalue() copy"""
+    with io.BytesIO() as buf:
+        utils.ENCODERS["photo"](image, buf, False)
+        return buf.getvalue()
+
+def _legacy_send(data, url):
+    """Purana path: MultipartEncoder(BytesIO(data)) - encoder apne buffers me copy karta hai"""
+    from requests_toolbelt.multipart.encoder import MultipartEncoder
+    body = MultipartEncoder(fields={"file": ("bench.jpg", io.BytesIO(data), "image/jpeg")})
+    text = utils.http_post(url, data=body, headers={"Content-Type": body.content_type}).text
+    return text.endswith(hashlib.sha1(data).hexdigest())
+
+def _pooled_send(enc, url):
+    with enc:
+        body = utils.MultipartStream({"file": ("bench.jpg", enc.view, "image/jpeg")})
+        text = utils.http_post(url, data=body, headers={"Content-Type": body.content_type}).text
+        return text.endswith(hashlib.sha1(enc.view).hexdigest())
+
+def _peak(fn, *args):
+    tracemalloc.reset_peak()
+    now = tracemalloc.get_traced_memory()[0]
+    out = fn(*args)
+    return out, tracemalloc.get_traced_memory()[1] - now
+
+def bench_alloc(uploads=30):
+    """tracemalloc: encode aur upload stage ka peak + bacha hua (retained) memory per upload,
+    legacy vs pooled buffer + memoryview stream. tracemalloc cumulative 'total allocated' nahi
+    deta, isliye peak + retained report hota hai."""
+    proc, url = _serve_in_process(reply=_file_part_sha1)
+    images = [fn(scene) for fn, scene, kind in sample_scenes() if kind == "photo"]
+    utils.ENCODE_BUDGET_MS = float("inf") # dono paths same encoder settings pe, fark sirf buffers ka
+    paths = [("pooled", lambda img: utils.encode_pooled(img, "photo"), _pooled_send)]
+    try:
+        import requests_toolbelt # noqa: F401 - sirf legacy comparison ke liye
+        paths.insert(0, ("legacy", _legacy_encode_bytes, _legacy_send))
+    except ImportError:
+        _report("alloc", legacy="skipped (requests-toolbelt not installed)")
+    try:
+        for name, encode, send in paths:
+            for img in images: send(encode(img), url) # warmup: sessions, pool buffers, encoder tables
+            enc_peaks, send_peaks, ok = [], [], 0
+            tracemalloc.start()
+            base = tracemalloc.get_traced_memory()[0]
+            for i in range(uploads):
+                data, p1 = _peak(encode, images[i % len(images)])
+                intact, p2 = _peak(send, data, url)
+                del data
+                enc_peaks.append(p1); send_peaks.append(p2); ok += intact
+            retained = tracemalloc.get_traced_memory()[0] - base
+            tracemalloc.stop()
+            _report(f"alloc {name}", uploads=uploads, intact=f"{ok}/{uploads}",
+                    encode_peak_kb=f"{sum(enc_peaks) / uploads / 1024:.1f}",
+                    upload_peak_kb=f"{sum(send_peaks) / uploads / 1024:.1f}",
+                    retained_kb_per_upload=f"{retained / uploads / 1024:.2f}")
+        _report("alloc pool", **utils.ENCODE_BUFFERS.stats)
+    finally:
+        proc.terminate()
+
+def _legacy_text_wrap(text, font, max_w):
+    """image_pm ka purana wrap: har naye word pe poori line dobara getlength()"""
+    lines = []; words = text.split(' ')
+    i = 0
+    while i < len(words):
+        line = ''
+        while i < len(words) and font.getlength(line + words[i]) <= max_w: line += words[i] + " "; i += 1
+        if not line: line = words[i]; i += 1
+        lines.append(line.strip())
+    return lines
+
+def bench_text(messages=50, length=500):
+    """500-char PMI messages: purana quadratic wrap vs text_layout (cold glyphs, warm glyphs, cached layout)"""
+    import random
+    import text_layout
+    rnd = random.Random(7)
+    vocab = ["hello", "yaar", "kya", "haal", "hai", "bhai", "game", "khelte", "hain", "aaj", "raat", "ko",
+             "https://example.com/some/really/long/link/that/never/wraps", "😂", "ok", "theek"]
+    def message():
+        words = []
+        while sum(len(w) + 1 for w in words) < length: words.append(rnd.choice(vocab))
+        return " ".join(words)[:length]
+    texts = [message() for _ in range(messages)]
+    W = 512 - 80
+    font = utils.get_font("arial.ttf", 48)
+    t0 = time.perf_counter()
+    for t in texts: _legacy_text_wrap(t, font, W)
+    legacy = (time.perf_counter() - t0) / messages * 1000
+    t0 = time.perf_counter()
+    text_layout.wrap(texts[0], "arial.ttf", 48, W)
+    cold = (time.perf_counter() - t0) * 1000
+    text_layout.LAYOUT_CACHE.clear()
+    t0 = time.perf_counter()
+    for t in texts: text_layout.wrap(t, "arial.ttf", 48, W)
+    warm = (time.perf_counter() - t0) / messages * 1000
+    t0 = time.perf_counter()
+    for t in texts: text_layout.wrap(t, "arial.ttf", 48, W)
+    cached = (time.perf_counter() - t0) / messages * 1000
+    t0 = time.perf_counter()
+    fitted = [text_layout.fit(t, "arial.ttf", W, 512 - 100, max_size=48, min_size=20) for t in texts]
+    fit_ms = (time.perf_counter() - t0) / messages * 1000
+    _report("text", messages=messages, chars=length, legacy_ms=f"{legacy:.2f}", first_ms=f"{cold:.2f}",
+            linear_ms=f"{warm:.3f}", cached_ms=f"{cached:.4f}", fit_ms=f"{fit_ms:.3f}",
+            fit_sizes=sorted({size for size, _ in fitted}))
+    pm = render_pool._load_module("image_pm")
+    scenes = [{"sender": "bench", "text": t, "theme": i % len(pm.THEMES)} for i, t in enumerate(texts[:10])]
+    ms, _ = _time_ms(lambda: [pm.generate_image(sc) for sc in scenes], repeat=1)
+    _report("text", generate_image_ms=f"{ms / len(scenes):.1f}", **text_layout.stats())
+
+def _legacy_cards():
+    """Template port se pehle wale imperative card drawers (avatar skip - network nahi chahiye)"""
+    from PIL import ImageDraw
+    stats = render_pool._load_module("stats")
+    def profile(card):
+        canvas = utils.create_canvas(600, 350, color=(17, 24, 39))
+        utils.draw_gradient_bg(canvas, (17, 24, 39), (31, 41, 55))
+        draw = ImageDraw.Draw(canvas)
+        rank_title, rank_color = stats.get_rank_info(card['score'])
+        f_stats, f_rank = utils.get_font("arial.ttf", 25), utils.get_font("arial.ttf", 22)
+        draw.text((260, 60), card['name'][:15], font=utils.get_font("arial.ttf", 40), fill="white")
+        draw.text((260, 110), rank_title, font=f_rank, fill=rank_color)
+        draw.text((260, 170), f"💰 Coins: {card['score']}", font=f_stats, fill="#e2e8f0")
+        draw.text((260, 210), f"🏆 Total Wins: {card['wins']}", font=f_stats, fill="#e2e8f0")
+        draw.text((260, 250), f"🌎 Global Rank: #{card['rank_pos']}", font=f_stats, fill=rank_color)
+        draw.rectangle([260, 300, 550, 315], fill="#374151")
+        draw.rectangle([260, 300, 260 + int(290 * min(1.0, card['score'] / 20000)), 315], fill=rank_color)
+        return canvas
+    def ttt_winner(info):
+        canvas = utils.create_canvas(500, 500, color=(17, 24, 39))
+        utils.draw_gradient_bg(canvas, (17, 24, 39), (60, 0, 60) if info['sym'] == "X" else (0, 60, 0))
+        draw = ImageDraw.Draw(canvas)
+        f_main, f_sub = utils.get_font("arial.ttf", 45), utils.get_font("arial.ttf", 25)
+        draw.text((250, 300), "🏆 WINNER 🏆", font=f_sub, fill=(200, 200, 200), anchor="mm")
+        draw.text((250, 345), info['name'], font=f_main, fill="white", anchor="mm")
+        draw.text((250, 390), f"💰 +{info['amt']} Coins", font=f_sub, fill=(44, 255, 255), anchor="mm")
+        return canvas
+    def sl_winner(info):
+        canvas = utils.create_canvas(400, 400, (17, 24, 39))
+        utils.draw_gradient_bg(canvas, (17, 24, 39), (20, 80, 20))
+        draw = ImageDraw.Draw(canvas)
+        f_m, f_s = utils.get_font("arial.ttf", 35), utils.get_font("arial.ttf", 20)
+        draw.text((200, 230), "👑 CHAMPION", font=f_s, fill="gold", anchor="mm")
+        draw.text((200, 275), info['name'], font=f_m, fill="white", anchor="mm")
+        draw.text((200, 320), f"Coins: +{info['amt']}", font=f_s, fill="cyan", anchor="mm")
+        return canvas
+    return {"stats.draw_profile_card": profile, "tictactoe.draw_winner_card": ttt_winner,
+            "snake_ladder.draw_winner": sl_winner}
+
+def bench_cards(repeat=20):
+    """Har card ka render time: purana imperative drawer vs card_template (first = static layer build)"""
+    import card_template
+    legacy = _legacy_cards()
+    for fn, scene, _ in sample_scenes():
+        name = render_pool.renderer_name(fn)
+        if name not in legacy: continue
+        old, _ = _time_ms(lambda: legacy[name](scene), repeat)
+        card_template.STATIC_CACHE.clear()
+        first, _ = _time_ms(lambda: fn(scene), 1)
+        new, _ = _time_ms(lambda: fn(scene), repeat)
+        _report("cards", card=name, legacy_ms=f"{old:.2f}", first_ms=f"{first:.2f}", template_ms=f"{new:.2f}",
+                speedup=f"{old / new:.1f}x")
+    _report("cards", **card_template.stats())
+
+@contextlib.contextmanager
+def local_avatars():
+    """Avatar fetch network maangta hai; bench me utils.http_get ek local gradient PNG deta hai"""
+    from PIL import Image
+    avatar = io.BytesIO()
+    Image.radial_gradient("L").convert("RGB").resize((128, 128)).save(avatar, format="PNG")
+    fetch = utils.http_get
+    utils.http_get = lambda url, **kw: type("R", (), {"status_code": 200, "content": avatar.getvalue()})()
+    try: yield
+    finally: utils.http_get = fetch
+
+def bench_spin(spins=16):
+    """Animated spin: frame bank build (ek baar), per-spin compose + GIF encode, static wheel se compare"""
+    spin = render_pool._load_module("spin")
+    t0 = time.perf_counter()
+    bank = spin.frame_bank()
+    build = (time.perf_counter() - t0) * 1000
+    with local_avatars():
+        compose, encode, sizes, frames = [], [], [], 0
+        for i in range(spins):
+            scene = {'result': i % len(spin.SEGMENTS), 'icon': f"http://avatar/{i}"}
+            ms, anim = _time_ms(lambda: spin.draw_spin_anim(scene), 1)
+            compose.append(ms); frames += len(anim)
+            t0 = time.perf_counter()
+            with utils.encode_pooled(anim, "anim") as enc: sizes.append(enc.view.nbytes)
+            encode.append((time.perf_counter() - t0) * 1000)
+        static_ms, img = _time_ms(lambda: spin.draw_wheel({'result': 3, 'icon': "http://avatar/x"}), 5)
+        static_bytes = len(utils.encode_image(img, "flat"))
+    _report("spin", bank_frames=len(bank["frames"]), bank_build_ms=f"{build:.0f}", frames_per_spin=f"{frames / spins:.1f}",
+            compose_ms=f"{sum(compose) / spins:.1f}", encode_ms=f"{sum(encode) / spins:.1f}",
+            gif_kb=f"{sum(sizes) / spins / 1024:.0f}", fast_encodes=utils.ENCODE_STATS["anim"]["fast"])
+    _report("spin", static_draw_ms=f"{static_ms:.1f}", static_kb=f"{static_bytes / 1024:.0f}",
+            anim_duration_ms=spin.anim_duration_ms(3))
+
+def bench_board(rolls=50):
+    """Snake board per roll: purana (copy + 2x avatar download/resize/mask) vs token sprites (copy + 2 paste)"""
+    sl = render_pool._load_module("snake_ladder")
+    def legacy(data):
+        canvas = utils.create_canvas(sl.B_SIZE, sl.B_SIZE, (30, 30, 30))
+        for p_num, color in sl.P_COLORS.items():
+            x, y = sl.get_coords(data['pos'][p_num], p_num, data['pos'])
+            utils.draw_circle_avatar(canvas, data['avatars'][p_num], x-14, y-14, 28, border_color=color, border_width=2)
+        return canvas
+    avatars = {"P1": "http://avatar/p1", "P2": "http://avatar/p2"}
+    scenes = [{'pos': {"P1": 1 + (i * 7) % 100, "P2": 1 + (i * 11) % 100}, 'avatars': avatars} for i in range(rolls)]
+    with local_avatars():
+        old, _ = _time_ms(lambda: [legacy(sc) for sc in scenes], 1)
+        t0 = time.perf_counter()
+        sl.prepare_tokens(avatars)
+        join = (time.perf_counter() - t0) * 1000
+        new, _ = _time_ms(lambda: [sl.draw_board(sc) for sc in scenes], 1)
+        trail, _ = _time_ms(lambda: [sl.draw_board(dict(sc, trails=[5, 97])) for sc in scenes], 1)
+    _report("board", rolls=rolls, legacy_ms=f"{old / rolls:.2f}", join_ms=f"{join:.1f}",
+            sprite_ms=f"{new / rolls:.2f}", with_trails_ms=f"{trail / rolls:.2f}", speedup=f"{old / new:.1f}x")
+
+def bench_ttt():
+    """Solved table: build/load time aur lookup speed (perfect bot kabhi nahi haarta: tests/test_ttt_solver.py)"""
+    import tempfile
+    import ttt_solver as ttt
+    path = os.path.join(tempfile.mkdtemp(), "ttt_table.bin")
+    ttt._loaded.clear()
+    t0 = time.perf_counter(); ttt.load(path); build = (time.perf_counter() - t0) * 1000
+    ttt._loaded.clear()
+    t0 = time.perf_counter(); ttt.load(path); load = (time.perf_counter() - t0) * 1000
+    code = ttt.encode(["X", "O", " ", " ", "X", " ", " ", " ", " "])
+    us, _ = _time_ms(lambda: [ttt.choose_move(code, "perfect") for _ in range(10000)], 1)
+    scan_us, _ = _time_ms(lambda: [ttt.optimal_moves(code) for _ in range(10000)], 1)
+    _report("ttt", build_ms=f"{build:.0f}", load_ms=f"{load:.2f}", table_bytes=os.path.getsize(path),
+            choose_move_us=f"{us / 10000 * 1000:.2f}", children_scan_us=f"{scan_us / 10000 * 1000:.2f}",
+            reachable=sum(v != ttt.UNREACHABLE for v in ttt.VALUE))
+
+@contextlib.contextmanager
+def local_uploads():
+    """Game benches me upload network/DB nahi: har image ko ek fake URL, scene cache sirf memory me"""
+    saved = utils.upload_bytes, utils.cached_url, utils.remember_url
+    urls = {}
+    utils.upload_bytes = lambda data, prefix="bot", room=None: f"http://bench.local/{prefix}.png"
+    utils.cached_url, utils.remember_url = urls.get, urls.__setitem__
+    try: yield
+    finally: utils.upload_bytes, utils.cached_url, utils.remember_url = saved
+
+@contextlib.contextmanager
+def scratch_db():
+    """Temp sqlite file - game benches ke results/checkpoints asli bot.db me nahi jaate"""
+    import tempfile
+    import db
+    import game_session as gs
+    saved = db.DATABASE_URL
+    db.DATABASE_URL = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bot.db")
+    db.init_db()
+    try: yield
+    finally:
+        gs.flush_checkpoints()
+        with db.db_lock: db.DATABASE_URL = saved # writer thread ka chal raha batch pehle khatam ho
+
+class _QuietBot:
+    def send_message(self, room, text): pass
+    def send_pm_message(self, user, text): pass
+    def send_image(self, room, url): pass
+    def log(self, text): pass
+
+def bench_sessions(games=2000, legacy_sample=2000):
+    """Hazaron mines setups ek saath: har player 3 plain-digit PMs bhejta hai, plugin_loader ->
+    game_session.route_pm (uid index). Legacy = har PM pe saare games scan (purana handle_pm)."""
+    import game_session as gs
+    import plugin_loader
+    bot = _QuietBot()
+    manager = plugin_loader.PluginManager(bot)
+    threads0 = threading.active_count()
+    with scratch_db(), local_uploads():
+        manager.load_plugin("mines_revenge")
+        mines = sys.modules["mines_revenge"]
+        t0 = time.perf_counter()
+        for i in range(games):
+            mines.handle_command(bot, "mines", f"room{i}", f"a{i}", [], {"user_id": f"a{i}"})
+            mines.handle_command(bot, "join", f"room{i}", f"b{i}", [], {"user_id": f"b{i}"})
+        setup_ms = (time.perf_counter() - t0) * 1000
+        live = gs.REGISTRY.all(mines.MinesRevengeGame.game)
+        msgs = [{"body": str(c), "from": f"{p}{i}"} for c in (1, 2, 3) for i in range(games) for p in "ab"]
+
+        # Legacy lookup: games me se sender dhoondo (sirf lookup, processing nahi)
+        sample = msgs[::max(1, len(msgs) // legacy_sample)]
+        t0 = time.perf_counter()
+        for m in sample: next(g for g in live if m["from"] in g.players.values())
+        legacy_us = (time.perf_counter() - t0) / len(sample) * 1e6
+
+        t0 = time.perf_counter()
+        for m in msgs: manager.process_private_message(m)
+        routed_us = (time.perf_counter() - t0) / len(msgs) * 1e6
+        playing = sum(g.status == "PLAYING" for g in live)
+        threads = threading.active_count() - threads0
+        for g in live:
+            with g.lock: g.end()
+    _report("sessions", games=games, pms=len(msgs), setup_ms=f"{setup_ms:.0f}", playing=playing,
+            legacy_lookup_us=f"{legacy_us:.1f}", routed_pm_us=f"{routed_us:.1f}", extra_threads=threads,
+            live_after=len(gs.REGISTRY))
+
+def bench_checkpoint(games=3000):
+    """Har move ke baad checkpoint ka cost, batch flush, aur "restart" ke baad bulk restore
+    (scratch sqlite file, asli DB ko haath nahi lagta)"""
+    import game_session as gs
+    ttt = render_pool._load_module("tictactoe")
+    cls, bot = ttt.TicTacToeGame, _QuietBot()
+    with scratch_db(), local_uploads():
+        for i in range(games):
+            uid, room = f"x{i}", f"room{i}"
+            for cmd, user, args in (("tic", uid, ["1"]), ("2", uid, []), ("2", uid, []), ("join", f"o{i}", [])):
+                ttt.handle_command(bot, cmd, room, user, args, {"user_id": user})
+        live = gs.REGISTRY.all(cls.game)
+        moves = [(s, cell) for cell in ("1", "2", "4", "5") for s in live]
+
+        t0 = time.perf_counter()
+        for s, cell in moves: s.handle(cell, s.players[s.turn])
+        move_us = (time.perf_counter() - t0) / len(moves) * 1e6
+        t0 = time.perf_counter()
+        for s in live:
+            with s.lock: s.checkpoint()
+        checkpoint_us = (time.perf_counter() - t0) / len(live) * 1e6
+        t0 = time.perf_counter(); gs.flush_checkpoints(); flush_ms = (time.perf_counter() - t0) * 1000
+
+        # "Restart": naya registry, purane sessions ke timers band
+        for s in live: s.cancel_timer()
+        old_registry, gs.REGISTRY = gs.REGISTRY, gs.SessionRegistry()
+        t0 = time.perf_counter()
+        restored = gs.restore(bot, cls)
+        restore_ms = (time.perf_counter() - t0) * 1000
+        armed = sum(s.timer is not None for s in gs.REGISTRY.all(cls.game)) # bot offline: sab park
+        t0 = time.perf_counter()
+        resumed = sum(gs.resume_room(f"room{i}") for i in range(games)) # login + rejoin ke baad
+        resume_ms = (time.perf_counter() - t0) * 1000
+        for s in gs.REGISTRY.all():
+            with s.lock: s.end()
+        gs.REGISTRY = old_registry
+        for s in live:
+            with s.lock: s.end()
+    _report("checkpoint", games=games, moves=len(moves), move_us=f"{move_us:.1f}", checkpoint_us=f"{checkpoint_us:.1f}",
+            flush_ms=f"{flush_ms:.0f}", restore_ms=f"{restore_ms:.0f}", resume_ms=f"{resume_ms:.0f}", restored=restored,
+            armed_before_rejoin=armed, resumed=resumed, coalesced=gs.CHECKPOINT_STATS["coalesced"])
+
+def bench_music(clients=50):
+    """music_resolver vs local stand-in converter (200ms): same gaane ke 50 saath-saath !play -> 1 upstream
+    call, repeat = cache hit (done Future), 'nahi mila' bhi ek hi baar upstream jata hai"""
+    import json
+    import music_resolver as mr
+    calls = []
+    def reply(body):
+        query = json.loads(body)["query"]
+        calls.append(query)
+        if "nomatch" in query: return json.dumps({"success": False, "error": "Song nahi mila"})
+        return json.dumps({"success": True, "video_id": "dQw4w9WgXcQ", "audio_url": f"http://stand-in/{len(calls)}.mp3",
+                           "card_url": "http://stand-in/card.png"})
+    srv, url = stand_in_server(delay=0.2, reply=reply)
+    saved = mr.CONVERTER_URL, mr.RESOLVERS
+    mr.CONVERTER_URL, mr.RESOLVERS = url, [mr.convert]
+    mr.MUSIC_CACHE.clear()
+    try:
+        variants = ["Tum Hi Ho", "tum hi ho", "  TUM hi HO!! ", "tum  hi ho."]
+        t0 = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(clients) as ex:
+            futs = list(ex.map(mr.resolve_async, [variants[i % len(variants)] for i in range(clients)]))
+        tracks = {f.result(timeout=10) for f in futs}
+        cold_ms = (time.perf_counter() - t0) * 1000
+        cold_calls = len(calls)
+
+        t0 = time.perf_counter()
+        for _ in range(1000): mr.resolve_async("Tum Hi Ho")
+        hit_us = (time.perf_counter() - t0) * 1000
+
+        for _ in range(3):
+            with contextlib.suppress(mr.NotFound): mr.resolve("nomatch song", timeout=10)
+    finally:
+        mr.CONVERTER_URL, mr.RESOLVERS = saved
+        srv.shutdown()
+    _report("music", clients=clients, cold_calls=cold_calls, tracks=len(tracks), upstream_calls=len(calls),
+            cold_ms=f"{cold_ms:.0f}", hit_us=f"{hit_us:.2f}",
+            **{k: v for k, v in mr.stats().items() if k in ("coalesced", "hits", "negative_hits", "not_found")})
+
+def bench_playlist(songs=5, track_sec=0.5):
+    """!play x5 ek room me, converter 300ms: pehla gaana cold, baaki current bajte waqt prefetch ho jaate
+    hain -> track khatam hone se agle audio tak ka gap ~0 (bina prefetch har transition pe ~300ms)"""
+    import json
+    import music_resolver as mr
+    import plugin_loader
+    audio = []
+    class Bot(_QuietBot):
+        def send_audio(self, room, url): audio.append(time.perf_counter())
+    def reply(body):
+        query = json.loads(body)["query"]
+        return json.dumps({"success": True, "video_id": "dQw4w9WgXcQ", "audio_url": f"http://stand-in/{query}.mp3",
+                           "card_url": "http://stand-in/card.png", "duration": track_sec})
+    srv, url = stand_in_server(delay=0.3, reply=reply)
+    saved = mr.CONVERTER_URL, mr.RESOLVERS
+    mr.CONVERTER_URL, mr.RESOLVERS = url, [mr.convert]
+    mr.MUSIC_CACHE.clear()
+    bot = Bot()
+    try:
+        plugin_loader.PluginManager(bot).load_plugin("music")
+        music = sys.modules["music"]
+        t0 = time.perf_counter()
+        for i in range(songs): music.handle_command(bot, "play", "room", f"u{i}", ["bench", f"song{i}"], {})
+        deadline = time.time() + songs * (track_sec + 1) + 5
+        while "room" in music.PLAYLISTS and time.time() < deadline: time.sleep(0.05)
+    finally:
+        mr.CONVERTER_URL, mr.RESOLVERS = saved
+        srv.shutdown()
+    # TIMERS track_sec baad agla shuru karta hai: us se upar jo bhi laga wo resolve ka wait hai
+    gaps = [(b - a - track_sec) * 1000 for a, b in zip(audio, audio[1:])] or [0.0]
+    _report("playlist", songs=songs, played=len(audio), first_ms=f"{(audio[0] - t0) * 1000:.0f}" if audio else "-",
+            max_gap_ms=f"{max(gaps):.1f}", avg_gap_ms=f"{sum(gaps) / len(gaps):.1f}", cache_hits=mr.MUSIC_STATS["hits"])
+
+BENCHES = {"fonts": bench_fonts, "render": bench_render, "encode": bench_encode, "upload": bench_upload,
+           "alloc": bench_alloc, "text": bench_text,
+           "cards": bench_cards, "spin": bench_spin,
+           "board": bench_board, "ttt": bench_ttt,
+           "sessions": bench_sessions, "checkpoint": bench_checkpoint, "music": bench_music,
+           "playlist": bench_playlist}
+
+if __name__ == "__main__":
+    for name in (sys.argv[1:] or list(BENCHES)):
+        BENCHES[name]()
@@ -6,6 +6,8 @@ import uuid
 import ssl
 from plugin_loader import PluginManager
 from db import init_db
+import utils
+import game_session
 
 # ✅ URL FIXED: Added /server back
 WS_URL = "wss://chatp.net:5333/server"
@@ -20,6 +22,9 @@ class TalkinChatBot:
         self.start_time = time.time()
         self.room_details = {} 
         init_db()
+        utils.load_url_cache() # hosted image URLs RAM me, uploads ke time DB lookup nahi
+        # Fonts pehle se load kar lo taaki pehla board render fast ho
+        threading.Thread(target=utils.preload_fonts, daemon=True).start()
         self.plugins = PluginManager(self)
         self.log("Bot Initialized. Ready.")
 
@@ -33,6 +38,7 @@ class TalkinChatBot:
 
     def login_api(self, username, password):
         self.user_data = {"username": username, "password": password}
+        utils.set_upload_identity(username)
         self.log(f"Credentials stored. ready to connect.")
         return True, "Starting..."
 
@@ -99,6 +105,8 @@ class TalkinChatBot:
                     self.disconnect() # Stop on bad password
 
             elif handler == "room_event":
+                # Restart ke baad restored games yahan se chalu (bot ab sach me room me hai)
+                if data.get("room"): game_session.resume_room(data["room"])
                 self.plugins.process_message(data)
                 
                 room_name = data.get("room")
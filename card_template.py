@@ -0,0 +1,98 @@
+import string
+import threading
+from collections import OrderedDict
+
+from PIL import ImageDraw
+
+import utils
+import text_layout
+
+# ==========================================
+# 🃏 CARD TEMPLATES
+# ==========================================
+# Card = data: `static` layers (gradient, labels, bar background) ek baar raster hote hain aur
+# cache rehte hain; `fields` (naam, avatar, coins, progress) har request pe unke upar bante hain.
+# Kisi bhi element me "$key" value = values[key]; "format" = str.format(**values).
+# Static layer agar "$key" use kare (e.g. X/O glow) to har alag value ka apna cached layer banta hai.
+MAX_STATIC_LAYERS = 32
+STATIC_CACHE = OrderedDict()
+TEMPLATE_STATS = {"static_hits": 0, "static_builds": 0}
+_static_lock = threading.Lock()
+
+def _refs(elements):
+    """Static layers kaunsi values pe depend karte hain (cache key ke liye)"""
+    keys = set()
+    for el in elements:
+        for v in el.values():
+            if isinstance(v, str) and v.startswith("$"): keys.add(v[1:])
+        if "format" in el: keys.update(f for _, f, _, _ in string.Formatter().parse(el["format"]) if f)
+    return tuple(sorted(keys))
+
+def _val(v, values):
+    return values[v[1:]] if isinstance(v, str) and v.startswith("$") else v
+
+class CardTemplate:
+    def __init__(self, name, size, static=(), fields=(), bg=(0, 0, 0)):
+        self.name, self.size, self.bg = name, size, bg
+        self.static, self.fields = list(static), list(fields)
+        self.static_keys = _refs(self.static)
+
+    def base(self, values):
+        """Static layers ka cached raster (read-only - copy karke draw karo)"""
+        key = (self.name,) + tuple(_val("$" + k, values) for k in self.static_keys)
+        with _static_lock:
+            img = STATIC_CACHE.get(key)
+            if img is not None:
+                STATIC_CACHE.move_to_end(key) # LRU: jo layers chal rahe games use kar rahe, wo evict na hon
+                TEMPLATE_STATS["static_hits"] += 1
+                return img
+        img = utils.create_canvas(*self.size, color=self.bg)
+        draw = ImageDraw.Draw(img)
+        for el in self.static: _draw(img, draw, el, values)
+        with _static_lock:
+            TEMPLATE_STATS["static_builds"] += 1
+            STATIC_CACHE[key] = img
+            while len(STATIC_CACHE) > MAX_STATIC_LAYERS: STATIC_CACHE.popitem(last=False)
+        return img
+
+    def render(self, values):
+        canvas = self.base(values).copy()
+        draw = ImageDraw.Draw(canvas)
+        for el in self.fields: _draw(canvas, draw, el, values)
+        return canvas
+
+# ==========================================
+# 🖌️ ELEMENTS
+# ==========================================
+def _text(canvas, draw, el, values):
+    text = el["format"].format(**values) if "format" in el else str(_val(el.get("text", ""), values))
+    font_name, size = el.get("font", ("arial.ttf", 20))
+    if "max_w" in el: # lamba naam -> chhota font, phir '…'
+        size, text = text_layout.fit_line(text, font_name, el["max_w"], max_size=size, min_size=el.get("min_size", size))
+    draw.text(el["xy"], text, font=utils.get_font(font_name, size), fill=_val(el.get("fill", "white"), values),
+              anchor=el.get("anchor", "la"))
+
+def _gradient(canvas, draw, el, values):
+    utils.draw_gradient_bg(canvas, _val(el["start"], values), _val(el["end"], values))
+
+def _rect(canvas, draw, el, values):
+    if el.get("radius"): draw.rounded_rectangle(el["box"], el["radius"], fill=_val(el["fill"], values))
+    else: draw.rectangle(el["box"], fill=_val(el["fill"], values))
+
+def _bar(canvas, draw, el, values):
+    x0, y0, x1, y1 = el["box"]
+    progress = max(0.0, min(1.0, float(_val(el["value"], values))))
+    draw.rectangle([x0, y0, x0 + int((x1 - x0) * progress), y1], fill=_val(el["fill"], values))
+
+def _avatar(canvas, draw, el, values):
+    x, y = el["xy"]
+    utils.draw_circle_avatar(canvas, _val(el["url"], values), x, y, el["size"],
+                             border_color=_val(el.get("border", "white"), values), border_width=el.get("border_width", 0))
+
+ELEMENTS = {"text": _text, "gradient": _gradient, "rect": _rect, "bar": _bar, "avatar": _avatar}
+
+def _draw(canvas, draw, el, values):
+    ELEMENTS[el["type"]](canvas, draw, el, values)
+
+def stats():
+    return dict(TEMPLATE_STATS, layers=len(STATIC_CACHE))
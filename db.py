@@ -7,6 +7,12 @@ from urllib.parse import urlparse
 # Database URL (Render par ye automatic Postgres URL uthayega)
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///bot.db")
 db_lock = threading.Lock()
+# add_game_result commit hone ke baad har listener ko (user_id, new_score, amount) milta hai.
+# Naam se register hota hai taaki plugin reload pe duplicate na bane.
+RESULT_LISTENERS = {}
+
+def on_result(name, fn):
+    RESULT_LISTENERS[name] = fn
 
 def get_connection():
     if DATABASE_URL.startswith("postgres"):
@@ -22,7 +28,8 @@ def get_connection():
                 port=result.port
             )
     else:
-        return sqlite3.connect("bot.db", check_same_thread=False)
+        # "sqlite:///bot.db" -> bot.db (bench/local runs alag file de sakte hain)
+        return sqlite3.connect(DATABASE_URL.split("sqlite:///", 1)[-1], check_same_thread=False)
 
 def init_db():
     """Bot shuru hote hi tables create karta hai"""
@@ -32,21 +39,36 @@ def init_db():
         
         # 1. Users Table (Global Score & Wins)
         cur.execute("CREATE TABLE IF NOT EXISTS users (user_id TEXT PRIMARY KEY, username TEXT, global_score INTEGER DEFAULT 0, wins INTEGER DEFAULT 0)")
+        # Purane DB me avatar column nahi tha (leaderboard image ke liye chahiye)
+        if DATABASE_URL.startswith("postgres"):
+            cur.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS avatar TEXT")
+        else:
+            cur.execute("PRAGMA table_info(users)")
+            if "avatar" not in [r[1] for r in cur.fetchall()]: cur.execute("ALTER TABLE users ADD COLUMN avatar TEXT")
         
         # 2. Game Stats Table (Game wise record)
         cur.execute("CREATE TABLE IF NOT EXISTS game_stats (user_id TEXT, game_name TEXT, wins INTEGER DEFAULT 0, earnings INTEGER DEFAULT 0, PRIMARY KEY (user_id, game_name))")
         
         # 3. Admins Table
         cur.execute("CREATE TABLE IF NOT EXISTS bot_admins (user_id TEXT PRIMARY KEY)")
+
+        # 4. Uploaded Image Cache (content/scene hash -> hosted URL)
+        cur.execute("CREATE TABLE IF NOT EXISTS image_cache (hash TEXT PRIMARY KEY, url TEXT, created INTEGER)")
+        cur.execute("CREATE INDEX IF NOT EXISTS image_cache_created ON image_cache (created)")
+
+        # 5. Live game session checkpoints (restart pe games wapas, game_session.restore)
+        cur.execute("CREATE TABLE IF NOT EXISTS session_checkpoints (sid TEXT PRIMARY KEY, game TEXT, room TEXT, state TEXT, updated INTEGER)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_session_checkpoints_game ON session_checkpoints (game)")
         
         conn.commit()
         conn.close()
         print("[DB] Tables Initialized (Howdies Style).")
 
-def add_game_result(user_id, username, game_name, amount, is_win=False):
-    """Coins aur Wins update karne ka Master Function"""
+def add_game_result(user_id, username, game_name, amount, is_win=False, avatar=None):
+    """Coins aur Wins update karne ka Master Function (avatar mile to wo bhi save, leaderboard ke liye)"""
     if not user_id or user_id == "BOT": return
 
+    new_score = None
     with db_lock:
         try:
             conn = get_connection()
@@ -64,6 +86,8 @@ def add_game_result(user_id, username, game_name, amount, is_win=False):
                 cur.execute(f"INSERT OR IGNORE INTO users (user_id, username, global_score, wins) VALUES ({ph}, {ph}, 0, 0)", (uid, username))
             
             cur.execute(f"UPDATE users SET global_score = global_score + {ph}, wins = wins + {ph} WHERE user_id = {ph}", (amount, win_count, uid))
+            if avatar:
+                cur.execute(f"UPDATE users SET avatar = {ph} WHERE user_id = {ph}", (avatar, uid))
 
             # --- 2. Game Specific Update ---
             if is_postgres:
@@ -73,11 +97,19 @@ def add_game_result(user_id, username, game_name, amount, is_win=False):
             
             cur.execute(f"UPDATE game_stats SET wins = wins + {ph}, earnings = earnings + {ph} WHERE user_id = {ph} AND game_name = {ph}", (win_count, amount, uid, game_name))
 
+            cur.execute(f"SELECT global_score FROM users WHERE user_id = {ph}", (uid,))
+            new_score = cur.fetchone()[0]
             conn.commit()
             conn.close()
         except Exception as e:
             print(f"[DB ERROR] add_game_result: {e}")
 
+    # Lock ke bahar, taaki listener khud DB padh sake
+    if new_score is None: return
+    for name, fn in list(RESULT_LISTENERS.items()):
+        try: fn(str(user_id), new_score, amount)
+        except Exception as e: print(f"[DB ERROR] result listener {name}: {e}")
+
 # --- ADMIN MANAGEMENT ---
 
 def add_admin(user_id):
@@ -116,3 +148,73 @@ def get_all_admins():
             conn.close()
             return rows
         except: return []
+
+# --- UPLOADED IMAGE CACHE ---
+
+def load_cached_urls(since, limit):
+    """[(hash, url, created)] - startup pe ek query, sabse naye `limit` rows jo `since` ke baad bane"""
+    with db_lock:
+        try:
+            conn = get_connection(); cur = conn.cursor()
+            ph = "%s" if DATABASE_URL.startswith("postgres") else "?"
+            cur.execute(f"SELECT hash, url, created FROM image_cache WHERE created > {ph} ORDER BY created DESC LIMIT {ph}", (since, limit))
+            rows = cur.fetchall()
+            conn.close()
+            return rows
+        except Exception as e:
+            print(f"[DB ERROR] load_cached_urls: {e}")
+            return []
+
+def save_cached_urls(rows, deleted=()):
+    """rows = [(hash, url, created)], deleted = [hash]. Ek transaction, batch me -> True/False"""
+    with db_lock:
+        try:
+            conn = get_connection(); cur = conn.cursor()
+            is_postgres = DATABASE_URL.startswith("postgres")
+            ph = "%s" if is_postgres else "?"
+            if rows:
+                if is_postgres:
+                    cur.executemany(f"INSERT INTO image_cache (hash, url, created) VALUES ({ph}, {ph}, {ph}) ON CONFLICT (hash) DO UPDATE SET url = EXCLUDED.url, created = EXCLUDED.created", rows)
+                else:
+                    cur.executemany(f"INSERT OR REPLACE INTO image_cache (hash, url, created) VALUES ({ph}, {ph}, {ph})", rows)
+            if deleted:
+                cur.executemany(f"DELETE FROM image_cache WHERE hash = {ph}", [(key,) for key in deleted])
+            conn.commit(); conn.close()
+            return True
+        except Exception as e:
+            print(f"[DB ERROR] save_cached_urls: {e}")
+            return False
+
+def save_checkpoints(rows, deleted=()):
+    """rows = [(sid, game, room, state, updated)], deleted = [sid]. Ek transaction, batch me -> True/False"""
+    with db_lock:
+        try:
+            conn = get_connection(); cur = conn.cursor()
+            is_postgres = DATABASE_URL.startswith("postgres")
+            ph = "%s" if is_postgres else "?"
+            if rows:
+                if is_postgres:
+                    cur.executemany(f"INSERT INTO session_checkpoints (sid, game, room, state, updated) VALUES ({ph}, {ph}, {ph}, {ph}, {ph}) ON CONFLICT (sid) DO UPDATE SET state = EXCLUDED.state, updated = EXCLUDED.updated", rows)
+                else:
+                    cur.executemany(f"INSERT OR REPLACE INTO session_checkpoints (sid, game, room, state, updated) VALUES ({ph}, {ph}, {ph}, {ph}, {ph})", rows)
+            if deleted:
+                cur.executemany(f"DELETE FROM session_checkpoints WHERE sid = {ph}", [(sid,) for sid in deleted])
+            conn.commit(); conn.close()
+            return True
+        except Exception as e:
+            print(f"[DB ERROR] save_checkpoints: {e}")
+            return False
+
+def load_checkpoints(game):
+    """[(sid, room, state, updated)] - ek game ke saare live sessions, ek query me"""
+    with db_lock:
+        try:
+            conn = get_connection(); cur = conn.cursor()
+            ph = "%s" if DATABASE_URL.startswith("postgres") else "?"
+            cur.execute(f"SELECT sid, room, state, updated FROM session_checkpoints WHERE game = {ph}", (game,))
+            rows = cur.fetchall()
+            conn.close()
+            return rows
+        except Exception as e:
+            print(f"[DB ERROR] load_checkpoints: {e}")
+            return []
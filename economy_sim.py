@@ -0,0 +1,150 @@
+"""
+Offline economy simulator: spin / snake & ladder / tictactoe payouts ka RTP, variance,
+game length aur har game me kitne coins economy me naye aate hain (inflation).
+
+Game tables (SEGMENTS, LADDERS, SNAKES, ttt solved table) asli plugins se aate hain, to
+payout badalte hi yahi chala ke dekh lo. NumPy chahiye (sirf is tool ke liye, bot ko nahi): pip install -r requirements-dev.txt
+
+Usage: python economy_sim.py [--games N] [--bet B] [--seed S] [spin] [snake] [ttt]
+"""
+import sys
+import time
+import argparse
+
+import numpy as np
+
+import render_pool
+import ttt_solver
+
+# Payouts jo plugins ke andar hardcoded hain (yahan se padhe nahi ja sakte)
+SNAKE_SINGLE_REWARD = 1000 # snake_ladder.finalize: single mode me P1 jeete to
+TTT_SINGLE_REWARD = 500 # tictactoe.end_game: single mode me human jeete to
+MAX_TURNS = 1000 # snake game isse lamba chale to cut (practically kabhi nahi)
+
+
+def _report(title, **vals):
+    print(f"[{title}] " + " | ".join(f"{k}={v}" for k, v in vals.items()))
+
+def _stats(title, net, length, bet=None, **extra):
+    """net = har game me player ka coin change (= economy me naye coins, house bot hai)"""
+    vals = {"games": f"{len(net):,}"}
+    if bet: vals["rtp"] = f"{(net.mean() + bet) / bet:.4f}"
+    vals.update(mean_net=f"{net.mean():+.2f}", std=f"{net.std():.1f}", variance=f"{net.var():.0f}",
+                avg_len=f"{length.mean():.2f}", p95_len=f"{np.percentile(length, 95):.0f}",
+                inflation_per_game=f"{net.mean():+.2f}", **extra)
+    _report(title, **vals)
+
+# ==========================================
+# 🎡 SPIN
+# ==========================================
+def sim_spin(games, bet, rng):
+    spin = render_pool._load_module("spin")
+    mult = np.array([m for m, _, _ in spin.SEGMENTS])
+    res = rng.integers(0, len(mult), games) # random.randint(0, len-1)
+    win_amt = np.floor(bet * mult[res]) # int(self.bet * multiplier)
+    net = win_amt - bet # jackpot: win-bet, partial: -(bet-win), RIP: -bet, neutral: 0
+    _stats("spin", net, np.ones(games), bet=bet,
+           p_profit=f"{(net > 0).mean():.3f}", segments=len(mult))
+
+# ==========================================
+# 🐍 SNAKE & LADDER (single player vs bot)
+# ==========================================
+def sim_snake(games, rng):
+    sl = render_pool._load_module("snake_ladder")
+    # square -> final square (ladder/snake apply), 101..106 = overshoot (exact 100 chahiye)
+    jump = np.arange(107)
+    for a, b in {**sl.LADDERS, **sl.SNAKES}.items(): jump[a] = b
+
+    def step(pos):
+        new = pos + rng.integers(1, 7, len(pos))
+        return np.where(new > 100, pos, jump[np.minimum(new, 106)])
+
+    p1 = np.ones(games, dtype=np.int16); p2 = np.ones(games, dtype=np.int16)
+    winner = np.zeros(games, dtype=np.int8) # 1 = player, 2 = bot
+    turns = np.zeros(games, dtype=np.int32)
+    live = np.arange(games)
+    for t in range(1, MAX_TURNS + 1):
+        if not len(live): break
+        a = step(p1[live]); p1[live] = a
+        done1 = a == 100
+        winner[live[done1]] = 1; turns[live[done1]] = t
+        rest = live[~done1]
+        b = step(p2[rest]); p2[rest] = b
+        done2 = b == 100
+        winner[rest[done2]] = 2; turns[rest[done2]] = t
+        live = rest[~done2]
+    turns[live] = MAX_TURNS
+    net = np.where(winner == 1, SNAKE_SINGLE_REWARD, 0).astype(np.float64)
+    _stats("snake single", net, turns, p_player_win=f"{(winner == 1).mean():.3f}",
+           unfinished=len(live), ladders=len(sl.LADDERS), snakes=len(sl.SNAKES))
+    _report("snake multi", note="bet winner<->loser transfer, zero-sum: inflation_per_game=+0.00")
+
+# ==========================================
+# ⭕ TICTACTOE (single player vs bot, solved table se)
+# ==========================================
+def _ttt_tables():
+    ttt_solver.load()
+    winner = np.frombuffer(bytes(ttt_solver.WINNER), dtype=np.uint8)
+    codes = np.arange(ttt_solver.N_CODES)
+    digits = (codes[:, None] // np.array(ttt_solver.POW3)) % 3
+    legal = digits == 0
+    optimal = np.zeros_like(legal)
+    for code in np.nonzero(np.frombuffer(bytes(ttt_solver.VALUE), dtype=np.uint8) != ttt_solver.UNREACHABLE)[0]:
+        if not winner[code]: optimal[code, ttt_solver.optimal_moves(int(code))] = True
+    return winner, legal, optimal
+
+def sim_ttt(games, rng):
+    winner_t, legal_t, optimal_t = _ttt_tables()
+    pow3 = np.array(ttt_solver.POW3)
+
+    def pick(codes, mask_t):
+        # Allowed cells me se uniform random: random score * mask ka argmax
+        return np.argmax(rng.random((len(codes), 9)) * mask_t[codes], axis=1)
+
+    human_policies = {"random": legal_t, "perfect": optimal_t}
+    for human, human_mask in human_policies.items():
+        for level, p_best in ttt_solver.DIFFICULTIES.items():
+            code = np.zeros(games, dtype=np.int64)
+            length = np.zeros(games, dtype=np.int32)
+            result = np.zeros(games, dtype=np.uint8)
+            live = np.arange(games)
+            for ply in range(9):
+                if not len(live): break
+                c = code[live]
+                if ply % 2 == 0: # human = X
+                    move = pick(c, human_mask)
+                else: # bot = O: p_best games me optimal chaal, baaki random
+                    move = np.empty(len(c), dtype=np.int64)
+                    smart = rng.random(len(c)) < p_best
+                    if smart.any(): move[smart] = pick(c[smart], optimal_t)
+                    if not smart.all(): move[~smart] = pick(c[~smart], legal_t)
+                c = c + (1 + ply % 2) * pow3[move]
+                code[live] = c; length[live] = ply + 1
+                w = winner_t[c]
+                result[live] = w
+                live = live[w == 0]
+            net = np.where(result == 1, TTT_SINGLE_REWARD, 0).astype(np.float64)
+            _stats(f"ttt {human} vs {level}", net, length, p_human_win=f"{(result == 1).mean():.3f}",
+                   p_draw=f"{(result == 3).mean():.3f}", p_bot_win=f"{(result == 2).mean():.3f}")
+
+SIMS = {"spin": lambda a, rng: sim_spin(a.games, a.bet, rng),
+        "snake": lambda a, rng: sim_snake(a.games, rng),
+        "ttt": lambda a, rng: sim_ttt(a.games, rng)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo payout simulator")
+    parser.add_argument("sims", nargs="*", help=f"kaunse games ({', '.join(SIMS)}), khali = sab")
+    parser.add_argument("--games", type=int, default=1_000_000)
+    parser.add_argument("--bet", type=int, default=100, help="spin bet amount")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+    unknown = set(args.sims) - set(SIMS)
+    if unknown: parser.error(f"unknown sim: {', '.join(sorted(unknown))}")
+    rng = np.random.default_rng(args.seed)
+    for name in args.sims or list(SIMS):
+        t0 = time.perf_counter()
+        SIMS[name](args, rng)
+        _report(name, seconds=f"{time.perf_counter() - t0:.2f}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
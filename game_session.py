@@ -0,0 +1,532 @@
+import os
+import json
+import time
+import uuid
+import heapq
+import itertools
+import threading
+import concurrent.futures
+from collections import Counter, OrderedDict, deque
+
+import db
+import render_pool
+import memory_governor
+
+# ==========================================
+# 🎲 GAME SESSIONS
+# ==========================================
+# Har room game ek GameSession subclass hai. Base class deti hai:
+#  - state machine: `status` + TRANSITIONS = {state: {allowed next states}}, input `on_<status>()` pe jata hai
+#  - timer: reset_timer(sec, reason) -> on_timeout(reason), lock ke andar, khatam game pe kabhi nahi.
+#    Saare sessions ka ek hi scheduler thread (heap) - hazaron games = hazaron Timer threads nahi
+#  - show(): RenderSlot (latest wins) + latency budget + text fallback, sab games ke liye ek hi pipeline
+#  - settle(): DB result writes settle_executor pe, dispatch thread kabhi DB pe nahi rukta
+#  - end(): idempotent - timer band, registry se bahar, memory hint
+#  - checkpoint: har handled move ke baad CHECKPOINT_FIELDS ka JSON snapshot queue me; ek writer thread
+#    batch me session_checkpoints table me likhta hai, plugin setup() pe restore() sab wapas la deta hai,
+#    timers/on_restore bot ke room rejoin (resume_room) tak park
+# Naya game = subclass + on_start() + har state ka on_<state>() + handle_command me REGISTRY.start().
+# Ek room me ek game ke kai sessions chal sakte hain: input player ke apne session pe jata hai
+# ((room, game, uid) index), `join` us game ke sabse naye WAITING session pe.
+# PM input (mines traps wagairah): PM_STATES me session uid -> session index me aata hai, route_pm() O(1).
+ENDED = "ENDED"
+MAX_SESSIONS_PER_ROOM = int(os.environ.get("MAX_SESSIONS_PER_ROOM", 20)) # busy lobby bhi bounded rahe
+
+settle_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="session-settle")
+timeout_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="session-timeout")
+SESSION_STATS = {"started": 0, "ended": 0, "timeouts": 0, "settled": 0, "settle_errors": 0, "late_images": 0,
+                 "pm_routed": 0}
+
+def player(data, user):
+    """(uid, avatar) - platforms avatar alag keys me bhejte hain"""
+    return str(data.get("user_id", user)), data.get("avatar_url", data.get("icon", data.get("avatar", "")))
+
+def _settle(game, fn, args, kwargs):
+    try:
+        fn(*args, **kwargs)
+        SESSION_STATS["settled"] += 1
+    except Exception as e:
+        SESSION_STATS["settle_errors"] += 1
+        print(f"[{game}] Settle Error: {e}")
+
+# ==========================================
+# ⏰ TIMERS (ek thread, min-heap)
+# ==========================================
+class _Scheduler:
+    """entry = [due (monotonic), seq, fn, args]. cancel() sirf fn hatata hai (lazy delete) -
+    entry apne time pe heap se nikal ke chup-chaap drop ho jati hai."""
+    def __init__(self):
+        self.heap = []
+        self.cond = threading.Condition()
+        self.seq = itertools.count()
+        self.thread = None
+
+    def schedule(self, seconds, fn, *args):
+        entry = [time.monotonic() + seconds, next(self.seq), fn, args]
+        with self.cond:
+            heapq.heappush(self.heap, entry)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True, name="session-timers")
+                self.thread.start()
+            if self.heap[0] is entry: self.cond.notify()
+        return entry
+
+    @staticmethod
+    def cancel(entry):
+        entry[2] = None
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.heap or self.heap[0][0] > time.monotonic():
+                    self.cond.wait(self.heap[0][0] - time.monotonic() if self.heap else None)
+                _, _, fn, args = heapq.heappop(self.heap)
+            # Handler (lock + messages) worker pe, taaki ek slow timeout baaki timers ko na roke
+            if not fn: continue
+            try: timeout_executor.submit(fn, *args)
+            except RuntimeError: return # interpreter band ho raha hai
+
+    def __len__(self):
+        return len(self.heap)
+
+TIMERS = _Scheduler()
+
+# ==========================================
+# 💾 CHECKPOINTS (restart/reconnect pe games wapas)
+# ==========================================
+# Hot path pe sirf json.dumps (lock ke andar, consistent snapshot) + dict set. Same session ke
+# flush se pehle ke kai moves ek hi row ban jate hain; DB write writer thread pe executemany se.
+CHECKPOINT_FLUSH_MS = int(os.environ.get("CHECKPOINT_FLUSH_MS", 250))
+CHECKPOINT_MAX_AGE = int(os.environ.get("CHECKPOINT_MAX_AGE", 6 * 3600)) # isse purana checkpoint restore nahi hota
+RESTORE_GRACE_SEC = 15 # restore ke baad timer kam se kam itna, taaki players wapas aa sakein
+CHECKPOINT_STATS = {"queued": 0, "coalesced": 0, "written": 0, "deleted": 0, "flushes": 0, "errors": 0,
+                    "restored": 0, "expired": 0}
+_dirty = {} # sid -> (game, room, state json, updated) ya None (delete)
+_dirty_lock = threading.Lock()
+_flush_wake = threading.Event()
+_writer = None
+_parked = {} # room -> [(session, timer, updated)] restore ho chuke, bot ke room rejoin ka wait
+_parked_lock = threading.Lock()
+
+def _queue_checkpoint(sid, row):
+    global _writer
+    with _dirty_lock:
+        if sid in _dirty: CHECKPOINT_STATS["coalesced"] += 1
+        _dirty[sid] = row
+        CHECKPOINT_STATS["queued"] += 1
+        if _writer is None:
+            _writer = threading.Thread(target=_write_loop, daemon=True, name="session-checkpoints")
+            _writer.start()
+    _flush_wake.set()
+
+def _write_loop():
+    while True:
+        _flush_wake.wait()
+        time.sleep(CHECKPOINT_FLUSH_MS / 1000) # itni der ke moves ek batch me
+        _flush_wake.clear()
+        flush_checkpoints()
+
+def flush_checkpoints():
+    """Pending snapshots DB me (writer thread, ya shutdown/bench se seedha)"""
+    global _dirty
+    with _dirty_lock:
+        batch, _dirty = _dirty, {}
+    if not batch: return
+    rows = [(sid,) + row for sid, row in batch.items() if row]
+    deleted = [sid for sid, row in batch.items() if row is None]
+    if db.save_checkpoints(rows, deleted):
+        CHECKPOINT_STATS["flushes"] += 1
+        CHECKPOINT_STATS["written"] += len(rows); CHECKPOINT_STATS["deleted"] += len(deleted)
+        return
+    # DB fail: wapas queue me (beech me naya snapshot aa gaya ho to wahi rakho), agli flush pe retry
+    CHECKPOINT_STATS["errors"] += 1
+    with _dirty_lock:
+        for sid, row in batch.items(): _dirty.setdefault(sid, row)
+
+class GameSession:
+    game = "game" # registry namespace, har subclass ka apna
+    kind = "photo" # default render kind (RenderSlot)
+    prefix = "bot" # upload prefix
+    initial = "WAITING"
+    TRANSITIONS = {} # khali = koi check nahi
+    JOINABLE = frozenset({"WAITING"}) # in states me `join` is session pe aa sakta hai
+    PM_STATES = frozenset() # in states me players ke plain PMs `on_pm_<status>()` pe aate hain
+    MAX_PER_ROOM = None # e.g. 1 = poore room ka ek hi game (guess)
+    CHECKPOINT_FIELDS = () # restart ke baad game wapas banane ke liye attributes (JSON-able); khali = no checkpoint
+
+    def __init__(self, bot, room, creator_id):
+        # Constructor side-effect free rakho (no messages/timers) - wo on_start() me, registration ke baad
+        self.bot, self.room, self.creator = bot, room, str(creator_id)
+        self.sid = uuid.uuid4().hex[:12]
+        self.members = {self.creator} # (room, game, uid) index me registered players
+        self.lock = threading.RLock() # on_timeout -> end_game -> show sab same thread pe lock dobara lete hain
+        self.status = self.initial
+        self.timer = self.timer_token = None
+        self.timer_reason = None
+        self.deadline = None
+        self.render_slot = render_pool.RenderSlot(self.kind, prefix=self.prefix, room=room)
+        self.outbox = deque() # show() deliveries, submit order me (head hi bhejta hai)
+        self.outbox_lock = threading.RLock() # done-callback same thread pe turant bhi chal sakta hai
+
+    # --- HOOKS (subclass override karta hai) ---
+    def on_start(self):
+        pass
+
+    def on_timeout(self, reason):
+        self.end()
+
+    def on_restore(self):
+        """Checkpoint se wapas aaya session, bot room me wapas aa chuka (lock ke andar) - caches warm karo, adhoore kaam dobara chalao"""
+        pass
+
+    # --- STATE MACHINE ---
+    @property
+    def ended(self):
+        return self.status == ENDED
+
+    def goto(self, state):
+        if self.TRANSITIONS and state not in self.TRANSITIONS.get(self.status, ()):
+            raise ValueError(f"{self.game}: {self.status} -> {state} not allowed")
+        was_open, was_pm = self.status in self.JOINABLE, self.status in self.PM_STATES
+        self.status = state
+        if was_open != (state in self.JOINABLE): REGISTRY.set_joinable(self, not was_open)
+        if was_pm != (state in self.PM_STATES): REGISTRY.set_pm(self, not was_pm)
+
+    def enroll(self, uid):
+        """Naya player (join) - ab uske messages seedha is session pe aayenge"""
+        uid = str(uid)
+        if uid in self.members: return
+        self.members.add(uid)
+        REGISTRY.add_member(self, uid)
+
+    def handle(self, cmd, uid, name="", icon=""):
+        """Room input -> current state ka handler. True = message consume ho gaya."""
+        with self.lock:
+            if self.ended: return False
+            handler = getattr(self, "on_" + self.status.lower(), None)
+            handled = bool(handler and handler(cmd, str(uid), name, icon))
+            if handled: self.checkpoint()
+            return handled
+
+    def handle_pm(self, cmd, uid):
+        """PM input -> `on_pm_<status>(cmd, uid)`"""
+        with self.lock:
+            if self.ended: return False
+            handler = getattr(self, "on_pm_" + self.status.lower(), None)
+            handled = bool(handler and handler(cmd, str(uid)))
+            if handled: self.checkpoint()
+            return handled
+
+    # --- TIMER ---
+    def reset_timer(self, seconds, reason="inactivity"):
+        if self.timer: TIMERS.cancel(self.timer)
+        self.timer_reason, self.deadline = reason, time.time() + seconds
+        self.timer_token = token = object()
+        self.timer = TIMERS.schedule(seconds, self._fire, reason, token)
+
+    def cancel_timer(self):
+        if self.timer: TIMERS.cancel(self.timer)
+        self.timer = self.timer_token = self.timer_reason = self.deadline = None
+
+    def _fire(self, reason, token):
+        with self.lock:
+            # cancel() se pehle pop ho chuka timer lock pe ruka ho sakta hai - sirf current timer chale
+            if self.ended or token is not self.timer_token: return
+            SESSION_STATS["timeouts"] += 1
+            self.on_timeout(reason)
+            self.checkpoint()
+
+    # --- OUTPUT ---
+    def say(self, text):
+        self.bot.send_message(self.room, text)
+
+    def show(self, fn, scene, text, board_text=None, kind=None, final=False):
+        """Render + publish. Lock ke andar call karo taaki submit order = message order.
+        Image budget me aa gayi to image + text; warna text (+ board_text) turant, image ready hote hi peeche.
+        Session ki deliveries ek queue me ek ke baad ek - koi thread render ka wait nahi karta
+        (render done-callback ya budget ka TIMERS entry queue ko aage badhata hai)."""
+        fut = self.render_slot.submit(fn, scene, kind)
+        item = {"fut": fut, "text": text, "board_text": board_text, "final": final, "timer": None,
+                "due": time.monotonic() + render_pool.LATENCY_BUDGET_MS / 1000}
+        with self.outbox_lock:
+            self.outbox.append(item)
+            if len(self.outbox) == 1: self._pump()
+        return fut
+
+    def _wake(self, *_):
+        with self.outbox_lock: self._pump()
+
+    def _pump(self):
+        """outbox_lock ke andar: head ready (image aa gayi / budget khatam) ho to bhejo, phir agla"""
+        while self.outbox:
+            item = self.outbox[0]
+            if not item["fut"].done() and time.monotonic() < item["due"]:
+                if not item["timer"]:
+                    item["timer"] = TIMERS.schedule(item["due"] - time.monotonic(), self._wake)
+                    item["fut"].add_done_callback(self._wake)
+                return
+            self.outbox.popleft()
+            if item["timer"]: TIMERS.cancel(item["timer"])
+            try: self._deliver(item)
+            except Exception as e: print(f"[{self.room}] {self.game} Visual Error: {e}")
+
+    def _deliver(self, item):
+        fut, text, board_text = item["fut"], item["text"], item["board_text"]
+        with_board = f"{text}\n{board_text}" if board_text and not item["final"] else text
+        if not fut.done():
+            # Budget khatam: khabar abhi do, image ready hote hi peeche aayegi
+            if text: self.say(with_board)
+            fut.add_done_callback(self._late_image)
+            return
+        url = None
+        try: url = fut.result()
+        except Exception as e: print(f"[{self.room}] {self.game} Visual Error: {e}")
+        if url:
+            self.bot.send_image(self.room, url)
+            if text: self.say(text)
+        elif text:
+            # Image fail / purana board skip hua - text phir bhi jana chahiye
+            self.say(with_board if self.render_slot.is_latest(fut) else text)
+
+    def _late_image(self, fut):
+        if fut.exception() or not fut.result() or not self.render_slot.is_latest(fut): return
+        SESSION_STATS["late_images"] += 1
+        self.bot.send_image(self.room, fut.result())
+
+    # --- SETTLEMENT / END ---
+    def settle(self, fn, *args, **kwargs):
+        """db.add_game_result (aur uske listeners) background me"""
+        settle_executor.submit(_settle, self.game, fn, args, kwargs)
+
+    # --- CHECKPOINT ---
+    def checkpoint(self):
+        """Lock ke andar call karo. Ended session ka row delete hota hai."""
+        if not self.CHECKPOINT_FIELDS: return
+        if self.ended:
+            _queue_checkpoint(self.sid, None)
+            return
+        remaining = max(0.0, self.deadline - time.time()) if self.deadline else 0.0
+        state = {"status": self.status, "creator": self.creator, "members": list(self.members),
+                 "timer": [self.timer_reason, round(remaining, 1)] if self.timer_reason else None,
+                 "fields": {f: getattr(self, f) for f in self.CHECKPOINT_FIELDS}}
+        _queue_checkpoint(self.sid, (self.game, self.room, json.dumps(state, separators=(",", ":")), int(time.time())))
+
+    @classmethod
+    def from_checkpoint(cls, bot, sid, room, state):
+        session = cls.__new__(cls)
+        GameSession.__init__(session, bot, room, state["creator"])
+        session.sid, session.status, session.members = sid, state["status"], set(state["members"])
+        for f, v in state["fields"].items(): setattr(session, f, v)
+        return session
+
+    def end(self):
+        if self.ended: return
+        self.status = ENDED
+        self.cancel_timer()
+        REGISTRY.remove(self)
+        self.checkpoint()
+        SESSION_STATS["ended"] += 1
+        memory_governor.request_collect()
+
+# ==========================================
+# 🌍 REGISTRY
+# ==========================================
+class SessionRegistry:
+    """sid -> session, plus O(1) indexes:
+      members:  (room, game, uid) -> session (player ka session, scan nahi)
+      joinable: (room, game) -> OrderedDict sid -> session (insertion order, aakhri = sabse naya)
+      rooms:    room -> {sid: session} (per-room cap)
+      pm:       uid -> OrderedDict sid -> session (PM_STATES wale sessions, sabse naya aakhri)
+    Reads lock-free (dict get GIL-atomic hai), writes lock ke andar.
+    Lock order: session.lock -> registry.lock (end()/goto() aise hi chalte hain), ulta kabhi nahi."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.members = {}
+        self.joinable = {}
+        self.rooms = {}
+        self.pm = {}
+
+    def get(self, sid):
+        return self.sessions.get(sid)
+
+    def find(self, room, game, uid):
+        return self.members.get((room, game, str(uid)))
+
+    def waiting(self, room, game):
+        """Join ke candidates, sabse naya pehle"""
+        open_ = self.joinable.get((room, game))
+        return list(open_.values())[::-1] if open_ else []
+
+    def pm_sessions(self, uid):
+        """Player ke PM-input wale sessions, sabse naya pehle"""
+        open_ = self.pm.get(str(uid))
+        return list(open_.values())[::-1] if open_ else []
+
+    def in_room(self, room, game=None):
+        return [s for s in list(self.rooms.get(room, {}).values()) if game is None or s.game == game]
+
+    def start(self, session):
+        """Register karke on_start() -> True. False agar creator is room me pehle se is game me hai,
+        room MAX_SESSIONS_PER_ROOM pe hai, ya game ke MAX_PER_ROOM sessions chal rahe hain."""
+        key = (session.room, session.game, session.creator)
+        with self.lock:
+            room = self.rooms.get(session.room, {})
+            if key in self.members or len(room) >= MAX_SESSIONS_PER_ROOM: return False
+            if session.MAX_PER_ROOM and sum(s.game == session.game for s in room.values()) >= session.MAX_PER_ROOM: return False
+            self.sessions[session.sid] = session
+            self.members[key] = session
+            self.rooms.setdefault(session.room, {})[session.sid] = session
+            if session.status in session.JOINABLE: self._open(session)
+            if session.status in session.PM_STATES: self._pm_open(session, session.members)
+        SESSION_STATS["started"] += 1
+        with session.lock:
+            session.on_start()
+            session.checkpoint()
+        return True
+
+    def adopt(self, session):
+        """Restored session ko indexes me daalo (on_start nahi, cap nahi) -> False agar sid pehle se live hai"""
+        with self.lock:
+            if session.sid in self.sessions: return False
+            self.sessions[session.sid] = session
+            for uid in session.members: self.members.setdefault((session.room, session.game, uid), session)
+            self.rooms.setdefault(session.room, {})[session.sid] = session
+            if session.status in session.JOINABLE: self._open(session)
+            if session.status in session.PM_STATES: self._pm_open(session, session.members)
+        return True
+
+    def _open(self, session):
+        self.joinable.setdefault((session.room, session.game), OrderedDict())[session.sid] = session
+
+    def _close(self, session):
+        key = (session.room, session.game)
+        open_ = self.joinable.get(key)
+        if open_ is None: return
+        open_.pop(session.sid, None)
+        if not open_: del self.joinable[key]
+
+    def _pm_open(self, session, uids):
+        for uid in uids: self.pm.setdefault(uid, OrderedDict())[session.sid] = session
+
+    def _pm_close(self, session):
+        for uid in session.members:
+            open_ = self.pm.get(uid)
+            if open_ is None: continue
+            open_.pop(session.sid, None)
+            if not open_: del self.pm[uid]
+
+    def set_pm(self, session, on):
+        with self.lock:
+            if session.sid not in self.sessions: return
+            if on: self._pm_open(session, session.members)
+            else: self._pm_close(session)
+
+    def set_joinable(self, session, joinable):
+        with self.lock:
+            if session.sid not in self.sessions: return
+            if joinable: self._open(session)
+            else: self._close(session)
+
+    def add_member(self, session, uid):
+        with self.lock:
+            if session.sid not in self.sessions: return
+            self.members.setdefault((session.room, session.game, uid), session)
+            if session.status in session.PM_STATES: self._pm_open(session, (uid,))
+
+    def remove(self, session):
+        with self.lock:
+            if self.sessions.get(session.sid) is not session: return
+            del self.sessions[session.sid]
+            for uid in session.members:
+                key = (session.room, session.game, uid)
+                if self.members.get(key) is session: del self.members[key]
+            self._close(session)
+            self._pm_close(session)
+            room = self.rooms.get(session.room)
+            if room is not None:
+                room.pop(session.sid, None)
+                if not room: del self.rooms[session.room]
+
+    def all(self, game=None):
+        return [s for s in list(self.sessions.values()) if game is None or s.game == game]
+
+    def __len__(self):
+        return len(self.sessions)
+
+REGISTRY = SessionRegistry()
+
+def route(room, game, cmd, uid, name="", icon=""):
+    """Player ke apne session pe input; wo kisi me na ho to `join` sabse naye waiting session pe
+    (wo bhar chuka ho / mana kar de to usse purane pe)"""
+    session = REGISTRY.find(room, game, uid)
+    if session: return session.handle(cmd, uid, name, icon)
+    if cmd != "join": return False
+    for session in REGISTRY.waiting(room, game):
+        if session.handle(cmd, uid, name, icon): return True
+    return False
+
+def route_pm(uid, cmd):
+    """Plain PM -> sender ka PM-input wala session (O(1) index, games scan nahi)"""
+    for session in REGISTRY.pm_sessions(uid):
+        if session.handle_pm(cmd, uid):
+            SESSION_STATS["pm_routed"] += 1
+            return True
+    return False
+
+def restore(bot, cls):
+    """Plugin setup() se: is game ke saare checkpoints ek query me wapas -> restored count.
+    Bot abhi offline hai (credentials/rooms dashboard login ke baad aate hain), to sessions sirf
+    registry me aate hain - timer aur on_restore() park, jab tak bot us room me wapas na aaye
+    (resume_room). Warna timeouts/spins un games ko settle kar dete jinme koi pahunch hi nahi sakta."""
+    restored, stale, now = 0, [], time.time()
+    for sid, room, raw, updated in db.load_checkpoints(cls.game):
+        if sid in REGISTRY.sessions: continue # plugin reload - session pehle se live hai
+        if now - updated > CHECKPOINT_MAX_AGE:
+            stale.append(sid); continue
+        try:
+            state = json.loads(raw)
+            session = cls.from_checkpoint(bot, sid, room, state)
+        except Exception as e:
+            print(f"[{cls.game}] Bad checkpoint {sid}: {e}")
+            stale.append(sid); continue
+        if not REGISTRY.adopt(session): continue
+        with _parked_lock: _parked.setdefault(room, []).append((session, state["timer"], updated))
+        restored += 1
+    if stale:
+        db.save_checkpoints([], stale)
+        CHECKPOINT_STATS["expired"] += len(stale)
+    CHECKPOINT_STATS["restored"] += restored
+    return restored
+
+def resume_room(room):
+    """bot_engine: room ka pehla room_event (login + rejoin ho gaya) -> us room ke restored sessions
+    ke timers chalao (remaining time, kam se kam RESTORE_GRACE_SEC) + on_restore(). Resumed count."""
+    if room not in _parked: return 0 # har room_event pe aata hai - common path lock-free
+    with _parked_lock: parked = _parked.pop(room, ())
+    resumed, now = 0, time.time()
+    for session, timer, updated in parked:
+        with session.lock:
+            if session.ended: continue
+            if now - updated > CHECKPOINT_MAX_AGE: # bot itni der offline raha - game chhod do
+                CHECKPOINT_STATS["expired"] += 1
+                session.end(); continue
+            if timer:
+                reason, remaining = timer
+                session.reset_timer(max(remaining, RESTORE_GRACE_SEC), reason)
+            session.on_restore()
+            session.checkpoint()
+        resumed += 1
+    return resumed
+
+def stop(room, game, uid):
+    """!game 0: player ka apna session khatam karo -> True agar kuch chal raha tha"""
+    session = REGISTRY.find(room, game, uid)
+    if not session: return False
+    with session.lock: session.end()
+    return True
+
+def stats():
+    return dict(SESSION_STATS, live=len(REGISTRY), rooms=len(REGISTRY.rooms), timers=len(TIMERS),
+                checkpoints=dict(CHECKPOINT_STATS, pending=len(_dirty), parked=sum(map(len, list(_parked.values())))),
+                by_game=dict(Counter(s.game for s in REGISTRY.all())))
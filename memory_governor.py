@@ -0,0 +1,115 @@
+import os
+import gc
+import time
+import threading
+from collections import deque
+
+import psutil
+
+# --- CONFIG ---
+# Render ka chhota instance 512MB deta hai; isse upar jane se pehle hi saaf kar do
+MEMORY_BUDGET_MB = float(os.environ.get("MEMORY_BUDGET_MB", 380))
+GC_THRESHOLDS = (5000, 20, 50) # default (700, 10, 10) hot path pe bahut baar full pause deta hai
+# gen1 collections ki ginti (gc.get_count()[2]) isse upar jaye to full collection hum khud karenge,
+# taaki automatic gen2 pause (threshold 50) kisi message bhejne wale thread pe na pade
+GC_ALLOC_BUDGET = int(os.environ.get("GC_ALLOC_BUDGET", 40))
+SAMPLE_EVERY = 10 # seconds
+MIN_COLLECT_GAP = 30 # do forced collections ke beech kam se kam itne seconds
+# request_collect() hint sirf tab collect karta hai jab RSS budget ke itne hisse tak pahunch chuka ho -
+# warna har game end pe full gc.collect() (wahi per-game stall jo hatana tha)
+HINT_MARGIN = float(os.environ.get("GC_HINT_MARGIN", 0.85))
+
+RSS_TREND = deque(maxlen=180) # (ts, rss_mb) ~30 min
+GC_PAUSES = deque(maxlen=200) # (ts, generation, ms)
+GC_STATS = {"pauses": 0, "pause_ms_total": 0.0, "pause_ms_max": 0.0, "forced": 0, "last_forced": 0.0}
+
+_started = False
+_wake = threading.Event()
+_gc_t0 = {}
+
+# ==========================================
+# ⏱️ GC PAUSE TRACKING
+# ==========================================
+def _on_gc(phase, info):
+    tid = threading.get_ident()
+    if phase == "start":
+        _gc_t0[tid] = time.perf_counter()
+        return
+    t0 = _gc_t0.pop(tid, None)
+    if t0 is None: return
+    ms = (time.perf_counter() - t0) * 1000
+    GC_PAUSES.append((time.time(), info.get("generation"), ms))
+    GC_STATS["pauses"] += 1
+    GC_STATS["pause_ms_total"] += ms
+    GC_STATS["pause_ms_max"] = max(GC_STATS["pause_ms_max"], ms)
+
+# ==========================================
+# 📈 RSS (bot + render worker processes)
+# ==========================================
+def rss_mb():
+    try:
+        proc = psutil.Process(os.getpid())
+        total = proc.memory_info().rss
+        for child in proc.children(recursive=True):
+            try: total += child.memory_info().rss
+            except psutil.Error: pass
+        return total / (1024 * 1024)
+    except psutil.Error:
+        return 0.0
+
+def _over_budget(rss):
+    return rss > MEMORY_BUDGET_MB or gc.get_count()[2] >= GC_ALLOC_BUDGET
+
+def _collect(reason):
+    GC_STATS["forced"] += 1
+    GC_STATS["last_forced"] = time.time()
+    gc.collect()
+    print(f"[Memory] gc.collect() ({reason}) -> {rss_mb():.0f} MB")
+
+def _tick(hinted):
+    """Ek sample: RSS note karo, zaroorat ho to collect -> reason ya None"""
+    rss = rss_mb()
+    RSS_TREND.append((time.time(), round(rss, 1)))
+    if time.time() - GC_STATS["last_forced"] < MIN_COLLECT_GAP: return None
+    if _over_budget(rss): reason = f"{rss:.0f} MB"
+    elif hinted and rss >= MEMORY_BUDGET_MB * HINT_MARGIN: reason = f"hint, {rss:.0f} MB"
+    else: return None
+    _collect(reason)
+    return reason
+
+def _loop():
+    while True:
+        woken = _wake.wait(SAMPLE_EVERY)
+        _wake.clear()
+        _tick(woken)
+
+# ==========================================
+# 🚀 PUBLIC API
+# ==========================================
+def start():
+    """Thresholds tune karo, startup objects freeze karo, background governor chalu karo"""
+    global _started
+    if _started: return
+    _started = True
+    gc.set_threshold(*GC_THRESHOLDS)
+    gc.callbacks.append(_on_gc)
+    gc.collect()
+    gc.freeze() # imports/plugins/fonts ke objects ab har full collection me scan nahi honge
+    threading.Thread(target=_loop, daemon=True, name="memory-governor").start()
+
+def request_collect():
+    """Bada kaam khatam hua ho (game end wagairah) to hint do; governor thread turant sample karta hai,
+    collection sirf tab jab RSS budget ke HINT_MARGIN tak ho"""
+    _wake.set()
+
+def stats():
+    recent = list(GC_PAUSES)[-20:]
+    return dict(GC_STATS,
+                pause_ms_total=round(GC_STATS["pause_ms_total"], 1),
+                pause_ms_max=round(GC_STATS["pause_ms_max"], 2),
+                recent_pauses=[round(ms, 2) for _, _, ms in recent],
+                rss_mb=RSS_TREND[-1][1] if RSS_TREND else round(rss_mb(), 1),
+                rss_trend=[mb for _, mb in RSS_TREND],
+                budget_mb=MEMORY_BUDGET_MB,
+                counts=gc.get_count(),
+                thresholds=gc.get_threshold())
@@ -0,0 +1,158 @@
+import os
+import re
+import time
+import threading
+import urllib.parse
+import concurrent.futures
+from collections import OrderedDict, namedtuple
+
+import utils
+
+# ==========================================
+# 🎵 MUSIC RESOLVER
+# ==========================================
+# "song name" -> Track(video_id, audio_url, card_url). Ek hi jagah se sab music plugins:
+#  - TTL + LRU cache: normalized query pe; popular gaane dobara converter tak nahi jaate
+#  - negative cache: "nahi mila" bhi kuch der yaad (spam queries converter ko nahi martein)
+#  - coalescing: same query ke saath-saath aaye requests ek hi upstream call share karte hain
+#  - non-blocking: resolve_async() Future deta hai, cache hit pe pehle se done
+CONVERTER_URL = os.environ.get("MUSIC_CONVERTER_URL", "https://mp3-2mgp.onrender.com/convert")
+SEARCH_URL = "https://www.youtube.com/results?search_query={}"
+FALLBACK_AUDIO_URL = "https://api.vevioz.com/@api/button/mp3/{}"
+CONVERTER_TIMEOUT = 30
+SEARCH_TIMEOUT = 10
+MUSIC_CACHE_TTL = int(os.environ.get("MUSIC_CACHE_TTL", 3600)) # converter ke audio links bhi kuch der hi chalte hain
+MUSIC_MISS_TTL = int(os.environ.get("MUSIC_MISS_TTL", 300))
+MAX_MUSIC_CACHE = int(os.environ.get("MAX_MUSIC_CACHE", 512))
+
+Track = namedtuple("Track", "query video_id audio_url card_url duration", defaults=(None,)) # duration sec, pata ho to
+
+class NotFound(Exception):
+    """Converter/search ne saaf bola: aisa gaana nahi (negative cache hota hai)"""
+
+MUSIC_CACHE = OrderedDict() # key -> (expires, Track ya None = not found)
+MUSIC_STATS = {"hits": 0, "negative_hits": 0, "misses": 0, "coalesced": 0, "resolved": 0, "not_found": 0,
+               "errors": 0, "fallbacks": 0}
+_inflight = {} # key -> Future
+_music_lock = threading.Lock()
+resolve_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="music-resolve")
+
+def normalize(query):
+    """"  Tum Hi  HO!! " -> "tum hi ho" (case, extra spaces, trailing punctuation ignore)"""
+    return " ".join(re.sub(r"[^\w\s'&-]", " ", query.lower()).split())
+
+# ==========================================
+# 🌐 UPSTREAMS
+# ==========================================
+def convert(query):
+    """Apna converter: query -> audio + card. Transient error pe exception, 'nahi mila' pe NotFound."""
+    resp = utils.http_post(CONVERTER_URL, json={"query": query}, timeout=CONVERTER_TIMEOUT)
+    if resp.status_code != 200: raise RuntimeError(f"Server Error {resp.status_code}")
+    data = resp.json()
+    if not data.get("success"): raise NotFound(data.get("error") or "Song nahi mila")
+    return Track(query, data.get("video_id"), data["audio_url"], data.get("card_url"), data.get("duration"))
+
+def search(query):
+    """Fallback: YouTube results page se pehla video id -> direct mp3 link (card nahi)"""
+    resp = utils.http_get(SEARCH_URL.format(urllib.parse.quote(query)), timeout=SEARCH_TIMEOUT,
+                          headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"})
+    ids = re.findall(r'watch\?v=(\S{11})', resp.text)
+    if not ids: raise NotFound("Song nahi mila")
+    return Track(query, ids[0], FALLBACK_AUDIO_URL.format(ids[0]), None)
+
+RESOLVERS = [convert, search] # pehla jo Track de; converter down ho to search
+
+def _fetch(query):
+    error = None
+    for i, resolver in enumerate(RESOLVERS):
+        try:
+            track = resolver(query)
+            if i: MUSIC_STATS["fallbacks"] += 1
+            return track
+        except NotFound as e:
+            error = error or e
+        except Exception as e:
+            error = e
+    raise error or NotFound("Song nahi mila")
+
+# ==========================================
+# 🗂️ CACHE + COALESCING
+# ==========================================
+def _cached(key):
+    """(found, track) - lock-free hit path (GIL), expire hua to hata do"""
+    entry = MUSIC_CACHE.get(key)
+    if entry is None: return False, None
+    expires, track = entry
+    if expires < time.time():
+        with _music_lock:
+            if MUSIC_CACHE.get(key) is entry: del MUSIC_CACHE[key]
+        return False, None
+    try: MUSIC_CACHE.move_to_end(key)
+    except KeyError: pass
+    return True, track
+
+def _remember(key, track):
+    ttl = MUSIC_CACHE_TTL if track else MUSIC_MISS_TTL
+    with _music_lock:
+        MUSIC_CACHE[key] = (time.time() + ttl, track)
+        while len(MUSIC_CACHE) > MAX_MUSIC_CACHE: MUSIC_CACHE.popitem(last=False)
+
+def _done(value=None, error=None):
+    fut = concurrent.futures.Future()
+    if error: fut.set_exception(error)
+    else: fut.set_result(value)
+    return fut
+
+def _run(key, query, fut):
+    try:
+        track = _fetch(query)
+        MUSIC_STATS["resolved"] += 1
+        _remember(key, track)
+        fut.set_result(track)
+    except NotFound as e:
+        MUSIC_STATS["not_found"] += 1
+        _remember(key, None)
+        fut.set_exception(e)
+    except Exception as e:
+        # Timeout/5xx cache nahi hote - agli request dobara try karegi
+        MUSIC_STATS["errors"] += 1
+        fut.set_exception(e)
+    finally:
+        with _music_lock: _inflight.pop(key, None)
+
+def lookup(query):
+    """Sirf cache: Track, None (pata hai ki nahi milta) ya KeyError (abhi pata nahi)"""
+    found, track = _cached(normalize(query))
+    if not found: raise KeyError(query)
+    return track
+
+def resolve_async(query):
+    """Future -> Track (ya NotFound / upstream error). Kabhi block nahi karta."""
+    key = normalize(query)
+    if not key: return _done(error=NotFound("Song name likho"))
+    found, track = _cached(key)
+    if found:
+        MUSIC_STATS["hits" if track else "negative_hits"] += 1
+        return _done(track) if track else _done(error=NotFound("Song nahi mila"))
+    with _music_lock:
+        fut = _inflight.get(key)
+        if fut is not None:
+            MUSIC_STATS["coalesced"] += 1
+            return fut
+        fut = _inflight[key] = concurrent.futures.Future()
+    MUSIC_STATS["misses"] += 1
+    resolve_executor.submit(_run, key, query, fut)
+    return fut
+
+def prefetch(query):
+    """Queue me aage wale gaane: background me resolve + cache, errors yahan chup (play ke time dikhenge)"""
+    fut = resolve_async(query)
+    fut.add_done_callback(lambda f: f.exception())
+    return fut
+
+def resolve(query, timeout=None):
+    """Blocking convenience (dispatch thread pe mat chalao)"""
+    return resolve_async(query).result(timeout)
+
+def stats():
+    return dict(MUSIC_STATS, cached=len(MUSIC_CACHE), inflight=len(_inflight))
@@ -2,6 +2,9 @@ import os
 import importlib.util
 import sys
 import traceback
+import threading
+import render_pool
+import game_session
 
 PLUGIN_DIR = "plugins"
 
@@ -24,6 +27,8 @@ class PluginManager:
                     print(f"[Plugins] Error loading {name}: {e}")
         # Bot log me batao ki plugins load ho gaye
         self.bot.log(f"🧩 Plugins Loaded: {', '.join(loaded)}")
+        # Process render backend ho to workers background me warm kar do
+        threading.Thread(target=render_pool.start, daemon=True).start()
         return loaded
 
     def load_plugin(self, name):
@@ -93,21 +98,29 @@ class PluginManager:
         
         if not text or not user: return
 
-        # Command Parse karo
         if text.startswith("!"):
             parts = text[1:].split(" ")
             cmd = parts[0].lower()
             args = parts[1:]
-            
             self.bot.log(f"⚡ PM Command Detected: [{cmd}] by {user}")
+        else:
+            # Plain text (mines traps wagairah): sirf sender ke active session pe, O(1) index se.
+            # Kisi session ka nahi to ignore - plain PMs plugins ke commands nahi hain
+            try:
+                return game_session.route_pm(str(data.get("from_id", user)), text.lower())
+            except Exception as e:
+                self.bot.log(f"❌ PM Session Error: {e}")
+                traceback.print_exc()
+                return False
 
-            # Plugin dhoondo jo 'handle_pm' support karta ho
-            for name, module in self.plugins.items():
-                if hasattr(module, 'handle_pm'):
-                    try:
-                        if module.handle_pm(self.bot, cmd, user, args, data):
-                            self.bot.log(f"✅ PM Handled by Plugin: {name}")
-                            break
-                    except Exception as e:
-                        self.bot.log(f"❌ PM Plugin Error ({name}): {e}")
-                        traceback.print_exc()
+        # Plugin dhoondo jo 'handle_pm' support karta ho
+        for name, module in self.plugins.items():
+            if hasattr(module, 'handle_pm'):
+                try:
+                    if module.handle_pm(self.bot, cmd, user, args, data):
+                        self.bot.log(f"✅ PM Handled by Plugin: {name}")
+                        return True
+                except Exception as e:
+                    self.bot.log(f"❌ PM Plugin Error ({name}): {e}")
+                    traceback.print_exc()
+        return False
@@ -1,50 +1,107 @@
-import random
-import sys
 import os
+import re
+import math
+import random
 
-# --- DB IMPORT ---
-try:
-    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-    import db
-except:
-    pass
+import db
+import game_session
 
-games = {}
+# --- CONFIG ---
+DEFAULT_RANGE = (1, 100)
+MAX_SPAN = 1_000_000 # !guess 1 999999999 jaisa range nahi
+GUESS_TIMEOUT = int(os.environ.get("GUESS_TIMEOUT", 120)) # itni der koi guess na aaye to game khatam
+EXTRA_TRIES = 3 # binary search ke tries ke upar itni chhoot
+REWARD = 100
+INT_RE = re.compile(r"-?\d+") # "--5" jaisa input int() tak na pahunche
 
 def setup(bot):
-    print("Guess Plugin with Score System Loaded")
+    restored = game_session.restore(bot, GuessGame)
+    print(f"Guess Plugin with Score System Loaded ({restored} games restored)" if restored else "Guess Plugin with Score System Loaded")
+
+def max_attempts(lo, hi):
+    """Sahi strategy (binary search) ko jitne chahiye + thodi chhoot"""
+    return math.ceil(math.log2(hi - lo + 1)) + EXTRA_TRIES
+
+def parse_range(args):
+    """[] -> default, [lo, hi] -> (lo, hi); galat ho to None"""
+    if not args: return DEFAULT_RANGE
+    if len(args) != 2 or not all(INT_RE.fullmatch(a) for a in args): return None
+    lo, hi = int(args[0]), int(args[1])
+    if lo >= hi or hi - lo > MAX_SPAN: return None
+    return lo, hi
+
+# ==========================================
+# 📦 GAME INSTANCE
+# ==========================================
+class GuessGame(game_session.GameSession):
+    """Poore room ka ek game - koi bhi guess kar sakta hai (member index nahi, room se route hota hai)"""
+    game = "guess"
+    initial = "PLAYING"
+    JOINABLE = frozenset()
+    MAX_PER_ROOM = 1
+    CHECKPOINT_FIELDS = ("starter", "lo", "hi", "num", "attempts", "limit")
+
+    def __init__(self, bot, room, uid, name, lo, hi):
+        super().__init__(bot, room, uid)
+        self.starter, self.lo, self.hi = name, lo, hi
+        self.num = random.randint(lo, hi)
+        self.attempts, self.limit = 0, max_attempts(lo, hi)
+
+    def on_start(self):
+        self.reset_timer(GUESS_TIMEOUT)
+        self.say(f"🔢 **Guess the Number ({self.lo}-{self.hi})**\n@{self.starter} started the game! "
+                 f"{self.limit} tries, win {REWARD} coins.")
+
+    def on_timeout(self, reason):
+        self.say(f"⌛ Time up! The number was **{self.num}**.")
+        self.end()
+
+    def on_playing(self, cmd, uid, name, icon):
+        if not INT_RE.fullmatch(cmd): return False
+        val = int(cmd)
+        if not self.lo <= val <= self.hi:
+            self.say(f"⚠️ Pick a number between {self.lo} and {self.hi}.")
+            return True
+
+        self.attempts += 1
+        if val == self.num:
+            self.settle(db.add_game_result, uid, name, "guess_game", REWARD, is_win=True, avatar=icon or None)
+            self.say(f"🎉 CORRECT! @{name} guessed it in {self.attempts} tries and won {REWARD} coins! 💰")
+            self.end()
+            return True
+
+        left = self.limit - self.attempts
+        if left <= 0:
+            self.say(f"💀 Out of tries! The number was **{self.num}**.")
+            self.end()
+            return True
+        self.say(f"{'🔼 Higher!' if val < self.num else '🔽 Lower!'} ({left} tries left)")
+        self.reset_timer(GUESS_TIMEOUT)
+        return True
+
+# ==========================================
+# 🌍 GLOBAL HANDLER
+# ==========================================
+def room_game(room_name):
+    games = game_session.REGISTRY.in_room(room_name, GuessGame.game)
+    return games[0] if games else None
 
 def handle_command(bot, command, room_name, user, args, data):
     cmd = command.lower().strip()
-    global games
-    user_id = data.get("user_id", user)
+    uid, icon = game_session.player(data, user)
 
     if cmd == "guess":
-        if room_name in games:
-            bot.send_message(room_name, "⚠️ Game already running! Guess the number (1-100).")
+        game = room_game(room_name)
+        if game:
+            bot.send_message(room_name, f"⚠️ Game already running! Guess the number ({game.lo}-{game.hi}).")
             return True
-        
-        number = random.randint(1, 100)
-        games[room_name] = {"num": number, "attempts": 0}
-        bot.send_message(room_name, f"🔢 **Guess the Number (1-100)**\n@{user} started the game! Win 100 coins.")
-        return True
-
-    if room_name in games and cmd.isdigit():
-        val = int(cmd)
-        game = games[room_name]
-        game["attempts"] += 1
-        
-        if val == game["num"]:
-            # --- WINNER SCORE ADDED HERE ---
-            reward = 100
-            db.add_game_result(str(user_id), user, "guess_game", reward, is_win=True)
-            
-            bot.send_message(room_name, f"🎉 CORRECT! @{user} guessed it in {game['attempts']} tries and won {reward} coins! 💰")
-            del games[room_name]
-        elif val < game["num"]:
-            bot.send_message(room_name, "🔼 Higher!")
-        else:
-            bot.send_message(room_name, "🔽 Lower!")
+        rng = parse_range(args)
+        if not rng:
+            bot.send_message(room_name, f"⚠️ Usage: `!guess` or `!guess <low> <high>` (max span {MAX_SPAN:,}).")
+            return True
+        if not game_session.REGISTRY.start(GuessGame(bot, room_name, uid, user, *rng)):
+            bot.send_message(room_name, "⚠️ Game already running!")
         return True
 
-    return False
+    game = room_game(room_name)
+    return game.handle(cmd, uid, user, icon) if game else False
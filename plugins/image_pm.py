@@ -1,49 +1,40 @@
 import threading
 import random
 import re
-import gc
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
 
 # Local imports
 import utils
+import render_pool
+import text_layout
 
 # --- THEMES ---
 THEMES = [
-    {"bg_type":"gradient", "colors":[(43,16,80),(17,24,39)], "font":"fonts/arial.ttf", "text_color":"#ffffff", "effect":"glow", "effect_color":"#a855f7"},
-    {"bg_type":"solid", "colors":[(20,18,24)], "font":"fonts/times.ttf", "text_color":"#fbbf24", "effect":"shadow", "effect_color":"#000000"},
-    {"bg_type":"gradient", "colors":[(14,58,86),(17,24,39)], "font":"fonts/verdana.ttf", "text_color":"#ffffff", "effect":"outline", "effect_color":"#0ea5e9"}
+    {"bg_type":"gradient", "colors":[(43,16,80),(17,24,39)], "font":"arial.ttf", "text_color":"#ffffff", "effect":"glow", "effect_color":"#a855f7"},
+    {"bg_type":"solid", "colors":[(20,18,24)], "font":"times.ttf", "text_color":"#fbbf24", "effect":"shadow", "effect_color":"#000000"},
+    {"bg_type":"gradient", "colors":[(14,58,86),(17,24,39)], "font":"verdana.ttf", "text_color":"#ffffff", "effect":"outline", "effect_color":"#0ea5e9"}
 ]
 
 def setup(bot):
     bot.log("🎨 Direct Image PM Loaded")
 
-# ... (text_wrap and generate_image functions wahi rahenge, no change) ...
-def text_wrap(text, font, max_w):
-    lines = []; words = text.split(' ')
-    i = 0
-    while i < len(words):
-        line = ''
-        while i < len(words) and font.getlength(line + words[i]) <= max_w: line += words[i] + " "; i += 1
-        if not line: line = words[i]; i += 1
-        lines.append(line.strip())
-    return lines
-
-def generate_image(sender, text):
+def generate_image(scene):
+    sender, text = scene['sender'], scene['text']
     W, H = 512, 512
-    theme = random.choice(THEMES)
+    theme = THEMES[scene['theme']]
     canvas = Image.new("RGB", (W, H))
     if theme['bg_type'] == 'gradient': utils.draw_gradient_bg(canvas, theme['colors'][0], theme['colors'][1])
     else: ImageDraw.Draw(canvas).rectangle([0,0,W,H], fill=theme['colors'][0])
     draw = ImageDraw.Draw(canvas)
     
-    try: font = ImageFont.truetype(theme['font'], 48)
-    except: font = ImageFont.load_default()
-    
-    lines = text_wrap(text, font, W-80)
-    y_start = (H - (len(lines)*55))//2
+    # Lamba message -> font chhota (48 se 20 tak), phir bhi na aaye to '…'
+    size, lines = text_layout.fit(text, theme['font'], W-80, H-100, max_size=48, min_size=20)
+    font = utils.get_font(theme['font'], size)
+    line_h = text_layout.line_height(size)
+    y_start = (H - (len(lines)*line_h))//2 + line_h//2
     
     for i, line in enumerate(lines):
-        x, y = W/2, y_start + (i*55)
+        x, y = W/2, y_start + (i*line_h)
         if theme['effect'] == 'shadow': draw.text((x+3,y+3), line, font=font, fill=theme['effect_color'], anchor="mm")
         elif theme['effect'] == 'outline':
             for dx,dy in [(-2,-2),(2,-2),(-2,2),(2,2)]: draw.text((x+dx,y+dy), line, font=font, fill=theme['effect_color'], anchor="mm")
@@ -54,25 +45,21 @@ def generate_image(sender, text):
 
 # --- BACKGROUND WORKER (Cleaned) ---
 def pmi_task(bot, sender, target, message):
-    try:
-        # 1. Image banao
-        img = generate_image(sender, message)
-
+    # 1. Image banao (photo encode - gradient/glow themes palette pe band ho jaate hain)
+    scene = {'sender': sender, 'text': message, 'theme': random.randrange(len(THEMES))}
+    with render_pool.render_encoded(generate_image, scene, "photo") as enc:
         # 2. 🔐 PM ke liye PRIVATE upload use karo
-        url = utils.upload_private_image(
-            img,
+        url = utils.upload_private_bytes(
+            enc,
             bot.user_data["username"],
             target
         )
 
-        # 3. Image PM bhejo
-        if url:
-            bot.send_pm_image(target, url)
-        else:
-            bot.send_pm_message(sender, "❌ Failed to send image (PM upload error).")
-
-    finally:
-        gc.collect()
+    # 3. Image PM bhejo
+    if url:
+        bot.send_pm_image(target, url)
+    else:
+        bot.send_pm_message(sender, "❌ Failed to send image (PM upload error).")
 
 # --- COMMAND HANDLER (Cleaned) ---
 def handle_command(bot, command, room_name, user, args, data):
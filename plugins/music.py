@@ -1,9 +1,145 @@
-import requests
-import re
-import urllib.parse
+import os
+import time
+import threading
+from collections import deque
+
+import music_resolver
+import game_session
+
+# --- CONFIG ---
+MAX_QUEUE = int(os.environ.get("MUSIC_MAX_QUEUE", 20))
+PREFETCH_AHEAD = int(os.environ.get("MUSIC_PREFETCH", 2)) # current ke baad itne gaane pehle se resolve
+DEFAULT_TRACK_SEC = 210 # converter duration na de to itne baad agla gaana
 
 def setup(bot):
-    bot.log("🎵 Simple Music Plugin Loaded")
+    bot.log("🎵 Music Queue Loaded (!play, !queue, !skip, !np)")
+
+def fmt_time(sec):
+    sec = max(0, int(sec))
+    return f"{sec // 60}:{sec % 60:02d}"
+
+# ==========================================
+# 🎶 PER-ROOM PLAYLIST
+# ==========================================
+class RoomQueue:
+    """Ek room ka playlist. Audio chat player me bajta hai, bot ko end pata nahi chalta - isliye
+    track duration (ya DEFAULT_TRACK_SEC) ke baad agla. Current bajte waqt agle PREFETCH_AHEAD
+    gaane music_resolver se resolve ho ke cache me baithe rehte hain, to transition pe wait nahi."""
+    def __init__(self, bot, room):
+        self.bot, self.room = bot, room
+        self.lock = threading.RLock() # cache hit pe resolve callback isi thread pe turant chalta hai
+        self.queue = deque() # {"query", "user"}
+        self.current = None # {"query", "user", "track", "started"}
+        self.timer = None
+
+    # --- COMMANDS ---
+    def add(self, query, user):
+        with self.lock:
+            with playlists_lock: # beech me playlist khatam ho ke PLAYLISTS se hat gaya ho to
+                owner = PLAYLISTS.setdefault(self.room, self)
+            if owner is not self: return owner.add(query, user)
+            if self.current is None and not self.queue:
+                self._start({"query": query, "user": user})
+                return
+            if len(self.queue) >= MAX_QUEUE:
+                self.bot.send_message(self.room, f"❌ Queue full ({MAX_QUEUE} songs).")
+                return
+            self.queue.append({"query": query, "user": user})
+            self.bot.send_message(self.room, f"➕ **Queued #{len(self.queue)}:** {query.title()} (@{user})")
+            self._prefetch()
+
+    def skip(self, user):
+        with self.lock:
+            if self.current is None and not self.queue:
+                self.bot.send_message(self.room, "⚠️ Nothing is playing.")
+                return
+            self.bot.send_message(self.room, f"⏭️ Skipped by @{user}")
+            self._next()
+
+    def now_playing(self):
+        with self.lock:
+            cur = self.current
+            if cur is None:
+                return "⚠️ Nothing is playing." if not self.queue else f"⏳ Loading: {self.queue[0]['query'].title()}"
+            if not cur.get("track"): return f"⏳ Loading: {cur['query'].title()} (@{cur['user']})"
+            elapsed = time.time() - cur["started"]
+            return (f"💿 **Now Playing:** {cur['query'].title()}\n👤 @{cur['user']} | "
+                    f"⏱️ {fmt_time(elapsed)} / {fmt_time(self._duration(cur['track']))}")
+
+    def listing(self):
+        with self.lock:
+            lines = ["🎶 **Queue**"]
+            if self.current: lines.append(f"▶️ {self.current['query'].title()} (@{self.current['user']})")
+            for i, entry in enumerate(self.queue, 1):
+                try: ready = "✅" if music_resolver.lookup(entry["query"]) else "❌"
+                except KeyError: ready = "⏳"
+                lines.append(f"{i}. {entry['query'].title()} (@{entry['user']}) {ready}")
+            return "\n".join(lines) if len(lines) > 1 else "🎶 Queue is empty. `!play song name`"
+
+    # --- PLAYBACK ---
+    def _duration(self, track):
+        return track.duration or DEFAULT_TRACK_SEC
+
+    def _start(self, entry):
+        """entry current bana, resolve (prefetch hua ho to done Future, callback turant)"""
+        self._cancel_timer()
+        self.current = entry
+        music_resolver.resolve_async(entry["query"]).add_done_callback(lambda f: self._play(entry, f))
+        self._prefetch()
+
+    def _play(self, entry, fut):
+        with self.lock:
+            if self.current is not entry: return # beech me skip ho gaya
+            try:
+                track = fut.result()
+            except music_resolver.NotFound as e:
+                self.bot.send_message(self.room, f"❌ {entry['query'].title()}: {e}")
+                self._next()
+                return
+            except Exception:
+                self.bot.send_message(self.room, f"⚠️ Connection Timeout. ({entry['query'].title()})")
+                self._next()
+                return
+
+            entry["track"], entry["started"] = track, time.time()
+            if track.card_url: self.bot.send_image(self.room, track.card_url)
+            up_next = f"\n⏭️ **Next:** {self.queue[0]['query'].title()}" if self.queue else ""
+            self.bot.send_message(self.room, f"💿 **Playing:** {entry['query'].title()}\n👤 **Req by:** @{entry['user']}{up_next}")
+            self.bot.send_audio(self.room, track.audio_url)
+            self.timer = game_session.TIMERS.schedule(self._duration(track), self._finished, entry)
+
+    def _finished(self, entry):
+        with self.lock:
+            if self.current is entry: self._next()
+
+    def _next(self):
+        if self.queue:
+            self._start(self.queue.popleft())
+            return
+        # Playlist khatam: room ka state hata do (hazaron rooms me bhi memory bounded)
+        self._cancel_timer()
+        self.current = None
+        with playlists_lock:
+            if PLAYLISTS.get(self.room) is self: del PLAYLISTS[self.room]
+
+    def _prefetch(self):
+        for entry in list(self.queue)[:PREFETCH_AHEAD]: music_resolver.prefetch(entry["query"])
+
+    def _cancel_timer(self):
+        if self.timer: game_session.TIMERS.cancel(self.timer)
+        self.timer = None
+
+# ==========================================
+# 🌍 GLOBAL HANDLER
+# ==========================================
+PLAYLISTS = {}
+playlists_lock = threading.Lock()
+
+def room_queue(bot, room_name, create=False):
+    with playlists_lock:
+        q = PLAYLISTS.get(room_name)
+        if q is None and create: q = PLAYLISTS[room_name] = RoomQueue(bot, room_name)
+        return q
 
 def handle_command(bot, command, room_name, user, args, data):
     cmd = command.lower().strip()
@@ -11,41 +147,20 @@ def handle_command(bot, command, room_name, user, args, data):
     if cmd == "play":
         # Agar user ne gaana nahi likha
         if not args:
-            bot.send_message(room_name, "❌ Song name likho.")
+            bot.send_message(room_name, "❌ Usage: `!play song name`")
             return True
+        room_queue(bot, room_name, create=True).add(" ".join(args), user)
+        return True
 
-        song_name = " ".join(args)
-
-        try:
-            # 1. YouTube Search
-            query_encoded = urllib.parse.quote(song_name)
-            search_url = f"https://www.youtube.com/results?search_query={query_encoded}"
-            
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-            }
-
-            res = requests.get(search_url, headers=headers, timeout=10)
-            
-            # 2. Video ID Nikalo
-            video_ids = re.findall(r'watch\?v=(\S{11})', res.text)
-
-            if video_ids:
-                video_id = video_ids[0]
-                
-                # 3. Direct MP3 Link Banao (Vevioz)
-                music_url = f"https://api.vevioz.com/@api/button/mp3/{video_id}"
-                
-                # 🔥 MAIN CHEEZ: send_audio use kar rahe hain
-                # Ye chat room mein "Link" nahi, "Player" banayega.
-                bot.send_audio(room_name, music_url)
-                
-            else:
-                bot.send_message(room_name, "❌ Song nahi mila.")
-
-        except Exception as e:
-            bot.log(f"Music Error: {e}")
-
+    if cmd in ("queue", "skip", "np"):
+        q = room_queue(bot, room_name)
+        if cmd == "skip":
+            if q: q.skip(user)
+            else: bot.send_message(room_name, "⚠️ Nothing is playing.")
+        elif cmd == "np":
+            bot.send_message(room_name, q.now_playing() if q else "⚠️ Nothing is playing.")
+        else:
+            bot.send_message(room_name, q.listing() if q else "🎶 Queue is empty. `!play song name`")
         return True
 
     return False
@@ -1,15 +1,19 @@
 import time
 import threading
 import random
-import gc
 import io
-import requests
+import os
+import math
 import concurrent.futures
+from collections import OrderedDict
 from PIL import Image, ImageDraw, ImageFont
 
 # Local imports
 import utils
 import db
+import render_pool
+import card_template
+import game_session
 
 # --- CONFIG ---
 BOARD_URL = "https://www.dropbox.com/scl/fi/q9kp0wa6oswf1uvo4hspx/board.png?rlkey=dvia1wn8838dgf0qtcdych219&st=4h330mdw&dl=1"
@@ -23,14 +27,29 @@ SNAKES = {38: 20, 45: 7, 51: 10, 76: 54, 91: 73, 97: 61}
 
 sl_executor = concurrent.futures.ThreadPoolExecutor(max_workers=10)
 
+# --- 🎯 TOKENS + GEOMETRY ---
+TOKEN_SIZE = 28
+TOKEN_BORDER = 2
+P_COLORS = {"P1": (255,16,240), "P2": (44,255,255)}
+OVERLAP = 8 # dono ek square pe hon to P1 upar-left, P2 neeche-right
+SHOW_TRAILS = os.environ.get("SL_TRAILS", "1") == "1" # ladder/snake jump ka arrow
+TRAIL_COLORS = {"ladder": (34,197,94), "snake": (239,68,68)}
+# (avatar url, border color) -> RGBA sprite, border baked in. Join pe ban jata hai, har roll pe sirf paste.
+TOKEN_CACHE = OrderedDict() # (url, color) -> (sprite, expires)
+MAX_TOKEN_CACHE = 64
+TOKEN_MISS_TTL = 60 # avatar fetch fail hua to color disc sirf itni der - CDN hichki pe token hamesha disc na rahe
+_token_lock = threading.Lock()
+
 def setup(bot):
     bot.log("🐍 Snake & Ladders (High-Speed) Loaded")
     threading.Thread(target=fetch_board, daemon=True).start()
+    restored = game_session.restore(bot, SnakeLadderGame)
+    if restored: bot.log(f"♻️ Snake & Ladders: {restored} games restored")
 
 def fetch_board():
     global BOARD_CACHE
     try:
-        r = requests.get(BOARD_URL, timeout=15)
+        r = utils.http_get(BOARD_URL, timeout=15)
         if r.status_code == 200:
             img = Image.open(io.BytesIO(r.content)).convert("RGB")
             BOARD_CACHE = img.resize((B_SIZE, B_SIZE), Image.Resampling.LANCZOS)
@@ -47,183 +66,226 @@ def get_balance(uid):
         return row[0] if row else 0
     except: return 0
 
-# --- FAST UPLOADER HELPER ---
-def upload_fast_jpeg(image):
-    """PNG ki jagah Optimized JPEG upload karta hai taaki turant dikhe"""
-    url = None
-    try:
-        buf = io.BytesIO()
-        # Quality 70 aur Progressive ON karne se image turant load hoti hai
-        image.convert("RGB").save(buf, format='JPEG', quality=70, optimize=True, progressive=True)
-        buf.seek(0)
-        
-        import uuid
-        unique_name = f'sl_{uuid.uuid4().hex}.jpg'
-        files = {'reqtype': (None, 'fileupload'), 'fileToUpload': (unique_name, buf, 'image/jpeg')}
-        
-        r = requests.post('https://catbox.moe/user/api.php', files=files, headers={'Connection': 'close'}, timeout=30)
-        if r.status_code == 200:
-            url = r.text.strip()
-        buf.close()
-    except: pass
-    return url
+def warm_render():
+    """Render worker process ke andar board image pehle se le aao"""
+    if BOARD_CACHE is None: fetch_board()
+
+# ==========================================
+# 🎨 GRAPHICS (scene dict -> image, render_pool ke liye module-level)
+# ==========================================
+def _square_center(pos):
+    idx = pos - 1
+    row, col = idx // 10, idx % 10
+    if row % 2 == 1: col = 9 - col
+    return col * S_SIZE + S_SIZE // 2, (9 - row) * S_SIZE + S_SIZE // 2
+
+# pos -> {"solo": center, "P1"/"P2": overlap wali jagah}, import pe ek baar
+SQUARE_XY = [None] + [{"solo": (x, y), "P1": (x-OVERLAP, y-OVERLAP), "P2": (x+OVERLAP, y+OVERLAP)}
+                      for x, y in map(_square_center, range(1, 101))]
+
+def get_coords(pos, p_num, positions):
+    if positions["P1"] == positions["P2"] and pos > 1: return SQUARE_XY[pos][p_num]
+    return SQUARE_XY[pos]["solo"]
+
+def _arrow(start, end):
+    """Square se square tak arrow: (line points, arrowhead polygon)"""
+    (x0, y0), (x1, y1) = SQUARE_XY[start]["solo"], SQUARE_XY[end]["solo"]
+    a = math.atan2(y1 - y0, x1 - x0)
+    head = [(x1, y1), (x1 - 14*math.cos(a - 0.45), y1 - 14*math.sin(a - 0.45)), (x1 - 14*math.cos(a + 0.45), y1 - 14*math.sin(a + 0.45))]
+    return [(x0, y0), (x1 - 10*math.cos(a), y1 - 10*math.sin(a))], head
+
+# start square -> (kind, line, head) har ladder/snake ka
+TRAILS = {s: ("ladder",) + _arrow(s, e) for s, e in LADDERS.items()}
+TRAILS.update({s: ("snake",) + _arrow(s, e) for s, e in SNAKES.items()})
+
+def token_sprite(url, color):
+    """Gol avatar + border ek RGBA sprite me. Avatar na mile to player color ka disc."""
+    key = (url, color)
+    with _token_lock:
+        hit = TOKEN_CACHE.get(key)
+        if hit is not None and hit[1] > time.time():
+            TOKEN_CACHE.move_to_end(key) # LRU: chal rahe games ke avatars peeche nahi chhootte
+            return hit[0]
+    d = TOKEN_SIZE + 2 * TOKEN_BORDER
+    face = Image.new("RGB", (d, d), color)
+    got = utils.draw_circle_avatar(face, url, TOKEN_BORDER, TOKEN_BORDER, TOKEN_SIZE)
+    mask = Image.new("L", (d, d), 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, d - 1, d - 1), fill=255)
+    sprite = face.convert("RGBA")
+    sprite.putalpha(mask)
+    with _token_lock:
+        # fallback disc short TTL pe: har roll pe 5s fetch bhi nahi, aur avatar wapas aaye to asli token
+        TOKEN_CACHE[key] = (sprite, float("inf") if got else time.time() + TOKEN_MISS_TTL)
+        TOKEN_CACHE.move_to_end(key)
+        while len(TOKEN_CACHE) > MAX_TOKEN_CACHE: TOKEN_CACHE.popitem(last=False)
+    return sprite
+
+def prepare_tokens(avatars):
+    """Join pe background me dono sprites bana do, taaki pehla roll bhi sirf paste kare"""
+    for p_num, url in avatars.items():
+        if url: token_sprite(url, P_COLORS[p_num])
+
+def draw_board(data):
+    canvas = BOARD_CACHE.copy() if BOARD_CACHE else utils.create_canvas(B_SIZE, B_SIZE, (30,30,30))
+    if SHOW_TRAILS and data.get('trails'):
+        draw = ImageDraw.Draw(canvas)
+        for start in data['trails']:
+            kind, line, head = TRAILS[start]
+            draw.line(line, fill=TRAIL_COLORS[kind], width=4)
+            draw.polygon(head, fill=TRAIL_COLORS[kind])
+    half = TOKEN_SIZE // 2 + TOKEN_BORDER
+    for p_num in ("P1", "P2"):
+        if not data['avatars'][p_num]: continue # purane jaisa: avatar nahi to token nahi
+        sprite = token_sprite(data['avatars'][p_num], P_COLORS[p_num])
+        x, y = get_coords(data['pos'][p_num], p_num, data['pos'])
+        canvas.paste(sprite, (x - half, y - half), sprite)
+    return canvas
+
+WINNER_CARD = card_template.CardTemplate("sl_winner", (400, 400), bg=(17,24,39), static=[
+    {"type": "gradient", "start": (17,24,39), "end": (20, 80, 20)},
+    {"type": "text", "xy": (200, 230), "text": "👑 CHAMPION", "font": ("arial.ttf", 20), "fill": "gold", "anchor": "mm"},
+], fields=[
+    {"type": "avatar", "url": "$av", "xy": (125, 50), "size": 150, "border": (255,215,0), "border_width": 5},
+    {"type": "text", "xy": (200, 275), "text": "$name", "font": ("arial.ttf", 35), "min_size": 22, "max_w": 370, "anchor": "mm"},
+    {"type": "text", "xy": (200, 320), "format": "Coins: +{amt}", "font": ("arial.ttf", 20), "fill": "cyan", "anchor": "mm"},
+])
+
+def draw_winner(info):
+    return WINNER_CARD.render(info)
+
+def text_board(snap):
+    """Image late ho to ye compact position line turant jati hai"""
+    return f"🟣 {snap['names']['P1']}: {snap['pos']['P1']} | 🔵 {snap['names']['P2']}: {snap['pos']['P2']}"
+
+class SnakeLadderGame(game_session.GameSession):
+    game = "snake_ladder"
+    kind = "photo" # board khud ek photo hai, isliye JPEG
+    prefix = "sl"
+    initial = "MODE_SELECT"
+    TRANSITIONS = {
+        "MODE_SELECT": {"PLAYING", "BET_TYPE"},
+        "BET_TYPE": {"BET_AMT", "WAITING"},
+        "BET_AMT": {"WAITING"},
+        "WAITING": {"PLAYING"},
+    }
+    CHECKPOINT_FIELDS = ("players", "names", "avatars", "pos", "turn", "mode", "bet")
 
-class SnakeLadderGame:
     def __init__(self, bot, room, creator_id, creator_name, icon):
-        self.bot, self.room, self.creator = bot, room, creator_id
-        self.lock = threading.Lock()
-        self.players = {"P1": creator_id, "P2": None}
+        super().__init__(bot, room, creator_id)
+        self.players = {"P1": self.creator, "P2": None}
         self.names = {"P1": creator_name, "P2": None}
         self.avatars = {"P1": icon, "P2": ""}
         self.pos = {"P1": 1, "P2": 1}
-        self.turn, self.status, self.mode, self.bet, self.timer = "P1", "MODE_SELECT", None, 0, None
+        self.turn, self.mode, self.bet = "P1", None, 0
+
+    def on_start(self):
         self.reset_timer(120, "inactivity")
-        self.bot.send_message(self.room, "🐍 **Snake & Ladders**\n`1` Single Player\n`2` Multiplayer")
-
-    def get_coords(self, pos, p_num):
-        idx = pos - 1
-        row, col = idx // 10, idx % 10
-        if row % 2 == 1: col = 9 - col
-        x, y = col * 40 + 20, (9 - row) * 40 + 20
-        if self.pos["P1"] == self.pos["P2"] and pos > 1:
-            return (x-8, y-8) if p_num == "P1" else (x+8, y+8)
-        return (x, y)
-
-    def send_game_update(self, text):
-        snap = {'pos': self.pos.copy(), 'names': self.names.copy(), 'turn': self.turn, 'avatars': self.avatars.copy()}
-        sl_executor.submit(self._bg_task, snap, text, False, None)
-
-    def _bg_task(self, snap, text, is_win, info):
-        try:
-            img = self.draw_winner(info) if is_win else self.draw_board(snap)
-            # Yahan humne naya Fast JPEG Uploader use kiya hai
-            url = upload_fast_jpeg(img)
-            if url:
-                self.bot.send_image(self.room, url)
-                self.bot.send_message(self.room, text)
-            else:
-                self.bot.send_message(self.room, f"{text}\n[P1: {snap['pos']['P1']} | P2: {snap['pos']['P2']}]")
-        except: pass
-        finally: gc.collect()
-
-    def draw_board(self, data):
-        canvas = BOARD_CACHE.copy() if BOARD_CACHE else utils.create_canvas(B_SIZE, B_SIZE, (30,30,30))
-        p1 = self.get_coords(data['pos']['P1'], "P1")
-        utils.draw_circle_avatar(canvas, data['avatars']['P1'], p1[0]-14, p1[1]-14, 28, (255,16,240), 2)
-        p2 = self.get_coords(data['pos']['P2'], "P2")
-        utils.draw_circle_avatar(canvas, data['avatars']['P2'], p2[0]-14, p2[1]-14, 28, (44,255,255), 2)
-        return canvas
-
-    def draw_winner(self, info):
-        canvas = utils.create_canvas(400, 400, (17,24,39))
-        utils.draw_gradient_bg(canvas, (17,24,39), (20, 80, 20))
-        draw = ImageDraw.Draw(canvas)
-        utils.draw_circle_avatar(canvas, info['av'], 125, 50, 150, (255,215,0), 5)
-        f_m, f_s = utils.get_font("arial.ttf", 35), utils.get_font("arial.ttf", 20)
-        draw.text((200, 230), "👑 CHAMPION", font=f_s, fill="gold", anchor="mm")
-        draw.text((200, 275), info['name'], font=f_m, fill="white", anchor="mm")
-        draw.text((200, 320), f"Coins: +{info['amt']}", font=f_s, fill="cyan", anchor="mm")
-        return canvas
-
-    def process_input(self, cmd, uid, name, icon):
-        with self.lock:
-            if self.status == "MODE_SELECT" and uid == self.creator:
-                if cmd == "1":
-                    self.mode, self.players['P2'], self.names['P2'], self.status = "single", "BOT", "Bot 🤖", "PLAYING"
-                    self.avatars['P2'] = "https://robohash.org/bot"
-                    self.send_game_update("🎮 **Match Started!** Type `roll`.")
-                    self.reset_timer(120, "turn")
-                elif cmd == "2":
-                    self.mode, self.status = "multi", "BET_TYPE"
-                    self.bot.send_message(self.room, "⚖️ **Multiplayer**\n`1` With Bet\n`2` No Bet")
-                return True
-
-            if self.status == "BET_TYPE" and uid == self.creator:
-                if cmd == "1": self.status = "BET_AMT"; self.bot.send_message(self.room, "💰 Enter Bet Amount:")
-                elif cmd == "2": self.bet, self.status = 0, "WAITING"; self.bot.send_message(self.room, "⚔️ Fun Mode! Type `join`.")
-                return True
-
-            if self.status == "BET_AMT" and uid == self.creator and cmd.isdigit():
-                amt = int(cmd)
-                if amt > get_balance(uid): self.bot.send_message(self.room, "❌ Low Balance!"); return True
-                self.bet, self.status = amt, "WAITING"
-                self.bot.send_message(self.room, f"⚔️ Betting {amt}. Type `join`.")
-                return True
-
-            if self.status == "WAITING" and cmd == "join":
-                if uid == self.creator: return True
-                if self.bet > get_balance(uid): self.bot.send_message(self.room, "❌ Low Balance!"); return True
-                self.players['P2'], self.names['P2'], self.avatars['P2'], self.status = uid, name, icon, "PLAYING"
-                self.send_game_update(f"⚔️ **Match On!** @{self.names['P1']} vs @{name}")
-                self.reset_timer(120, "turn")
-                return True
-
-            if self.status == "PLAYING" and cmd in ["roll", "!roll"]:
-                if uid != self.players[self.turn]: return False
-                dice = random.randint(1, 6)
-                old = self.pos[self.turn]
-                new = old + dice
-                msg = f"🎲 @{self.names[self.turn]} rolled {dice}."
-                if new > 100: new = old; msg += " (Need exact 100)"
-                else:
-                    if new in LADDERS: new = LADDERS[new]; msg += " 🪜 Ladder!"
-                    elif new in SNAKES: new = SNAKES[new]; msg += " 🐍 Snake!"
-                self.pos[self.turn] = new
-                if new == 100: self.finalize(self.turn); return True
-                self.turn = "P2" if self.turn == "P1" else "P1"
-                if self.mode == "single" and self.turn == "P2":
-                    bd = random.randint(1, 6)
-                    bn = self.pos["P2"] + bd
-                    if bn <= 100:
-                        if bn in LADDERS: bn = LADDERS[bn]
-                        elif bn in SNAKES: bn = SNAKES[bn]
-                        self.pos["P2"] = bn
-                    if self.pos["P2"] == 100: self.finalize("P2"); return True
-                    self.turn = "P1"; msg += f"\n🤖 Bot rolled {bd}. Now at {self.pos['P2']}."
-                self.send_game_update(f"{msg}\nNext: @{self.names[self.turn]}")
-                self.reset_timer(120, "turn")
-                return True
-        return False
+        sl_executor.submit(prepare_tokens, self.avatars.copy())
+        self.say("🐍 **Snake & Ladders**\n`1` Single Player\n`2` Multiplayer")
+
+    def on_restore(self):
+        sl_executor.submit(prepare_tokens, self.avatars.copy())
+
+    def on_timeout(self, reason):
+        if reason == "inactivity": self.say("⚠️ Timeout."); self.end()
+        else: self.finalize("P2" if self.turn == "P1" else "P1")
+
+    def send_game_update(self, text, trails=()):
+        snap = {'pos': self.pos.copy(), 'names': self.names.copy()}
+        scene = {'pos': snap['pos'], 'avatars': self.avatars.copy()}
+        if trails: scene['trails'] = list(trails) # is roll ke ladder/snake start squares
+        self.show(draw_board, scene, text, text_board(snap))
+
+    # --- STATES ---
+    def on_mode_select(self, cmd, uid, name, icon):
+        if uid != self.creator: return False
+        if cmd == "1":
+            self.mode, self.players['P2'], self.names['P2'] = "single", "BOT", "Bot 🤖"
+            self.avatars['P2'] = "https://robohash.org/bot"
+            self.goto("PLAYING")
+            sl_executor.submit(prepare_tokens, {'P2': self.avatars['P2']})
+            self.send_game_update("🎮 **Match Started!** Type `roll`.")
+            self.reset_timer(120, "turn")
+        elif cmd == "2":
+            self.mode = "multi"; self.goto("BET_TYPE")
+            self.say("⚖️ **Multiplayer**\n`1` With Bet\n`2` No Bet")
+        return True
+
+    def on_bet_type(self, cmd, uid, name, icon):
+        if uid != self.creator: return False
+        if cmd == "1": self.goto("BET_AMT"); self.say("💰 Enter Bet Amount:")
+        elif cmd == "2": self.bet = 0; self.goto("WAITING"); self.say("⚔️ Fun Mode! Type `join`.")
+        return True
+
+    def on_bet_amt(self, cmd, uid, name, icon):
+        if uid != self.creator or not cmd.isdigit(): return False
+        amt = int(cmd)
+        if amt > get_balance(uid): self.say("❌ Low Balance!"); return True
+        self.bet = amt; self.goto("WAITING")
+        self.say(f"⚔️ Betting {amt}. Type `join`.")
+        return True
+
+    def on_waiting(self, cmd, uid, name, icon):
+        if cmd != "join": return False
+        if uid == self.creator: return True
+        if self.bet > get_balance(uid): self.say("❌ Low Balance!"); return True
+        self.players['P2'], self.names['P2'], self.avatars['P2'] = uid, name, icon
+        self.enroll(uid)
+        self.goto("PLAYING")
+        sl_executor.submit(prepare_tokens, {'P2': icon})
+        self.send_game_update(f"⚔️ **Match On!** @{self.names['P1']} vs @{name}")
+        self.reset_timer(120, "turn")
+        return True
+
+    def on_playing(self, cmd, uid, name, icon):
+        if cmd not in ["roll", "!roll"] or uid != self.players[self.turn]: return False
+        dice = random.randint(1, 6)
+        old = self.pos[self.turn]
+        new = old + dice
+        msg = f"🎲 @{self.names[self.turn]} rolled {dice}."
+        trails = []
+        if new > 100: new = old; msg += " (Need exact 100)"
+        else:
+            if new in TRAILS: trails.append(new)
+            if new in LADDERS: new = LADDERS[new]; msg += " 🪜 Ladder!"
+            elif new in SNAKES: new = SNAKES[new]; msg += " 🐍 Snake!"
+        self.pos[self.turn] = new
+        if new == 100: self.finalize(self.turn); return True
+        self.turn = "P2" if self.turn == "P1" else "P1"
+        if self.mode == "single" and self.turn == "P2":
+            bd = random.randint(1, 6)
+            bn = self.pos["P2"] + bd
+            if bn <= 100:
+                if bn in TRAILS: trails.append(bn)
+                if bn in LADDERS: bn = LADDERS[bn]
+                elif bn in SNAKES: bn = SNAKES[bn]
+                self.pos["P2"] = bn
+            if self.pos["P2"] == 100: self.finalize("P2"); return True
+            self.turn = "P1"; msg += f"\n🤖 Bot rolled {bd}. Now at {self.pos['P2']}."
+        self.send_game_update(f"{msg}\nNext: @{self.names[self.turn]}", trails)
+        self.reset_timer(120, "turn")
+        return True
 
     def finalize(self, win_sym):
         w_uid, amt = self.players[win_sym], self.bet
         if self.mode == "single": amt = 1000 if win_sym == "P1" else 0
-        db.add_game_result(w_uid, self.names[win_sym], "snake_ladder", amt, True)
+        self.settle(db.add_game_result, w_uid, self.names[win_sym], "snake_ladder", amt, True, avatar=self.avatars[win_sym])
         if self.mode == "multi":
             loser = "P2" if win_sym == "P1" else "P1"
-            db.add_game_result(self.players[loser], self.names[loser], "snake_ladder", -amt, False)
+            self.settle(db.add_game_result, self.players[loser], self.names[loser], "snake_ladder", -amt, False, avatar=self.avatars[loser])
         info = {'name': self.names[win_sym], 'av': self.avatars[win_sym], 'amt': amt}
-        sl_executor.submit(self._bg_task, None, f"🏆 @{info['name']} reached 100!", True, info)
-        self.cleanup()
-
-    def reset_timer(self, sec, res):
-        if self.timer: self.timer.cancel()
-        self.timer = threading.Timer(sec, self.timeout_task, [res])
-        self.timer.daemon = True
-        self.timer.start()
-
-    def timeout_task(self, reason):
-        with self.lock:
-            if self.status == "ENDED": return
-            if reason == "inactivity": self.bot.send_message(self.room, "⚠️ Timeout."); self.cleanup()
-            else: self.finalize("P2" if self.turn == "P1" else "P1")
-
-    def cleanup(self):
-        self.status = "ENDED"
-        if self.timer: self.timer.cancel()
-        if self.room in active_sl: del active_sl[self.room]
-
-active_sl = {}
+        self.show(draw_winner, info, f"🏆 @{info['name']} reached 100!", final=True)
+        self.end()
+
 def handle_command(bot, command, room_name, user, args, data):
-    cmd, uid = command.lower().strip(), str(data.get("user_id", user))
-    icon = data.get("avatar_url", data.get("icon", ""))
+    cmd = command.lower().strip()
+    uid, icon = game_session.player(data, user)
     if cmd == "sl":
         if args and args[0] == "1":
-            if room_name in active_sl: return True
-            active_sl[room_name] = SnakeLadderGame(bot, room_name, uid, user, icon)
+            if not game_session.REGISTRY.start(SnakeLadderGame(bot, room_name, uid, user, icon)):
+                bot.send_message(room_name, "⚠️ You already have a game running (or the room is full)!")
             return True
         if args and args[0] == "0":
-            if room_name in active_sl: active_sl[room_name].cleanup(); bot.send_message(room_name, "🛑 Stopped.")
+            if game_session.stop(room_name, SnakeLadderGame.game, uid): bot.send_message(room_name, "🛑 Stopped.")
             return True
-    if room_name in active_sl: return active_sl[room_name].process_input(cmd, uid, user, icon)
-    return False
+    return game_session.route(room_name, SnakeLadderGame.game, cmd, uid, user, icon)
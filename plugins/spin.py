@@ -1,7 +1,7 @@
+import os
 import time
 import threading
 import random
-import gc
 import io
 import math
 import concurrent.futures
@@ -10,6 +10,8 @@ from PIL import Image, ImageDraw, ImageFont
 # Local imports
 import utils
 import db
+import render_pool
+import game_session
 
 # --- CONFIGURATION ---
 WHEEL_SIZE = 400
@@ -26,10 +28,24 @@ SEGMENTS = [
     (10.0, "#fbbf24", "10x"),  # Gold (JACKPOT)
 ]
 
+# --- 🎞️ ANIMATION CONFIG ---
+SPIN_ANIM = os.environ.get("SPIN_ANIM", "1") == "1" # 0 = sirf static wheel
+ANIM_SIZE = int(os.environ.get("SPIN_ANIM_SIZE", 240)) # GIF chhota rakho, busy rooms me bhi sasta
+STEPS_PER_SEG = 10 # frame bank: har segment ke 10 rotations -> 80 frames (4.5° step)
+ANIM_FRAMES = 30 # ek spin me itne frames select hote hain (duplicate merge ke baad kam)
+ANIM_TURNS = 2 # result se pehle poore chakkar
+ANIM_FRAME_MS = 60
+ANIM_HOLD_MS = 2000 # aakhri frame (result) pe ruko
+WHEEL_COLORS = 128 # shared palette: 0-127 wheel, 128-255 har spin ka avatar
+
 spin_executor = concurrent.futures.ThreadPoolExecutor(max_workers=10)
+_BANK = {}
+_bank_lock = threading.Lock()
 
 def setup(bot):
     bot.log("🎡 Spin & Win Plugin Loaded")
+    restored = game_session.restore(bot, SpinGame)
+    if restored: bot.log(f"♻️ Spin: {restored} spins restored")
 
 def get_balance(uid):
     try:
@@ -42,76 +58,159 @@ def get_balance(uid):
         return row[0] if row else 0
     except: return 0
 
+# ==========================================
+# 🎨 GRAPHICS (scene dict -> image, render_pool ke liye module-level)
+# ==========================================
+def wheel_offset(step):
+    """Bank step -> rotation. Step k*STEPS_PER_SEG + STEPS_PER_SEG//2 pe segment k ka beech pointer ke neeche."""
+    return -90 - step * (360 / len(SEGMENTS)) / STEPS_PER_SEG
+
+def draw_wheel_base(offset):
+    """Segments + labels + pointer (avatar ke bina) given rotation pe"""
+    canvas = Image.new("RGB", (WHEEL_SIZE, WHEEL_SIZE), (17, 24, 39))
+    draw = ImageDraw.Draw(canvas)
+    angle_per_seg = 360 / len(SEGMENTS)
+    for i, (mult, color, label) in enumerate(SEGMENTS):
+        start_ang = offset + (i * angle_per_seg)
+        end_ang = start_ang + angle_per_seg
+        
+        # Draw Segment Arc
+        draw.pieslice([10, 10, 390, 390], start=start_ang, end=end_ang, fill=color, outline="white", width=2)
+        
+        # Draw Label (Text Mapping)
+        rad_angle = math.radians(start_ang + (angle_per_seg / 2))
+        tx = CENTER + 130 * math.cos(rad_angle)
+        ty = CENTER + 130 * math.sin(rad_angle)
+        
+        font = utils.get_font("arial.ttf", 20)
+        draw.text((tx, ty), label, font=font, fill="white", anchor="mm")
+
+    # Pointer (Top Triangle)
+    draw.polygon([(CENTER-15, 0), (CENTER+15, 0), (CENTER, 30)], fill="white")
+    return canvas
+
+def draw_wheel(scene):
+    """Static wheel: result segment ka beech pointer ke neeche (pehle border pe rukta tha)"""
+    result_index = scene.get('result')
+    step = result_index * STEPS_PER_SEG + STEPS_PER_SEG // 2 if result_index is not None else 0
+    canvas = draw_wheel_base(wheel_offset(step))
+    # Center User DP
+    utils.draw_circle_avatar(canvas, scene.get('icon'), CENTER-40, CENTER-40, 80, border_color="white", border_width=3)
+    return canvas
+
+# ==========================================
+# 🎞️ ANIMATED SPIN (precomputed frame bank)
+# ==========================================
+def frame_bank():
+    """Har rotation step ka wheel ek baar raster + ek shared palette me quantize (per process)"""
+    if "frames" in _BANK: return _BANK
+    with _bank_lock:
+        if "frames" in _BANK: return _BANK
+        steps = len(SEGMENTS) * STEPS_PER_SEG
+        rgb = [draw_wheel_base(wheel_offset(k)).resize((ANIM_SIZE, ANIM_SIZE), Image.Resampling.LANCZOS) for k in range(steps)]
+        pal_img = rgb[0].quantize(colors=WHEEL_COLORS, method=Image.Quantize.FASTOCTREE)
+        palette = (pal_img.getpalette() + [0] * 768)[:WHEEL_COLORS * 3]
+        pal_img.putpalette(palette)
+        _BANK["palette"] = palette
+        _BANK["frames"] = [im.quantize(palette=pal_img, dither=Image.Dither.NONE) for im in rgb]
+    return _BANK
+
+def warm_render():
+    """Render worker start pe frame bank bana lo"""
+    if SPIN_ANIM: frame_bank()
+
+def spin_schedule(result_index):
+    """Ease-out (cubic) rotation -> [(bank step, duration ms)]. Same bank step repeat ho to merge."""
+    steps = len(SEGMENTS) * STEPS_PER_SEG
+    total = ANIM_TURNS * steps + result_index * STEPS_PER_SEG + STEPS_PER_SEG // 2
+    out = []
+    for i in range(ANIM_FRAMES):
+        t = i / (ANIM_FRAMES - 1)
+        k = round(total * (1 - (1 - t) ** 3)) % steps
+        if out and out[-1][0] == k: out[-1][1] += ANIM_FRAME_MS
+        else: out.append([k, ANIM_FRAME_MS])
+    out[-1][1] += ANIM_HOLD_MS
+    return out
+
+def anim_duration_ms(result_index):
+    return sum(ms for _, ms in spin_schedule(result_index)) - ANIM_HOLD_MS
+
+def _avatar_patch(icon, size, palette):
+    """Avatar ek baar raster + quantize, indices 128+ pe shift -> (P patch, mask, merged palette)"""
+    d = size + 4
+    rgb = Image.new("RGB", (d, d), "white") # border
+    utils.draw_circle_avatar(rgb, icon, 2, 2, size)
+    av = rgb.quantize(colors=256 - WHEEL_COLORS, method=Image.Quantize.FASTOCTREE)
+    merged = palette + (av.getpalette() + [0] * 768)[:(256 - WHEEL_COLORS) * 3]
+    patch = Image.frombytes("P", (d, d), bytes(v + WHEEL_COLORS for v in av.tobytes()))
+    patch.putpalette(merged)
+    mask = Image.new("L", (d, d), 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, d - 1, d - 1), fill=255)
+    return patch, mask, merged
+
+def draw_spin_anim(scene):
+    """Animated spin frames ("anim" kind): bank se frame selection + har frame pe ek avatar paste"""
+    bank = frame_bank()
+    overlay = None
+    if scene.get('icon'):
+        size = ANIM_SIZE * 80 // WHEEL_SIZE
+        patch, mask, merged = _avatar_patch(scene['icon'], size, bank["palette"])
+        overlay = (patch, (ANIM_SIZE - patch.width) // 2, mask, merged)
+    frames = []
+    for k, ms in spin_schedule(scene['result']):
+        frame = bank["frames"][k].copy()
+        if overlay:
+            patch, xy, mask, merged = overlay
+            frame.putpalette(merged)
+            frame.paste(patch, (xy, xy), mask)
+        frame.info["duration"] = ms
+        frames.append(frame)
+    return frames
+
 # ==========================================
 # 📦 SPIN GAME CLASS
 # ==========================================
-class SpinGame:
+class SpinGame(game_session.GameSession):
+    game = "spin"
+    prefix = "spin"
+    initial = "BET_WAIT"
+    TRANSITIONS = {"BET_WAIT": {"SPINNING"}}
+    CHECKPOINT_FIELDS = ("uid", "name", "icon", "bet", "result")
+    result = None # SEGMENTS index, bet lagte hi roll + checkpoint (restore pe wahi result, dobara roll nahi)
+
     def __init__(self, bot, room, uid, name, icon):
-        self.bot, self.room, self.uid, self.name, self.icon = bot, room, uid, name, icon
-        self.status = "BET_WAIT"
+        super().__init__(bot, room, uid)
+        self.uid, self.name, self.icon = self.creator, name, icon
         self.bet = 0
-        self.lock = threading.Lock()
-        self.timer = None
+
+    def on_start(self):
         self.reset_timer(120)
-        self.bot.send_message(self.room, f"🎡 **Lucky Spin Started!**\n@{name} Enter bet amount (e.g. 100):")
-
-    def reset_timer(self, sec):
-        if self.timer: self.timer.cancel()
-        self.timer = threading.Timer(sec, self.cleanup)
-        self.timer.daemon = True
-        self.timer.start()
-
-    def draw_wheel(self, result_index=None):
-        """Wheel draw karne ka math logic"""
-        canvas = Image.new("RGB", (WHEEL_SIZE, WHEEL_SIZE), (17, 24, 39))
-        draw = ImageDraw.Draw(canvas)
-        
-        num_seg = len(SEGMENTS)
-        angle_per_seg = 360 / num_seg
-        
-        # Result ke hisab se rotation (Pointer hamesha TOP pe rahega)
-        # Agar result_index 0 hai, to 0th segment top pe aana chahiye
-        offset = -90 - (result_index * angle_per_seg) if result_index is not None else -90
-        
-        for i, (mult, color, label) in enumerate(SEGMENTS):
-            start_ang = offset + (i * angle_per_seg)
-            end_ang = start_ang + angle_per_seg
-            
-            # Draw Segment Arc
-            draw.pieslice([10, 10, 390, 390], start=start_ang, end=end_ang, fill=color, outline="white", width=2)
-            
-            # Draw Label (Text Mapping)
-            rad_angle = math.radians(start_ang + (angle_per_seg / 2))
-            tx = CENTER + 130 * math.cos(rad_angle)
-            ty = CENTER + 130 * math.sin(rad_angle)
-            
-            font = utils.get_font("arial.ttf", 20)
-            draw.text((tx, ty), label, font=font, fill="white", anchor="mm")
-
-        # 3. Center User DP
-        utils.draw_circle_avatar(canvas, self.icon, CENTER-40, CENTER-40, 80, border_color="white", border_width=3)
-        
-        # 4. Pointer (Top Triangle)
-        draw.polygon([(CENTER-15, 0), (CENTER+15, 0), (CENTER, 30)], fill="white")
-        
-        return canvas
-
-    def process(self, cmd):
-        with self.lock:
-            if self.status == "BET_WAIT":
-                if not cmd.isdigit(): return False
-                amt = int(cmd)
-                bal = get_balance(self.uid)
-                if amt <= 0: return True
-                if amt > bal:
-                    self.bot.send_message(self.room, f"❌ Low Balance! (Coins: {bal})")
-                    return True
-                
-                self.bet = amt
-                self.status = "SPINNING"
-                self.start_spin()
-                return True
-        return False
+        self.say(f"🎡 **Lucky Spin Started!**\n@{self.name} Enter bet amount (e.g. 100):")
+
+    def on_restore(self):
+        # Restart spin ke beech hua: checkpoint abhi bhi hai = settle nahi hua (settle se pehle delete
+        # flush hota hai), to wahi result dobara dikhao + settle
+        if self.status != "SPINNING": return
+        if self.result is None: # purana checkpoint (result ke bina) - koi coins nahi kate the, bas khatam
+            self.say(f"⚠️ @{self.name} your spin was interrupted. Bet refunded, spin again!")
+            self.end()
+            return
+        self.start_spin()
+
+    def on_bet_wait(self, cmd, uid, name, icon):
+        if uid != self.uid or not cmd.isdigit(): return False
+        amt = int(cmd)
+        bal = get_balance(self.uid)
+        if amt <= 0: return True
+        if amt > bal:
+            self.say(f"❌ Low Balance! (Coins: {bal})")
+            return True
+
+        self.bet = amt
+        self.result = random.randint(0, len(SEGMENTS)-1) # handle() isko checkpoint karta hai
+        self.goto("SPINNING")
+        self.start_spin()
+        return True
 
     def start_spin(self):
         """Background thread me spin process karo"""
@@ -119,77 +218,64 @@ class SpinGame:
 
     def _spin_task(self):
         try:
-            # Result Decide Karo
-            res_idx = random.randint(0, len(SEGMENTS)-1)
+            res_idx = self.result
             multiplier, color, label = SEGMENTS[res_idx]
             win_amt = int(self.bet * multiplier)
-            
-            # Draw & Upload
-            img = self.draw_wheel(res_idx)
-            
-            # Fast JPEG upload taaki turant dikhe
-            buf = io.BytesIO()
-            img.save(buf, format='JPEG', quality=80)
-            buf.seek(0)
-            
-            import uuid
-            files = {'reqtype': (None, 'fileupload'), 'fileToUpload': (f'spin_{uuid.uuid4().hex}.jpg', buf, 'image/jpeg')}
-            r = requests.post('https://catbox.moe/user/api.php', files=files, timeout=30)
-            
-            if r.status_code == 200:
-                url = r.text.strip()
+
+            # Draw & Upload - pehle animation (same result + avatar = same GIF, cache se),
+            # cap/budget fail ho to static wheel (flat colors, palette PNG)
+            scene = {'result': res_idx, 'icon': self.icon}
+            url = None
+            if SPIN_ANIM:
+                try: url = render_pool.publish(draw_spin_anim, scene, "anim", prefix=self.prefix, room=self.room)
+                except Exception as e: print(f"Spin Anim Error: {e}")
+            if url:
                 self.bot.send_image(self.room, url)
-            
+                time.sleep(anim_duration_ms(res_idx) / 1000) # result message wheel rukne ke baad
+            else:
+                url = render_pool.publish(draw_wheel, scene, "flat", prefix=self.prefix, room=self.room)
+                if url: self.bot.send_image(self.room, url)
+
+            # Pehle checkpoint delete DB me, phir settle: crash beech me ho to restore dobara pay nahi karta
+            # (bet pehle se kati nahi hoti, to chhoota hua settle = refund)
+            with self.lock: self.end()
+            game_session.flush_checkpoints()
+
             # Final result message
             if multiplier > 1:
                 msg = f"🔥 **JACKPOT!** @{self.name} won **{win_amt}** coins! ({label})"
-                db.add_game_result(self.uid, self.name, "spin", win_amt - self.bet, True)
+                self.settle(db.add_game_result, self.uid, self.name, "spin", win_amt - self.bet, True, avatar=self.icon)
             elif multiplier == 1:
                 msg = f"😐 **Neutral!** No loss, no gain. ({label})"
             elif multiplier > 0:
                 loss = self.bet - win_amt
                 msg = f"📉 **Partial Win!** @{self.name} got **{win_amt}** back. ({label})"
-                db.add_game_result(self.uid, self.name, "spin", -loss, False)
+                self.settle(db.add_game_result, self.uid, self.name, "spin", -loss, False, avatar=self.icon)
             else:
                 msg = f"💀 **RIP!** @{self.name} lost everything. ({label})"
-                db.add_game_result(self.uid, self.name, "spin", -self.bet, False)
-            
-            self.bot.send_message(self.room, msg)
-            
+                self.settle(db.add_game_result, self.uid, self.name, "spin", -self.bet, False, avatar=self.icon)
+
+            self.say(msg)
+
         except Exception as e:
-            self.bot.send_message(self.room, "⚠️ Spin failed.")
+            self.say("⚠️ Spin failed.")
             print(f"Spin Error: {e}")
         finally:
-            self.cleanup()
-
-    def cleanup(self):
-        if self.timer: self.timer.cancel()
-        if self.room in active_spins:
-            del active_spins[self.room]
-        gc.collect()
+            with self.lock: self.end()
 
 # --- GLOBAL HANDLER ---
-active_spins = {}
-
 def handle_command(bot, command, room_name, user, args, data):
     cmd = command.lower().strip()
-    uid = str(data.get("user_id", user))
-    icon = data.get("avatar_url", data.get("icon", ""))
+    uid, icon = game_session.player(data, user)
 
     if cmd == "spin":
         if args and args[0] == "1":
-            if room_name in active_spins: return True
-            active_spins[room_name] = SpinGame(bot, room_name, uid, user, icon)
+            if not game_session.REGISTRY.start(SpinGame(bot, room_name, uid, user, icon)):
+                bot.send_message(room_name, "⚠️ You already have a game running (or the room is full)!")
             return True
         if args and args[0] == "0":
-            if room_name in active_spins: 
-                active_spins[room_name].cleanup()
+            if game_session.stop(room_name, SpinGame.game, uid):
                 bot.send_message(room_name, "🛑 Spin stopped.")
             return True
 
-    if room_name in active_spins:
-        return active_spins[room_name].process(cmd)
-
-    return False
-
-import requests # Required for uploader
+    return game_session.route(room_name, SpinGame.game, cmd, uid, user, icon)
@@ -1,9 +1,12 @@
 import threading
-import gc
+import time
 import io
+from collections import OrderedDict
 from PIL import Image, ImageDraw, ImageFont
 import db
 import utils
+import render_pool
+import card_template
 
 # --- RANKING SYSTEM ---
 RANKS = [
@@ -22,51 +25,165 @@ def get_rank_info(score):
     return RANKS[0][1], RANKS[0][2]
 
 def setup(bot):
+    db.on_result("stats.profile", _on_result)
     bot.log("📊 Advanced Stats & Profile System Loaded")
 
 # ==========================================
-# 🖼️ IMAGE GENERATOR: PROFILE CARD
+# ♻️ PROFILE CARD CACHE
 # ==========================================
-def draw_profile_card(user_name, icon, score, wins, rank_pos):
-    W, H = 600, 350
-    canvas = utils.create_canvas(W, H, color=(17, 24, 39))
-    utils.draw_gradient_bg(canvas, (17, 24, 39), (31, 41, 55))
-    draw = ImageDraw.Draw(canvas)
+# uid -> {"card": jo values card pe dikhti hain, "url": hosted card, "at": ts}.
+# Entry tab tak valid hai jab tak add_game_result is user ko touch na kare, ya kisi aur ka
+# score is user ke score ke aar-paar na jaye (tab rank_pos badalta hai). Hit pe koi query nahi.
+PROFILE_CACHE = OrderedDict()
+MAX_PROFILE_CACHE = 1000
+PROFILE_CACHE_TTL = 600 # DB ko koi aur (admin/manual) badle to bhi itne me refresh
+PROFILE_STATS = {"hits": 0, "misses": 0, "invalidated": 0}
+profile_lock = threading.Lock()
+_profile_gen = [0] # har invalidation pe +1; queries ke beech score badla ho to purana card save mat karo
 
-    # Rank Info
-    rank_title, rank_color = get_rank_info(score)
+def cached_profile(uid, name, icon):
+    with profile_lock:
+        entry = PROFILE_CACHE.get(uid)
+        if not entry or entry["card"]["name"] != name or entry["card"]["icon"] != icon \
+                or time.time() - entry["at"] > PROFILE_CACHE_TTL:
+            PROFILE_STATS["misses"] += 1
+            return None
+        PROFILE_CACHE.move_to_end(uid)
+        PROFILE_STATS["hits"] += 1
+        return entry["url"]
 
-    # 1. Circle Avatar
-    utils.draw_circle_avatar(canvas, icon, 40, 50, 180, border_color=rank_color, border_width=5)
+def remember_profile(uid, card, url, gen):
+    with profile_lock:
+        if gen != _profile_gen[0]: return
+        PROFILE_CACHE[uid] = {"card": card, "url": url, "at": time.time()}
+        PROFILE_CACHE.move_to_end(uid)
+        while len(PROFILE_CACHE) > MAX_PROFILE_CACHE: PROFILE_CACHE.popitem(last=False)
 
-    # 2. Text Details
-    f_name = utils.get_font("arial.ttf", 40)
-    f_stats = utils.get_font("arial.ttf", 25)
-    f_rank = utils.get_font("arial.ttf", 22)
+def _shift(uid, old, new):
+    """uid ka score old -> new gaya (old None = naya user). rank_pos = 1 + count(score > s),
+    to sirf wahi cached cards badle jinka score s [lo, hi) ke beech hai."""
+    lo, hi = (min(old, new), max(old, new)) if old is not None else (float("-inf"), new)
+    with profile_lock:
+        stale = [k for k, e in PROFILE_CACHE.items() if k == uid or lo <= e["card"]["score"] < hi]
+        for k in stale: del PROFILE_CACHE[k]
+        PROFILE_STATS["invalidated"] += len(stale)
+        _profile_gen[0] += 1
 
-    # Name & Rank Title
-    draw.text((260, 60), user_name[:15], font=f_name, fill="white")
-    draw.text((260, 110), rank_title, font=f_rank, fill=rank_color)
+def _on_result(uid, new_score, amount):
+    _shift(uid, new_score - amount, new_score)
+    _leaderboard_touch(uid, new_score)
 
+# ==========================================
+# 🖼️ IMAGE GENERATOR: PROFILE CARD
+# ==========================================
+PROFILE_W, PROFILE_H = 600, 350
+PROFILE_CARD = card_template.CardTemplate("profile", (PROFILE_W, PROFILE_H), bg=(17, 24, 39), static=[
+    {"type": "gradient", "start": (17, 24, 39), "end": (31, 41, 55)},
+    {"type": "rect", "box": [260, 300, 550, 315], "fill": "#374151"}, # Level bar background
+], fields=[
+    # 1. Circle Avatar
+    {"type": "avatar", "url": "$icon", "xy": (40, 50), "size": 180, "border": "$rank_color", "border_width": 5},
+    # 2. Name & Rank Title (lamba naam -> chhota font, phir '…')
+    {"type": "text", "xy": (260, 80), "text": "$name", "font": ("arial.ttf", 40), "min_size": 24, "max_w": PROFILE_W - 280, "anchor": "lm"},
+    {"type": "text", "xy": (260, 110), "text": "$rank_title", "font": ("arial.ttf", 22), "max_w": PROFILE_W - 280, "fill": "$rank_color"},
     # Stats Section
-    draw.text((260, 170), f"💰 Coins: {score}", font=f_stats, fill="#e2e8f0")
-    draw.text((260, 210), f"🏆 Total Wins: {wins}", font=f_stats, fill="#e2e8f0")
-    draw.text((260, 250), f"🌎 Global Rank: #{rank_pos}", font=f_stats, fill=rank_color)
+    {"type": "text", "xy": (260, 170), "format": "💰 Coins: {score}", "font": ("arial.ttf", 25), "fill": "#e2e8f0"},
+    {"type": "text", "xy": (260, 210), "format": "🏆 Total Wins: {wins}", "font": ("arial.ttf", 25), "fill": "#e2e8f0"},
+    {"type": "text", "xy": (260, 250), "format": "🌎 Global Rank: #{rank_pos}", "font": ("arial.ttf", 25), "fill": "$rank_color"},
+    # 3. Progress Bar (next rank tak)
+    {"type": "bar", "box": [260, 300, 550, 315], "value": "$progress", "fill": "$rank_color"},
+])
 
-    # 3. Progress Bar (Level bar)
-    draw.rectangle([260, 300, 550, 315], fill="#374151") # Background bar
+def draw_profile_card(card):
+    score = card['score']
+    rank_title, rank_color = get_rank_info(score)
     # Logic for next rank progress
-    next_threshold = 5000
-    for t, t_name, t_col in RANKS:
-        if t > score:
-            next_threshold = t
-            break
-    
+    next_threshold = next((t for t, _, _ in RANKS if t > score), 5000)
     progress = min(1.0, score / next_threshold) if next_threshold > 0 else 1.0
-    bar_width = int(290 * progress)
-    draw.rectangle([260, 300, 260 + bar_width, 315], fill=rank_color)
+    return PROFILE_CARD.render(dict(card, rank_title=rank_title, rank_color=rank_color, progress=progress))
 
-    return canvas
+# ==========================================
+# 🏆 LEADERBOARD IMAGE
+# ==========================================
+TOP_N = 10
+LB_ROW_H = 62
+LB_W, LB_H = 600, 100 + TOP_N * LB_ROW_H
+POS_COLORS = ["#fbbf24", "#cbd5e1", "#d97706"] + ["#64748b"] * (TOP_N - 3) # gold, silver, bronze
+
+def _lb_layers():
+    static = [{"type": "gradient", "start": (17, 24, 39), "end": (31, 41, 55)},
+              {"type": "text", "xy": (LB_W // 2, 48), "text": "GLOBAL LEADERBOARD", "font": ("arial.ttf", 35), "fill": "#fbbf24", "anchor": "mm"}]
+    fields = []
+    for i in range(TOP_N):
+        y = 90 + i * LB_ROW_H
+        static += [{"type": "rect", "box": [20, y, LB_W - 20, y + LB_ROW_H - 6], "radius": 12, "fill": (31, 41, 55)},
+                   {"type": "text", "xy": (50, y + 28), "text": f"#{i+1}", "font": ("arial.ttf", 22), "fill": POS_COLORS[i], "anchor": "mm"}]
+        fields += [{"type": "avatar", "url": f"$av{i}", "xy": (82, y + 6), "size": 44, "border": f"$color{i}", "border_width": 2},
+                   {"type": "text", "xy": (142, y + 18), "text": f"$name{i}", "font": ("arial.ttf", 24), "min_size": 16, "max_w": 250, "anchor": "lm"},
+                   {"type": "text", "xy": (142, y + 42), "text": f"$title{i}", "font": ("arial.ttf", 14), "fill": f"$color{i}", "anchor": "lm"},
+                   {"type": "text", "xy": (LB_W - 40, y + 28), "text": f"$score{i}", "font": ("arial.ttf", 26), "fill": f"$color{i}", "anchor": "rm"}]
+    return static, fields
+
+_lb_static, _lb_fields = _lb_layers()
+LEADERBOARD_CARD = card_template.CardTemplate("leaderboard", (LB_W, LB_H), bg=(17, 24, 39), static=_lb_static, fields=_lb_fields)
+
+def draw_leaderboard(scene):
+    values = {}
+    for i in range(TOP_N):
+        name, score, avatar = scene['rows'][i] if i < len(scene['rows']) else ("", None, "")
+        title, color = get_rank_info(score) if score is not None else ("", RANKS[0][2])
+        values.update({f"name{i}": name, f"av{i}": avatar or "", f"title{i}": title, f"color{i}": color,
+                       f"score{i}": f"{score:,}" if score is not None else ""})
+    return LEADERBOARD_CARD.render(values)
+
+# rows = ((uid, name, score, avatar), ...) top-N, url = us rows ka hosted image.
+# Score write pe sirf tab dirty hota hai jab user top-N me ho ya 10th score tak pahunch jaye,
+# to baaki waqt !top (kisi bhi room se) na query karta hai na render - sab same URL share karte hain.
+LEADERBOARD = {"rows": None, "uids": frozenset(), "url": None, "gen": 0}
+LB_STATS = {"hits": 0, "refreshes": 0, "renders": 0}
+lb_lock = threading.Lock() # ek time pe ek hi refresh; baaki rooms wait karke wahi result lete hain
+
+def _leaderboard_touch(uid, score):
+    # Lock-free (listener game threads pe chalta hai, refresh ke render ka wait nahi karna)
+    lb = LEADERBOARD
+    rows = lb["rows"]
+    if rows is None or uid in lb["uids"] or len(rows) < TOP_N or score >= rows[-1][2]:
+        lb["rows"] = None
+        lb["gen"] += 1
+
+def _query_top():
+    conn = db.get_connection()
+    cur = conn.cursor()
+    cur.execute(f"SELECT user_id, username, global_score, avatar FROM users ORDER BY global_score DESC LIMIT {TOP_N}")
+    rows = tuple(tuple(r) for r in cur.fetchall())
+    conn.close()
+    return rows
+
+def leaderboard(room_name, image=True):
+    """(rows, url). url None = image nahi bana (ya image=False)"""
+    lb = LEADERBOARD
+    rows, url = lb["rows"], lb["url"]
+    if rows is not None and (url or not image):
+        LB_STATS["hits"] += 1
+        return rows, url
+    with lb_lock:
+        gen, rows, url = lb["gen"], lb["rows"], lb["url"]
+        if rows is None:
+            LB_STATS["refreshes"] += 1
+            rows, url = _query_top(), None
+        if image and rows and not url:
+            LB_STATS["renders"] += 1
+            url = render_pool.publish(draw_leaderboard, {'rows': [list(r[1:]) for r in rows]}, room=room_name)
+        if gen == lb["gen"]: lb.update(rows=rows, uids=frozenset(r[0] for r in rows), url=url)
+        return rows, url
+
+def leaderboard_text(rows):
+    msg = "🏆 **GLOBAL LEADERBOARD** 🏆\n"
+    msg += "──────────────────\n"
+    for i, (_, name, score, _) in enumerate(rows):
+        medal = "🥇" if i == 0 else "🥈" if i == 1 else "🥉" if i == 2 else "🔹"
+        msg += f"{medal} `#{i+1}` **{name}**: {score} 💰\n"
+    return msg
 
 # ==========================================
 # 🧠 COMMAND HANDLER
@@ -78,8 +195,14 @@ def handle_command(bot, command, room_name, user, args, data):
 
     # --- 1. VISUAL PROFILE (!stats / !profile) ---
     if cmd in ["stats", "profile", "me"]:
+        url = cached_profile(uid, user, icon)
+        if url:
+            bot.send_image(room_name, url)
+            return True
+
         def profile_task():
             try:
+                gen = _profile_gen[0]
                 conn = db.get_connection()
                 cur = conn.cursor()
                 ph = "%s" if db.DATABASE_URL.startswith("postgres") else "?"
@@ -92,6 +215,8 @@ def handle_command(bot, command, room_name, user, args, data):
                     cur.execute(f"INSERT INTO users (user_id, username, global_score, wins) VALUES ({ph}, {ph}, 0, 0)", (uid, user))
                     conn.commit()
                     row = (0, 0)
+                    _shift(uid, None, 0)
+                    _leaderboard_touch(uid, 0)
                 
                 # Rank Position
                 cur.execute(f"SELECT count(*) FROM users WHERE global_score > {ph}", (row[0],))
@@ -99,43 +224,39 @@ def handle_command(bot, command, room_name, user, args, data):
                 conn.close()
 
                 # Generate Image
-                img = draw_profile_card(user, icon, row[0], row[1], rank_pos)
-                url = utils.upload_image(img)
+                card = {'name': user, 'icon': icon, 'score': row[0], 'wins': row[1], 'rank_pos': rank_pos}
+                url = render_pool.publish(draw_profile_card, card, room=room_name)
                 
                 if url:
+                    remember_profile(uid, card, url, gen)
                     bot.send_image(room_name, url)
                 else:
                     bot.send_message(room_name, f"👤 **{user}**\n💰 Coins: {row[0]}\n🏆 Wins: {row[1]}\n📍 Rank: #{rank_pos}")
-                
-                del img; gc.collect()
             except Exception as e:
                 print(f"Profile Error: {e}")
 
         threading.Thread(target=profile_task, daemon=True).start()
         return True
 
-    # --- 2. GLOBAL LEADERBOARD (!top / !lb) ---
+    # --- 2. GLOBAL LEADERBOARD (!top / !lb, `!top text` = purana text mode) ---
     if cmd in ["top", "lb", "leaderboard"]:
-        try:
-            conn = db.get_connection()
-            cur = conn.cursor()
-            cur.execute("SELECT username, global_score FROM users ORDER BY global_score DESC LIMIT 10")
-            rows = cur.fetchall()
-            conn.close()
-
-            if not rows:
-                bot.send_message(room_name, "📈 Leaderboard is empty!")
-                return True
+        image = not (args and args[0].lower() == "text")
+        def top_task():
+            try:
+                rows, url = leaderboard(room_name, image)
+                if not rows: bot.send_message(room_name, "📈 Leaderboard is empty!")
+                elif url and image: bot.send_image(room_name, url)
+                else: bot.send_message(room_name, leaderboard_text(rows))
+            except Exception as e:
+                print(f"Leaderboard Error: {e}")
 
-            msg = "🏆 **GLOBAL LEADERBOARD** 🏆\n"
-            msg += "──────────────────\n"
-            for i, (name, score) in enumerate(rows):
-                medal = "🥇" if i == 0 else "🥈" if i == 1 else "🥉" if i == 2 else "🔹"
-                msg += f"{medal} `#{i+1}` **{name}**: {score} 💰\n"
-            
-            bot.send_message(room_name, msg)
-            return True
-        except: return True
+        rows, url = LEADERBOARD["rows"], LEADERBOARD["url"]
+        if rows and url and image: # cached: thread bhi nahi
+            LB_STATS["hits"] += 1
+            bot.send_image(room_name, url)
+        else:
+            threading.Thread(target=top_task, daemon=True).start()
+        return True
 
     # --- 3. GAME WISE STATS (!mygame) ---
     if cmd in ["mygame", "records"]:
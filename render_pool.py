@@ -0,0 +1,182 @@
+import os
+import sys
+import json
+import hashlib
+import threading
+import importlib.util
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+
+import utils
+
+# --- CONFIG ---
+# "thread" = render bot process ke andar (default), "process" = alag worker processes
+RENDER_BACKEND = os.environ.get("RENDER_BACKEND", "thread")
+# Kaunse renderers process pool pe jayenge, e.g. "tictactoe.draw_board,spin.draw_wheel" ("*" = sab)
+PROCESS_RENDERERS = set(filter(None, os.environ.get("RENDER_PROCESS", "*").split(",")))
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", os.cpu_count() or 2))
+# Itne ms me image ready na ho to game pehle text board bhej deta hai, image baad me
+LATENCY_BUDGET_MS = float(os.environ.get("LATENCY_BUDGET_MS", 1200))
+PLUGIN_DIR = "plugins"
+
+_pool = None
+_pool_lock = threading.Lock()
+publish_executor = concurrent.futures.ThreadPoolExecutor(max_workers=10)
+# coalesced = queued render naye snapshot ne replace kiya, stale = in-flight render upload se pehle drop
+RENDER_STATS = {"thread": 0, "process": 0, "fallbacks": 0, "stale": 0, "coalesced": 0}
+
+# ==========================================
+# 🧩 RENDERER LOOKUP
+# ==========================================
+# Renderer = module-level function `fn(scene) -> PIL.Image`. Scene sirf plain
+# dict/list/str/int hona chahiye taaki worker process tak pickle ho sake.
+def renderer_name(fn):
+    return f"{fn.__module__}.{fn.__name__}"
+
+def uses_process(fn):
+    if RENDER_BACKEND != "process": return False
+    return "*" in PROCESS_RENDERERS or renderer_name(fn) in PROCESS_RENDERERS
+
+def _load_module(name):
+    """Plugin module worker me bhi wahi naam se milna chahiye jo PluginManager deta hai"""
+    mod = sys.modules.get(name)
+    if mod is None:
+        path = os.path.join(PLUGIN_DIR, f"{name}.py")
+        spec = importlib.util.spec_from_file_location(name, path)
+        mod = importlib.util.module_from_spec(spec)
+        sys.modules[name] = mod
+        spec.loader.exec_module(mod)
+    return mod
+
+# ==========================================
+# 🏭 WORKER SIDE
+# ==========================================
+def _warm_worker(modules):
+    """Har worker start hote hi fonts + plugin assets (board image wagairah) load kar leta hai"""
+    utils.preload_fonts()
+    for name in modules:
+        try:
+            mod = _load_module(name)
+            if hasattr(mod, "warm_render"): mod.warm_render()
+        except Exception as e:
+            utils.safe_print(f"❌ Render worker warmup failed ({name}): {e}")
+
+def _render_job(module, func, scene, kind):
+    fn = getattr(_load_module(module), func)
+    return utils.encode_image(fn(scene), kind)
+
+def _noop():
+    return os.getpid()
+
+# ==========================================
+# 🚀 MAIN PROCESS SIDE
+# ==========================================
+def _plugin_modules():
+    return sorted(f[:-3] for f in os.listdir(PLUGIN_DIR) if f.endswith(".py"))
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=RENDER_WORKERS, initializer=_warm_worker, initargs=(_plugin_modules(),))
+        return _pool
+
+def start():
+    """Workers pehle se spawn + warm kar do, taaki pehla render cold start na kare"""
+    if RENDER_BACKEND != "process": return
+    pool = get_pool()
+    for f in [pool.submit(_noop) for _ in range(RENDER_WORKERS)]: f.result()
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool: _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def render(fn, scene, kind="photo"):
+    """Scene render + encode karo, encoded bytes wapas do. kind -> utils.encode_image"""
+    with render_encoded(fn, scene, kind) as enc:
+        return bytes(enc.view)
+
+def render_encoded(fn, scene, kind="photo"):
+    """render() jaisa, par utils.EncodedImage deta hai (thread path pe pooled buffer, copy nahi).
+    Kaam ho jaye to release() ya `with` use karo."""
+    if uses_process(fn):
+        try:
+            data = get_pool().submit(_render_job, fn.__module__, fn.__name__, scene, kind).result()
+            RENDER_STATS["process"] += 1
+            return utils.EncodedImage(data=data)
+        except BrokenProcessPool as e:
+            # Worker mar gaya (OOM wagairah) - pool reset karo aur is baar thread pe render karo
+            utils.safe_print(f"❌ Render pool broken, falling back to thread: {e}")
+            RENDER_STATS["fallbacks"] += 1
+            shutdown()
+    RENDER_STATS["thread"] += 1
+    return utils.encode_pooled(fn(scene), kind)
+
+def scene_key(fn, scene, kind):
+    raw = json.dumps([renderer_name(fn), kind, scene], sort_keys=True, default=str)
+    return "scene:" + hashlib.sha1(raw.encode()).hexdigest()
+
+def publish(fn, scene, kind="photo", prefix="bot", room=None, wanted=None):
+    """Render + upload -> hosted URL. Same scene pehle upload ho chuka ho to render bhi skip.
+    wanted() False ho jaye (game aage badh gaya) to render/upload chhod do aur None do."""
+    key = scene_key(fn, scene, kind)
+    url = utils.cached_url(key)
+    if url: return url
+    if wanted and not wanted():
+        RENDER_STATS["stale"] += 1
+        return None
+    with render_encoded(fn, scene, kind) as enc:
+        if wanted and not wanted():
+            RENDER_STATS["stale"] += 1
+            return None
+        url = utils.upload_bytes(enc, prefix, room)
+    if url: utils.remember_url(key, url)
+    return url
+
+def submit_publish(fn, scene, kind="photo", prefix="bot", room=None, wanted=None):
+    """publish() background me; Future milta hai taaki caller latency budget tak hi ruke"""
+    return publish_executor.submit(publish, fn, scene, kind, prefix, room, wanted)
+
+# ==========================================
+# 🎯 PER-GAME RENDER SLOT ("latest wins")
+# ==========================================
+class RenderSlot:
+    """Ek game ke renders ek ke baad ek chalte hain. Naya snapshot aate hi queued (abhi shuru
+    nahi hua) render replace ho jata hai, aur chal raha purana render upload se pehle ruk jata hai."""
+    def __init__(self, kind="photo", prefix="bot", room=None):
+        self.kind, self.prefix, self.room = kind, prefix, room
+        self.lock = threading.Lock()
+        self.pending = None
+        self.latest = None
+        self.running = False
+
+    def submit(self, fn, scene, kind=None):
+        """Future -> url (ya None agar ye snapshot purana pad gaya). Game lock ke andar call karo taaki order bana rahe."""
+        fut = concurrent.futures.Future()
+        with self.lock:
+            if self.pending:
+                RENDER_STATS["coalesced"] += 1
+                self.pending[1].set_result(None)
+            self.pending = ((fn, scene, kind or self.kind), fut)
+            self.latest = fut
+            if not self.running:
+                self.running = True
+                publish_executor.submit(self._drain)
+        return fut
+
+    def is_latest(self, fut):
+        return self.latest is fut
+
+    def _drain(self):
+        while True:
+            with self.lock:
+                if not self.pending:
+                    self.running = False
+                    return
+                (fn, scene, kind), fut = self.pending
+                self.pending = None
+            try: fut.set_result(publish(fn, scene, kind, self.prefix, self.room, wanted=lambda: self.is_latest(fut)))
+            except Exception as e: fut.set_exception(e)
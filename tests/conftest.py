@@ -0,0 +1,59 @@
+import os
+import sys
+import hashlib
+import tempfile
+import threading
+import http.server
+
+# Repo root import path par, aur DB / ttt table temp me - tests asli bot.db ko haath nahi lagate
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+_tmp = tempfile.mkdtemp(prefix="bot-tests-")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_tmp, "bot.db")
+os.environ["TTT_TABLE_PATH"] = os.path.join(_tmp, "ttt_table.bin")
+
+import db # noqa: E402
+
+db.init_db()
+
+import pytest # noqa: E402
+import render_pool # noqa: E402
+import utils # noqa: E402
+
+@pytest.fixture
+def load_plugin():
+    """plugins/<name>.py usi naam se jaise PluginManager / render workers load karte hain"""
+    return render_pool._load_module
+
+@pytest.fixture
+def stand_in():
+    """Local HTTP host (bench.stand_in_server jaisa): stand_in(handler) -> base url.
+    handler(method, path, body) -> (status, text). Test khatam hote hi band."""
+    servers = []
+    def start(handler):
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            def _serve(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                status, text = handler(self.command, self.path, body)
+                out = text.encode()
+                self.send_response(status); self.send_header("Content-Length", str(len(out))); self.end_headers()
+                if self.command != "HEAD": self.wfile.write(out)
+            do_GET = do_POST = do_HEAD = _serve
+            def log_message(self, *args): pass
+        srv = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=srv.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(srv)
+        return f"http://127.0.0.1:{srv.server_port}"
+    yield start
+    for srv in servers:
+        srv.shutdown()
+        srv.server_close()
+
+@pytest.fixture
+def uploads(stand_in, monkeypatch):
+    """Game boards asli render + encode + multipart upload se jate hain, bas host local hai"""
+    def host(method, path, body):
+        return 200, f"http://127.0.0.1/media/{hashlib.sha1(body).hexdigest()}.png"
+    url = stand_in(host)
+    monkeypatch.setattr(utils, "UPLOAD_ROUTER", utils.UploadRouter([utils.FormBackend("local", url + "/upload")]))
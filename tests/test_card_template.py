@@ -0,0 +1,15 @@
+import card_template as ct
+
+def test_static_cache_keeps_recently_used_layers(monkeypatch):
+    monkeypatch.setattr(ct, "STATIC_CACHE", ct.OrderedDict())
+    monkeypatch.setattr(ct, "MAX_STATIC_LAYERS", 3)
+    tpl = ct.CardTemplate("lru_test", (8, 8), static=[{"type": "rect", "box": (0, 0, 7, 7), "fill": "$c"}])
+
+    hot = tpl.base({"c": "red"})
+    for c in ("green", "blue"): tpl.base({"c": c})
+    assert tpl.base({"c": "red"}) is hot # hit -> sabse naya
+    tpl.base({"c": "white"}) # evict: green (sabse purana), red nahi
+
+    assert ("lru_test", "red") in ct.STATIC_CACHE
+    assert ("lru_test", "green") not in ct.STATIC_CACHE
+    assert tpl.base({"c": "red"}) is hot
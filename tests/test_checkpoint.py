@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+import game_session as gs
+
+GAMES = 50
+
+class Bot:
+    def send_message(self, room, text): pass
+    def send_pm_message(self, user, text): pass
+    def send_image(self, room, url): pass
+    def log(self, text): pass
+
+@pytest.fixture
+def new_registry(monkeypatch):
+    """new_registry() = "restart": gs.REGISTRY naya. Test ke baad har registry ke bache sessions end."""
+    made = []
+    def swap():
+        made.append(gs.SessionRegistry())
+        monkeypatch.setattr(gs, "REGISTRY", made[-1])
+        return made[-1]
+    yield swap
+    for reg in made:
+        for s in reg.all():
+            with s.lock: s.end()
+            # board render/upload local host band hone se pehle khatam ho
+            if s.render_slot.latest: s.render_slot.latest.result(timeout=10)
+    gs.flush_checkpoints()
+
+def _mid_game(ttt, bot):
+    """GAMES tictactoe PvP games, har ek me 4 chaalein ho chuki"""
+    for i in range(GAMES):
+        uid, room = f"x{i}", f"ckpt-room{i}"
+        for cmd, user, args in (("tic", uid, ["1"]), ("2", uid, []), ("2", uid, []), ("join", f"o{i}", [])):
+            ttt.handle_command(bot, cmd, room, user, args, {"user_id": user})
+    live = gs.REGISTRY.all(ttt.TicTacToeGame.game)
+    for cell in ("1", "2", "4", "5"):
+        for s in live: assert s.handle(cell, s.players[s.turn])
+    return live
+
+def _snapshot(sessions, fields):
+    return {s.sid: (s.status, {f: getattr(s, f) for f in fields}) for s in sessions}
+
+def test_restart_restores_every_game_and_parks_timers(load_plugin, uploads, new_registry):
+    ttt, bot = load_plugin("tictactoe"), Bot()
+    cls = ttt.TicTacToeGame
+    new_registry()
+    live = _mid_game(ttt, bot)
+    assert len(live) == GAMES and all(s.status == "PLAYING" for s in live)
+    gs.flush_checkpoints()
+    before = _snapshot(live, cls.CHECKPOINT_FIELDS)
+    for s in live: s.cancel_timer()
+
+    new_registry()
+    assert gs.restore(bot, cls) == GAMES
+    restored = gs.REGISTRY.all(cls.game)
+    assert _snapshot(restored, cls.CHECKPOINT_FIELDS) == before
+    assert all(s.timer is None for s in restored) # bot offline: rejoin tak sab park
+    assert gs.stats()["checkpoints"]["parked"] >= GAMES
+
+    assert sum(gs.resume_room(f"ckpt-room{i}") for i in range(GAMES)) == GAMES
+    assert all(s.timer is not None and s.deadline - time.time() > gs.RESTORE_GRACE_SEC - 5 for s in restored)
+    # Restored game wahin se aage chalta hai
+    game = restored[0]
+    assert gs.route(game.room, cls.game, "7", game.players[game.turn])
+    assert game.render_slot.latest.result(timeout=10).startswith("http://127.0.0.1/media/")
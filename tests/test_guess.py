@@ -0,0 +1,22 @@
+import pytest
+
+class Bot:
+    def __init__(self): self.sent = []
+    def send_message(self, room, text): self.sent.append((room, text))
+    def log(self, text): pass
+
+@pytest.mark.parametrize("args", [["--5", "10"], ["1", "--5"], ["5-", "10"], ["-", "10"], ["1", "1e3"]])
+def test_parse_range_rejects_malformed_numbers(load_plugin, args):
+    assert load_plugin("guess").parse_range(args) is None
+
+def test_parse_range_accepts_negatives(load_plugin):
+    g = load_plugin("guess")
+    assert g.parse_range(["-10", "10"]) == (-10, 10)
+    assert g.parse_range([]) == g.DEFAULT_RANGE
+
+@pytest.mark.parametrize("cmd", ["--5", "-", "5-", "+5", "hello"])
+def test_malformed_guess_is_not_claimed(load_plugin, cmd):
+    g = load_plugin("guess")
+    game = g.GuessGame(Bot(), "room", "uid", "alice", 1, 100)
+    assert game.on_playing(cmd, "uid", "alice", None) is False
+    assert game.attempts == 0
@@ -0,0 +1,29 @@
+import pytest
+
+import memory_governor as mg
+
+@pytest.fixture
+def governor(monkeypatch):
+    collected = []
+    monkeypatch.setattr(mg.gc, "collect", lambda *a: collected.append(a) or 0)
+    monkeypatch.setattr(mg, "GC_ALLOC_BUDGET", 10 ** 9) # sirf RSS decide kare
+    monkeypatch.setattr(mg, "MEMORY_BUDGET_MB", 400.0)
+    monkeypatch.setitem(mg.GC_STATS, "last_forced", 0.0)
+    monkeypatch.setitem(mg.GC_STATS, "forced", 0)
+    return collected
+
+def test_hint_under_budget_does_not_collect(governor, monkeypatch):
+    monkeypatch.setattr(mg, "rss_mb", lambda: 120.0)
+    assert mg._tick(hinted=True) is None
+    assert governor == [] and mg.GC_STATS["forced"] == 0
+
+def test_hint_near_budget_collects(governor, monkeypatch):
+    monkeypatch.setattr(mg, "rss_mb", lambda: 400.0 * mg.HINT_MARGIN + 1)
+    assert mg._tick(hinted=True).startswith("hint")
+    assert len(governor) == 1
+
+def test_over_budget_collects_without_hint(governor, monkeypatch):
+    monkeypatch.setattr(mg, "rss_mb", lambda: 450.0)
+    assert mg._tick(hinted=False) == "450 MB"
+    # Gap ke andar dobara nahi
+    assert mg._tick(hinted=True) is None and len(governor) == 1
@@ -0,0 +1,103 @@
+import re
+import time
+import threading
+import concurrent.futures
+from collections import defaultdict
+
+import db
+import game_session as gs
+
+ROOMS, PER_ROOM = 200, 10 # 2000 asli mines sessions
+MENTION = re.compile(r"@([\w-]+)")
+
+class Bot:
+    """Har room / PM delivery record karo (publish + timer threads se bhi aati hain)"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.room_msgs = defaultdict(list)
+        self.images = defaultdict(list)
+        self.pms = defaultdict(list)
+    def send_message(self, room, text):
+        with self.lock: self.room_msgs[room].append(text)
+    def send_image(self, room, url):
+        with self.lock: self.images[room].append(url)
+    def send_pm_message(self, uid, text):
+        with self.lock: self.pms[uid].append(text)
+    def log(self, text): pass
+
+def expire(session):
+    """Session ka scheduled timer abhi chala do - wahi callable jo TIMERS 120s baad chalata"""
+    with session.lock: entry = session.timer
+    fn, args = entry[2], entry[3]
+    if fn: fn(*args)
+
+def play_room(mines, bot, r):
+    """Ek room ka script: 4 poore games, 2 SETUP me timeout, 3 WAITING me timeout, 1 !mines stop"""
+    room, sessions = f"mines-scale-{r}", []
+    for k in range(PER_ROOM):
+        a, b = f"r{r}a{k}", f"r{r}b{k}"
+        assert mines.handle_command(bot, "mines", room, a, [], {"user_id": a})
+        s = gs.REGISTRY.find(room, mines.MinesRevengeGame.game, a)
+        sessions.append(s)
+        if k >= 6:
+            if k == 9: assert gs.stop(room, s.game, a)
+            else: expire(s)
+            continue
+        assert gs.route(room, s.game, "join", b, b)
+        assert s.status == "SETUP" and gs.REGISTRY.pm_sessions(a) == [s]
+        if k >= 4:
+            expire(s)
+            continue
+        for uid in (a, b):
+            for cell in ("1", "2", "3"): assert gs.route_pm(uid, cell)
+        # P1 ka har attack P2 ke bomb pe, P2 safe cells - teesre BOOM pe P2 jeetta hai
+        for uid, cell in ((a, "1"), (b, "12"), (a, "2"), (b, "11"), (a, "3")):
+            assert gs.route(room, s.game, cell, uid, uid)
+        assert s.ended
+    return room, sessions
+
+def test_thousands_of_mines_sessions_leave_nothing_behind(load_plugin, uploads):
+    mines = load_plugin("mines_revenge")
+    bot = Bot()
+    before = dict(gs.SESSION_STATS)
+    with concurrent.futures.ThreadPoolExecutor(16) as ex:
+        played = list(ex.map(lambda r: play_room(mines, bot, r), range(ROOMS)))
+    sessions = [s for _, room_sessions in played for s in room_sessions]
+
+    # Outbox / renders / late images drain hone do (sab background threads pe)
+    deadline = time.time() + 30
+    while time.time() < deadline and any(s.outbox or not (s.render_slot.latest is None or s.render_slot.latest.done())
+                                         for s in sessions):
+        time.sleep(0.05)
+    gs.flush_checkpoints()
+
+    # --- koi leak nahi ---
+    assert len(sessions) == ROOMS * PER_ROOM and all(s.ended for s in sessions)
+    assert gs.SESSION_STATS["started"] - before["started"] == len(sessions)
+    assert gs.SESSION_STATS["ended"] - before["ended"] == len(sessions)
+    assert all(s.timer is None and not s.outbox for s in sessions)
+    rooms = {room for room, _ in played}
+    reg = gs.REGISTRY
+    assert not [s for s in reg.all() if s.room in rooms]
+    assert not [k for k in reg.members if k[0] in rooms]
+    assert not [k for k in reg.joinable if k[0] in rooms]
+    assert not rooms & set(reg.rooms)
+    players = {uid for s in sessions for uid in s.members}
+    assert not players & set(reg.pm)
+    assert not [row for row in db.load_checkpoints(mines.MinesRevengeGame.game) if row[1] in rooms]
+
+    # --- har delivery apne hi room me ---
+    home = {uid: room for room, room_sessions in played for s in room_sessions for uid in s.members}
+    assert set(bot.room_msgs) == rooms
+    for room, texts in bot.room_msgs.items():
+        mentioned = {m for text in texts for m in MENTION.findall(text)}
+        assert {home[m] for m in mentioned} == {room}
+        assert sum("GAME OVER" in t for t in texts) == 4
+        assert sum(t.startswith("💣 **Mines: Revenge!**") for t in texts) == PER_ROOM
+    # boards asli upload path se aaye (late image bhi apne room me)
+    assert set(bot.images) == rooms and all(url.startswith("http://127.0.0.1/media/") for urls in bot.images.values() for url in urls)
+    # PMs sirf SETUP tak pahunche players ko: mission + 2 "placed" + "Done" (poore game), sirf mission (timeout)
+    for uid, texts in bot.pms.items():
+        k = int(re.search(r"\d+$", uid).group())
+        assert len(texts) == (4 if k < 4 else 1), (uid, texts)
+    assert len(bot.pms) == ROOMS * 6 * 2
@@ -0,0 +1,81 @@
+import json
+import time
+import threading
+import concurrent.futures
+
+import pytest
+
+import music_resolver as mr
+
+@pytest.fixture
+def converter(stand_in, monkeypatch):
+    """Asli convert() (utils.http_post + JSON parse) ek local stub converter ke against.
+    'nomatch' -> success false, 'down' -> 502, baaki -> track. Har request ki query `calls` me."""
+    calls, gate = [], threading.Event()
+    gate.set()
+    def handler(method, path, body):
+        query = json.loads(body)["query"]
+        calls.append(query)
+        gate.wait(5)
+        if "nomatch" in query: return 200, json.dumps({"success": False, "error": "No results"})
+        if "down" in query: return 502, "Bad Gateway"
+        n = len(calls)
+        return 200, json.dumps({"success": True, "video_id": f"vid{n}", "audio_url": f"http://audio.local/{n}.mp3",
+                                "card_url": f"http://cards.local/{n}.png", "duration": 200})
+    monkeypatch.setattr(mr, "CONVERTER_URL", stand_in(handler) + "/convert")
+    monkeypatch.setattr(mr, "RESOLVERS", [mr.convert])
+    mr.MUSIC_CACHE.clear()
+    yield calls, gate
+    gate.set()
+    mr.MUSIC_CACHE.clear()
+
+def test_miss_goes_to_converter_then_hits_cache(converter):
+    calls, _ = converter
+    with pytest.raises(KeyError): mr.lookup("Kesariya")
+    misses = mr.MUSIC_STATS["misses"]
+    track = mr.resolve("Kesariya", timeout=5)
+    assert calls == ["Kesariya"] and mr.MUSIC_STATS["misses"] == misses + 1
+    assert track == mr.Track("Kesariya", "vid1", "http://audio.local/1.mp3", "http://cards.local/1.png", 200)
+
+    hits = mr.MUSIC_STATS["hits"]
+    fut = mr.resolve_async("  kesariya! ")
+    assert fut.done() and fut.result() is track
+    assert mr.MUSIC_STATS["hits"] == hits + 1 and len(calls) == 1
+
+def test_entry_expires_after_ttl(converter, monkeypatch):
+    calls, _ = converter
+    monkeypatch.setattr(mr, "MUSIC_CACHE_TTL", 0.2)
+    first = mr.resolve("apna bana le", timeout=5)
+    assert mr.resolve("apna bana le", timeout=5) is first and len(calls) == 1
+    time.sleep(0.3)
+    with pytest.raises(KeyError): mr.lookup("apna bana le")
+    assert mr.resolve("apna bana le", timeout=5).audio_url == "http://audio.local/2.mp3"
+    assert len(calls) == 2
+
+def test_not_found_is_negative_cached_until_miss_ttl(converter, monkeypatch):
+    calls, _ = converter
+    monkeypatch.setattr(mr, "MUSIC_MISS_TTL", 0.2)
+    with pytest.raises(mr.NotFound, match="No results"): mr.resolve("nomatch song", timeout=5) # converter ka error
+    for _ in range(2):
+        with pytest.raises(mr.NotFound): mr.resolve("nomatch song", timeout=5)
+    assert len(calls) == 1 and mr.lookup("nomatch song") is None
+    time.sleep(0.3)
+    with pytest.raises(mr.NotFound): mr.resolve("nomatch song", timeout=5)
+    assert len(calls) == 2
+
+def test_server_error_is_not_cached(converter):
+    calls, _ = converter
+    for _ in range(2):
+        with pytest.raises(RuntimeError, match="502"): mr.resolve("down song", timeout=5)
+    assert len(calls) == 2
+    with pytest.raises(KeyError): mr.lookup("down song")
+
+def test_concurrent_callers_share_one_request(converter):
+    calls, gate = converter
+    gate.clear() # pehli request converter pe ruki rahe jab tak sab callers aa na jayein
+    variants = ["Tum Hi Ho", "tum hi ho", "  TUM hi HO!! ", "tum  hi ho."]
+    with concurrent.futures.ThreadPoolExecutor(20) as ex:
+        futs = list(ex.map(mr.resolve_async, [variants[i % 4] for i in range(40)]))
+    gate.set()
+    assert len({f.result(timeout=5) for f in futs}) == 1
+    assert len(calls) == 1
@@ -0,0 +1,65 @@
+import json
+import time
+import threading
+
+import pytest
+
+import music_resolver as mr
+
+TRACK_SEC = 0.2
+LONG = {"first": 30} # skip test: ye gaana khud khatam na ho
+
+class Bot:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.audio, self.sent = [], []
+    def send_message(self, room, text):
+        with self.lock: self.sent.append((room, text))
+    def send_image(self, room, url): pass
+    def send_audio(self, room, url):
+        with self.lock: self.audio.append((room, url))
+    def log(self, text): pass
+
+@pytest.fixture
+def music(load_plugin, stand_in, monkeypatch):
+    """music plugin + asli convert() ek local converter ke against (har gaana TRACK_SEC ka)"""
+    calls = []
+    def handler(method, path, body):
+        query = json.loads(body)["query"]
+        calls.append(query)
+        time.sleep(0.05)
+        return 200, json.dumps({"success": True, "video_id": "vid", "audio_url": f"http://audio.local/{query}.mp3",
+                                "duration": LONG.get(query, TRACK_SEC)})
+    monkeypatch.setattr(mr, "CONVERTER_URL", stand_in(handler) + "/convert")
+    monkeypatch.setattr(mr, "RESOLVERS", [mr.convert])
+    mr.MUSIC_CACHE.clear()
+    yield load_plugin("music"), calls
+    mr.MUSIC_CACHE.clear()
+
+def _wait_done(music, room, timeout):
+    deadline = time.time() + timeout
+    while room in music.PLAYLISTS and time.time() < deadline: time.sleep(0.02)
+
+def test_queue_plays_every_song_in_order_then_cleans_up(music):
+    music, calls = music
+    bot, songs = Bot(), [f"song{i}" for i in range(4)]
+    for i, song in enumerate(songs): music.handle_command(bot, "play", "pl-room", f"u{i}", [song], {})
+    _wait_done(music, "pl-room", len(songs) * (TRACK_SEC + 1) + 5)
+    assert bot.audio == [("pl-room", f"http://audio.local/{s}.mp3") for s in songs]
+    assert sorted(calls) == songs # prefetch + play ek hi converter call share karte hain
+    assert "pl-room" not in music.PLAYLISTS
+
+def test_skip_moves_to_next_and_rooms_stay_separate(music):
+    music, _ = music
+    bot = Bot()
+    music.handle_command(bot, "play", "pl-a", "u1", ["first"], {})
+    music.handle_command(bot, "play", "pl-a", "u1", ["second"], {})
+    music.handle_command(bot, "play", "pl-b", "u2", ["other"], {})
+    deadline = time.time() + 5
+    while ("pl-a", "http://audio.local/first.mp3") not in bot.audio and time.time() < deadline: time.sleep(0.02)
+    music.handle_command(bot, "skip", "pl-a", "u1", [], {})
+    _wait_done(music, "pl-a", 10)
+    _wait_done(music, "pl-b", 10)
+    assert [url for room, url in bot.audio if room == "pl-a"] == ["http://audio.local/first.mp3", "http://audio.local/second.mp3"]
+    assert [url for room, url in bot.audio if room == "pl-b"] == ["http://audio.local/other.mp3"]
+    assert ("pl-a", "⏭️ Skipped by @u1") in bot.sent
@@ -0,0 +1,63 @@
+import threading
+import concurrent.futures
+
+import pytest
+
+import music_resolver as mr
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """RESOLVERS ko fake upstream se badlo: calls gino, 'nomatch' -> NotFound, 'down' -> error"""
+    calls, gate = [], threading.Event()
+    def fake(query):
+        calls.append(query)
+        gate.wait(5)
+        if "nomatch" in query: raise mr.NotFound("Song nahi mila")
+        if "down" in query: raise RuntimeError("Server Error 502")
+        return mr.Track(query, "vid", f"http://audio/{len(calls)}.mp3", None, 180)
+    monkeypatch.setattr(mr, "RESOLVERS", [fake])
+    mr.MUSIC_CACHE.clear()
+    yield calls, gate
+    gate.set()
+    mr.MUSIC_CACHE.clear()
+
+def test_concurrent_requests_share_one_upstream_call(upstream):
+    calls, gate = upstream
+    variants = ["Tum Hi Ho", "tum hi ho", "  TUM hi HO!! ", "tum  hi ho."]
+    with concurrent.futures.ThreadPoolExecutor(20) as ex:
+        futs = list(ex.map(mr.resolve_async, [variants[i % 4] for i in range(40)]))
+    gate.set()
+    tracks = {f.result(timeout=5) for f in futs}
+    assert len(calls) == 1 and len(tracks) == 1
+
+def test_cache_hit_is_already_done(upstream):
+    calls, gate = upstream
+    gate.set()
+    first = mr.resolve("some song", timeout=5)
+    fut = mr.resolve_async("Some Song")
+    assert fut.done() and fut.result() == first and len(calls) == 1
+    assert mr.lookup("some song") == first
+
+def test_not_found_is_negative_cached(upstream):
+    calls, gate = upstream
+    gate.set()
+    for _ in range(3):
+        with pytest.raises(mr.NotFound): mr.resolve("nomatch song", timeout=5)
+    assert len(calls) == 1
+    assert mr.lookup("nomatch song") is None
+
+def test_transient_error_is_not_cached(upstream):
+    calls, gate = upstream
+    gate.set()
+    for _ in range(2):
+        with pytest.raises(RuntimeError): mr.resolve("down song", timeout=5)
+    assert len(calls) == 2
+    with pytest.raises(KeyError): mr.lookup("down song")
+
+def test_falls_back_to_next_resolver(monkeypatch):
+    def broken(query): raise RuntimeError("converter down")
+    def backup(query): return mr.Track(query, "vid", "http://fallback.mp3", None)
+    monkeypatch.setattr(mr, "RESOLVERS", [broken, backup])
+    mr.MUSIC_CACHE.clear()
+    assert mr.resolve("fallback song", timeout=5).audio_url == "http://fallback.mp3"
+    mr.MUSIC_CACHE.clear()
@@ -0,0 +1,120 @@
+import json
+import time
+
+import pytest
+
+import db
+import game_session as gs
+import plugin_loader
+
+class Bot:
+    def __init__(self):
+        self.sent = []
+    def send_message(self, room, text): self.sent.append((room, text))
+    def send_pm_message(self, user, text): self.sent.append((user, text))
+    def send_image(self, room, url): self.sent.append((room, url))
+    def log(self, text): pass
+
+class TrapGame(gs.GameSession):
+    """Mines jaisa: SETUP me players PM se number bhejte hain"""
+    game = "test_traps"
+    initial = "SETUP"
+    TRANSITIONS = {"SETUP": {"PLAYING"}}
+    JOINABLE = frozenset()
+    PM_STATES = frozenset({"SETUP"})
+    CHECKPOINT_FIELDS = ("picks",)
+
+    def __init__(self, bot, room, uid):
+        super().__init__(bot, room, uid)
+        self.picks = {}
+
+    def on_start(self):
+        self.reset_timer(60, "setup")
+
+    def on_pm_setup(self, cmd, uid):
+        if not cmd.isdigit(): return False
+        self.picks[uid] = int(cmd)
+        return True
+
+    def on_timeout(self, reason):
+        self.say(f"timeout {reason}")
+        self.end()
+
+@pytest.fixture
+def bot():
+    yield Bot()
+    for s in gs.REGISTRY.all():
+        with s.lock: s.end()
+    gs.flush_checkpoints()
+
+def _pm(manager, sender, body):
+    return manager.process_private_message({"from": sender, "from_id": sender, "body": body})
+
+def test_plain_pm_goes_to_senders_session(bot):
+    manager = plugin_loader.PluginManager(bot)
+    a = TrapGame(bot, "room1", "alice"); b = TrapGame(bot, "room2", "bob")
+    assert gs.REGISTRY.start(a) and gs.REGISTRY.start(b)
+    assert _pm(manager, "alice", "3") is True
+    assert _pm(manager, "bob", "7") is True
+    assert a.picks == {"alice": 3} and b.picks == {"bob": 7}
+    assert _pm(manager, "carol", "5") is False # kisi session me nahi
+
+def test_pm_index_follows_state(bot):
+    manager = plugin_loader.PluginManager(bot)
+    game = TrapGame(bot, "room1", "alice")
+    gs.REGISTRY.start(game)
+    with game.lock: game.goto("PLAYING")
+    assert gs.REGISTRY.pm_sessions("alice") == []
+    assert _pm(manager, "alice", "3") is False
+    with game.lock: game.end()
+    assert gs.REGISTRY.get(game.sid) is None
+
+def test_unclaimed_plain_pm_is_not_a_plugin_command(bot):
+    calls = []
+    class Plugin:
+        @staticmethod
+        def handle_pm(bot, cmd, user, args, data):
+            calls.append((cmd, args))
+            return True
+    manager = plugin_loader.PluginManager(bot)
+    manager.plugins["fake"] = Plugin
+    assert not _pm(manager, "alice", "ping")
+    assert calls == []
+    assert _pm(manager, "alice", "!ping now") is True
+    assert calls == [("ping", ["now"])]
+
+def test_restore_waits_for_room_rejoin(bot):
+    # Restart ke baad bot offline hai: session wapas aata hai par timer room rejoin tak nahi chalta
+    state = {"status": "SETUP", "creator": "alice", "members": ["alice"], "timer": ["setup", 0.1],
+             "fields": {"picks": {"alice": 4}}}
+    assert db.save_checkpoints([("restored01", TrapGame.game, "room9", json.dumps(state), int(time.time()))])
+    assert gs.restore(bot, TrapGame) == 1
+    game = gs.REGISTRY.get("restored01")
+    assert game.picks == {"alice": 4} and game.timer is None
+    time.sleep(0.3)
+    assert not game.ended and bot.sent == []
+
+    assert gs.resume_room("room9") == 1
+    assert game.timer is not None
+    deadline = time.time() + gs.RESTORE_GRACE_SEC + 5
+    game.reset_timer(0.05, "setup") # grace ka wait mat karo
+    while not game.ended and time.time() < deadline: time.sleep(0.02)
+    assert game.ended and bot.sent == [("room9", "timeout setup")]
+    assert gs.resume_room("room9") == 0
+
+def test_mines_setup_over_plain_pms(bot, load_plugin, uploads):
+    # bench_sessions wala flow: har player ke 3 plain-digit PMs plugin_loader -> route_pm se
+    mines = load_plugin("mines_revenge")
+    manager = plugin_loader.PluginManager(bot)
+    games = 100
+    for i in range(games):
+        mines.handle_command(bot, "mines", f"pm-room{i}", f"a{i}", [], {"user_id": f"a{i}"})
+        mines.handle_command(bot, "join", f"pm-room{i}", f"b{i}", [], {"user_id": f"b{i}"})
+    live = gs.REGISTRY.all(mines.MinesRevengeGame.game)
+    assert len(live) == games and all(s.status == "SETUP" for s in live)
+    for cell in ("1", "2", "3"):
+        for i in range(games):
+            for p in "ab": assert _pm(manager, f"{p}{i}", cell)
+    assert all(s.status == "PLAYING" for s in live)
+    assert not any(gs.REGISTRY.pm_sessions(uid) for s in live for uid in s.members)
+    for s in live: s.render_slot.latest.result(timeout=10)
@@ -0,0 +1,25 @@
+import time
+
+def test_fallback_disc_is_not_kept_after_a_failed_fetch(load_plugin, monkeypatch):
+    sl = load_plugin("snake_ladder")
+    monkeypatch.setattr(sl, "TOKEN_CACHE", sl.OrderedDict())
+    calls = []
+    ok = {"v": False}
+    def fake_avatar(canvas, url, x, y, size, **kw):
+        calls.append(url)
+        return ok["v"]
+    monkeypatch.setattr(sl.utils, "draw_circle_avatar", fake_avatar)
+
+    url, color = "https://cdn.example/a.png", sl.P_COLORS["P1"]
+    sl.token_sprite(url, color)
+    sl.token_sprite(url, color)
+    assert len(calls) == 1 # TTL ke andar disc hi chalega, har roll pe fetch nahi
+
+    # TTL nikal gaya + avatar ab mil raha hai -> asli sprite, phir hamesha cache se
+    key = (url, color)
+    sl.TOKEN_CACHE[key] = (sl.TOKEN_CACHE[key][0], time.time() - 1)
+    ok["v"] = True
+    sl.token_sprite(url, color)
+    sl.token_sprite(url, color)
+    assert len(calls) == 2
+    assert sl.TOKEN_CACHE[key][1] == float("inf")
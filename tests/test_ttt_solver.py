@@ -0,0 +1,57 @@
+import pytest
+
+import ttt_solver as ttt
+
+@pytest.fixture(scope="module", autouse=True)
+def table():
+    ttt.load()
+
+def _reachable():
+    """Empty board se har reachable, abhi chal rahi position"""
+    stack, seen = [0], {0}
+    while stack:
+        code = stack.pop()
+        if ttt.winner(code): continue
+        yield code
+        side = "X" if ttt.to_move(code) == 1 else "O"
+        for m in ttt.legal_moves(code):
+            child = ttt.play(code, m, side)
+            if child not in seen:
+                seen.add(child); stack.append(child)
+
+def _losses(code, bot, bot_moves):
+    """Bot ki chaalein (bot_moves) x opponent ki har legal chaal, exhaustive -> bot kitne games haara"""
+    w = ttt.winner(code)
+    if w: return int(w not in (bot, "Draw"))
+    side = "X" if ttt.to_move(code) == 1 else "O"
+    moves = bot_moves(code) if side == bot else ttt.legal_moves(code)
+    return sum(_losses(ttt.play(code, m, side), bot, bot_moves) for m in moves)
+
+@pytest.mark.parametrize("bot", ["X", "O"])
+def test_perfect_bot_never_loses(bot):
+    assert _losses(0, bot, lambda code: [ttt.choose_move(code, "perfect")]) == 0
+
+@pytest.mark.parametrize("bot", ["X", "O"])
+def test_every_optimal_tie_break_never_loses(bot):
+    # Medium level optimal_moves me se random chunta hai - har choice safe honi chahiye
+    assert _losses(0, bot, ttt.optimal_moves) == 0
+
+def test_perfect_move_is_table_lookup():
+    for code in _reachable():
+        move = ttt.choose_move(code, "perfect")
+        assert move == ttt.BEST_MOVE[code]
+        assert move in ttt.optimal_moves(code)
+
+def test_finished_board_has_no_move():
+    full = ttt.encode(["X", "O", "X", "X", "O", "O", "O", "X", "X"])
+    assert ttt.winner(full) == "Draw"
+    assert ttt.choose_move(full, "perfect") is None
+    assert ttt.choose_move(full, "easy") is None
+
+def test_table_roundtrip(tmp_path):
+    path = str(tmp_path / "table.bin")
+    ttt.save(path)
+    before = bytes(ttt.BEST_MOVE), bytes(ttt.VALUE), bytes(ttt.WINNER)
+    ttt._loaded.clear()
+    ttt.load(path)
+    assert (bytes(ttt.BEST_MOVE), bytes(ttt.VALUE), bytes(ttt.WINNER)) == before
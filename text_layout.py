@@ -0,0 +1,139 @@
+import threading
+from collections import OrderedDict
+
+import utils
+
+# --- CONFIG ---
+MAX_LAYOUT_CACHE = 256
+LINE_SPACING = 1.15 # line height = size * ye (48px font -> 55px line, purana image_pm wala)
+ELLIPSIS = "…"
+REF_SIZE = 100 # glyphs isi size pe naape jaate hain, baaki sizes ke liye scale (advance ~ size ke proportional)
+
+# font_name -> {char: advance px at REF_SIZE}. Har font ke glyphs ek hi baar, ek hi size pe naape -
+# fit() ke har candidate size ke liye naya truetype load nahi (font LRU thrash nahi hota).
+GLYPH_CACHE = {}
+# (kind, text, font_name, ...) -> layout result
+LAYOUT_CACHE = OrderedDict()
+LAYOUT_STATS = {"hits": 0, "misses": 0, "glyphs": 0}
+_layout_lock = threading.Lock()
+
+# ==========================================
+# 📏 GLYPH ADVANCES
+# ==========================================
+def _advances(font_name):
+    adv = GLYPH_CACHE.get(font_name)
+    if adv is None:
+        adv = GLYPH_CACHE.setdefault(font_name, {})
+    return adv
+
+def _ref_width(text, font_name):
+    """REF_SIZE pe glyph advances ka sum"""
+    adv = _advances(font_name)
+    total = 0.0
+    font = None
+    for ch in text:
+        w = adv.get(ch)
+        if w is None:
+            font = font or utils.get_font(font_name, REF_SIZE)
+            w = adv[ch] = font.getlength(ch) if hasattr(font, "getlength") else 6.0 * REF_SIZE / 20
+            LAYOUT_STATS["glyphs"] += 1
+        total += w
+    return total
+
+def text_width(text, font_name="arial.ttf", size=20):
+    """Glyph advances ka sum. Kerning/hinting ignore hota hai - wrapping ke liye kaafi accurate."""
+    return _ref_width(text, font_name) * size / REF_SIZE
+
+def line_height(size):
+    return int(size * LINE_SPACING)
+
+# ==========================================
+# 🗂️ LAYOUT CACHE
+# ==========================================
+def _cached(key, build):
+    # Hit path lock-free (GIL), miss pe build lock ke bahar - do threads same cheez bana dein to bhi theek
+    out = LAYOUT_CACHE.get(key)
+    if out is not None:
+        try: LAYOUT_CACHE.move_to_end(key)
+        except KeyError: pass
+        LAYOUT_STATS["hits"] += 1
+        return out
+    LAYOUT_STATS["misses"] += 1
+    out = build()
+    with _layout_lock:
+        LAYOUT_CACHE[key] = out
+        while len(LAYOUT_CACHE) > MAX_LAYOUT_CACHE: LAYOUT_CACHE.popitem(last=False)
+    return out
+
+# ==========================================
+# ✂️ WRAP / FIT
+# ==========================================
+def _break_word(word, font_name, size, max_w):
+    """max_w se lambe word (URL, spam) ko characters pe todo"""
+    parts, cur, cur_w = [], "", 0.0
+    for ch in word:
+        w = text_width(ch, font_name, size)
+        if cur and cur_w + w > max_w:
+            parts.append(cur); cur, cur_w = "", 0.0
+        cur += ch; cur_w += w
+    if cur: parts.append(cur)
+    return parts
+
+def _wrap(text, font_name, size, max_w):
+    space = text_width(" ", font_name, size)
+    lines = []
+    for para in text.split("\n"):
+        cur, cur_w = [], 0.0
+        for word in para.split():
+            w = text_width(word, font_name, size)
+            pieces = [word] if w <= max_w else _break_word(word, font_name, size, max_w)
+            for piece in pieces:
+                if piece is not word: w = text_width(piece, font_name, size)
+                # Har word ek hi baar naapa jata hai: running width + space + word
+                if cur and cur_w + space + w > max_w:
+                    lines.append(" ".join(cur)); cur, cur_w = [], 0.0
+                cur_w += (space if cur else 0) + w
+                cur.append(piece)
+        if cur or not lines: lines.append(" ".join(cur))
+    return lines
+
+def wrap(text, font_name="arial.ttf", size=20, max_w=400):
+    """Greedy word wrap, O(len(text)). List of lines (tuple, cached - modify mat karo)."""
+    return _cached(("wrap", text, font_name, size, max_w), lambda: tuple(_wrap(text, font_name, size, max_w)))
+
+def ellipsize(text, font_name="arial.ttf", size=20, max_w=400):
+    """Ek line me fit na ho to end pe '…' laga ke kaat do"""
+    if text_width(text, font_name, size) <= max_w: return text
+    budget = max_w - text_width(ELLIPSIS, font_name, size)
+    w = 0.0
+    for i, ch in enumerate(text):
+        w += text_width(ch, font_name, size)
+        if w > budget: return text[:i].rstrip() + ELLIPSIS
+    return text
+
+def fit(text, font_name="arial.ttf", max_w=400, max_h=400, max_size=48, min_size=16, step=4):
+    """Sabse bada font size jisme wrapped text box me aa jaye -> (size, lines).
+    min_size pe bhi na aaye to jitni lines aati hain utni, aakhri pe '…'."""
+    def build():
+        size = max_size
+        while True:
+            lines = _wrap(text, font_name, size, max_w)
+            if len(lines) * line_height(size) <= max_h or size <= min_size: break
+            size = max(min_size, size - step)
+        keep = max(1, max_h // line_height(size))
+        if len(lines) > keep:
+            lines = lines[:keep]
+            lines[-1] = ellipsize(lines[-1] + " " + ELLIPSIS, font_name, size, max_w)
+        return size, tuple(lines)
+    return _cached(("fit", text, font_name, max_w, max_h, max_size, min_size, step), build)
+
+def fit_line(text, font_name="arial.ttf", max_w=400, max_size=40, min_size=16, step=2):
+    """Single line (naam, title): shrink karo, phir bhi lamba ho to ellipsize -> (size, text)"""
+    def build():
+        size = max_size
+        while size > min_size and text_width(text, font_name, size) > max_w: size = max(min_size, size - step)
+        return size, ellipsize(text, font_name, size, max_w)
+    return _cached(("line", text, font_name, max_w, max_size, min_size, step), build)
+
+def stats():
+    return dict(LAYOUT_STATS, cached=len(LAYOUT_CACHE), fonts=len(GLYPH_CACHE))
@@ -0,0 +1,158 @@
+import os
+import random
+import threading
+
+# ==========================================
+# 🧮 TICTACTOE SOLVED TABLE
+# ==========================================
+# Board code = base-3 number: cell i ki value (0 khali, 1 X, 2 O) * 3^i. 3^9 = 19683 codes.
+# Har code ke liye ek byte per table (bytearray), to winner / best move / value sab O(1) lookup.
+# Minimax sirf symmetric canonical forms (8 rotations/flips ka min code) pe chalta hai.
+TABLE_PATH = os.environ.get("TTT_TABLE_PATH", "ttt_table.bin")
+TABLE_VERSION = b"TTT1"
+CELLS = 9
+N_CODES = 3 ** CELLS
+POW3 = [3 ** i for i in range(CELLS)]
+MARKS = {" ": 0, "X": 1, "O": 2}
+SYMBOLS = {0: None, 1: "X", 2: "O", 3: "Draw"}
+LINES = [(0,1,2), (3,4,5), (6,7,8), (0,3,6), (1,4,7), (2,5,8), (0,4,8), (2,4,6)]
+# cell permutations: 4 rotations x (flip / no flip)
+_ROT = [6, 3, 0, 7, 4, 1, 8, 5, 2]
+_FLIP = [2, 1, 0, 5, 4, 3, 8, 7, 6]
+
+NO_MOVE = 255
+UNREACHABLE = 255
+# VALUE (side to move ke nazar se): 0 = haar, 1 = draw, 2 = jeet
+LOSS, DRAW, WIN = 0, 1, 2
+
+WINNER = bytearray(N_CODES) # 0 koi nahi, 1 X, 2 O, 3 draw
+VALUE = bytearray([UNREACHABLE]) * N_CODES
+BEST_MOVE = bytearray([NO_MOVE]) * N_CODES
+_loaded = threading.Event()
+_load_lock = threading.Lock()
+
+def _symmetries():
+    perms, p = [], list(range(CELLS))
+    for _ in range(4):
+        perms.append(p)
+        perms.append([p[_FLIP[i]] for i in range(CELLS)])
+        p = [p[_ROT[i]] for i in range(CELLS)]
+    return perms
+
+SYMMETRIES = _symmetries()
+
+def encode(board):
+    """[" ", "X", "O", ...] -> code"""
+    return sum(MARKS[m] * POW3[i] for i, m in enumerate(board))
+
+def cells(code):
+    return [(code // POW3[i]) % 3 for i in range(CELLS)]
+
+def to_move(code):
+    c = cells(code)
+    return 1 if c.count(1) == c.count(2) else 2
+
+def canonical(code):
+    c = cells(code)
+    return min(sum(c[perm[i]] * POW3[i] for i in range(CELLS)) for perm in SYMMETRIES)
+
+def _winner(c):
+    for a, b, d in LINES:
+        if c[a] and c[a] == c[b] == c[d]: return c[a]
+    return 3 if 0 not in c else 0
+
+# ==========================================
+# 🏗️ BUILD (minimax over canonical forms)
+# ==========================================
+def build():
+    """Poora table compute karo (~0.5s). Normal startup pe load() file se padhta hai."""
+    for code in range(N_CODES): WINNER[code] = _winner(cells(code))
+    memo = {} # canonical code -> value for side to move
+
+    def solve(code):
+        key = canonical(code)
+        if key in memo: return memo[key]
+        if WINNER[code]:
+            # Game khatam: jisne abhi chaal chali wahi jeeta (ya draw) -> side to move ke liye haar/draw
+            v = DRAW if WINNER[code] == 3 else LOSS
+        else:
+            side = to_move(code)
+            c = cells(code)
+            # Child ka value opponent ke nazar se hai, isliye 2 - v
+            v = max(2 - solve(code + side * POW3[i]) for i in range(CELLS) if c[i] == 0)
+        memo[key] = v
+        return v
+
+    # Sirf reachable positions (empty board se) ke liye VALUE/BEST_MOVE bharo
+    stack, seen = [0], {0}
+    while stack:
+        code = stack.pop()
+        VALUE[code] = solve(code)
+        if WINNER[code]: continue
+        side, c = to_move(code), cells(code)
+        best, best_v = NO_MOVE, -1
+        for i in range(CELLS):
+            if c[i]: continue
+            child = code + side * POW3[i]
+            v = 2 - solve(child)
+            if v > best_v: best, best_v = i, v
+            if child not in seen:
+                seen.add(child); stack.append(child)
+        BEST_MOVE[code] = best
+    _loaded.set()
+
+def save(path=TABLE_PATH):
+    with open(path, "wb") as f:
+        f.write(TABLE_VERSION + bytes(WINNER) + bytes(VALUE) + bytes(BEST_MOVE))
+
+def load(path=TABLE_PATH):
+    """File se table (3 x 19683 bytes) padho; na mile / purana ho to build + save. Thread-safe, ek hi baar."""
+    if _loaded.is_set(): return
+    with _load_lock:
+        if _loaded.is_set(): return
+        try:
+            with open(path, "rb") as f: raw = f.read()
+            if raw[:4] != TABLE_VERSION or len(raw) != 4 + 3 * N_CODES: raise ValueError("stale table")
+            raw = memoryview(raw)[4:]
+            WINNER[:] = raw[:N_CODES]; VALUE[:] = raw[N_CODES:2 * N_CODES]; BEST_MOVE[:] = raw[2 * N_CODES:]
+            _loaded.set()
+        except (OSError, ValueError):
+            build()
+            try: save(path)
+            except OSError as e: print(f"[TTT] table save failed: {e}")
+
+# ==========================================
+# 🎯 LOOKUPS
+# ==========================================
+def winner(code):
+    """None / "X" / "O" / "Draw" """
+    if not _loaded.is_set(): load()
+    return SYMBOLS[WINNER[code]]
+
+def play(code, cell, side):
+    """side = "X"/"O" -> naya code"""
+    return code + MARKS[side] * POW3[cell]
+
+def legal_moves(code):
+    return [i for i in range(CELLS) if (code // POW3[i]) % 3 == 0]
+
+def optimal_moves(code):
+    """Saari best chaalein (variety ke liye, value same) - children scan, perfect level ise use nahi karta"""
+    load()
+    side = to_move(code)
+    moves = legal_moves(code)
+    scored = [(2 - VALUE[code + side * POW3[i]], i) for i in moves]
+    best = max(v for v, _ in scored)
+    return [i for v, i in scored if v == best]
+
+DIFFICULTIES = {"easy": 0.0, "medium": 0.6, "perfect": 1.0} # best move lene ki probability
+
+def choose_move(code, difficulty="perfect", rng=random):
+    """Perfect = BEST_MOVE table se O(1). Easy/Medium me best chaalon me random tie-break (variety)."""
+    load()
+    p_best = DIFFICULTIES.get(difficulty, 1.0)
+    if p_best >= 1.0 and BEST_MOVE[code] != NO_MOVE: return BEST_MOVE[code]
+    moves = legal_moves(code)
+    if not moves: return None
+    if rng.random() < p_best: return rng.choice(optimal_moves(code))
+    return rng.choice(moves)
@@ -1,8 +1,13 @@
-from flask import Blueprint, render_template_string, request, jsonify
+from flask import Blueprint, render_template_string, request, jsonify, send_from_directory
 import os
 import time
 import psutil 
 import db 
+import utils
+import render_pool
+import memory_governor
+import game_session
+import music_resolver
 
 ui_bp = Blueprint('ui', __name__)
 
@@ -61,6 +66,14 @@ DASHBOARD_HTML = """
         <h3>Live Data</h3>
         <p>Active Rooms: <span id="room-list"></span></p>
         <p>Plugins: <span id="plugin-list"></span></p>
+        <p>HTTP Latency: <span id="http-list"></span></p>
+        <p>Upload Backends: <span id="upload-list"></span></p>
+        <p>Renders: <span id="render-stats"></span></p>
+    </div>
+    <div class="card">
+        <h3>Memory</h3>
+        <p>RSS: <span id="rss"></span> &nbsp; GC: <span id="gc-stats"></span></p>
+        <svg id="rss-trend" width="100%" height="60" viewBox="0 0 180 60" preserveAspectRatio="none"><polyline fill="none" stroke="#8B5CF6" stroke-width="1.5" points=""/></svg>
     </div>
 
 <script>
@@ -79,6 +92,15 @@ DASHBOARD_HTML = """
         document.getElementById('log-window').innerHTML = res.logs.map(l => `<div>${l}</div>`).join('');
         document.getElementById('room-list').innerText = res.rooms.join(', ');
         document.getElementById('plugin-list').innerText = res.plugins.join(', ');
+        const m = res.memory, peak = Math.max(m.budget_mb, ...m.rss_trend);
+        document.getElementById('rss').innerText = `${m.rss_mb} MB / budget ${m.budget_mb} MB`;
+        document.getElementById('gc-stats').innerText = `${m.pauses} pauses, ${m.pause_ms_total} ms total, max ${m.pause_ms_max} ms, forced ${m.forced} | recent: ${m.recent_pauses.join(' ')}`;
+        document.querySelector('#rss-trend polyline').setAttribute('points', m.rss_trend.map((v, i) => `${i},${60 - 58 * v / peak}`).join(' '));
+        document.getElementById('render-stats').innerText = Object.entries(res.render).map(([k, v]) => `${k}: ${v}`).join(', ');
+        document.getElementById('upload-list').innerText = Object.entries(res.uploads).map(([n, s]) =>
+            `${n}${s.available ? '' : ' (off)'}: ${s.served} ok / ${s.failed} fail, ~${s.ms}ms`).join(' | ');
+        document.getElementById('http-list').innerText = Object.entries(res.http).map(([h, s]) =>
+            `${h}: ${s.count} req, ${s.errors} err, ms<= ` + Object.entries(s.hist).filter(([b, n]) => n).map(([b, n]) => `${b}:${n}`).join(' ')).join(' | ');
     }, 2000);
 </script>
 </body>
@@ -104,9 +126,21 @@ def register_routes(app, bot_instance):
             "running": bot_instance.running,
             "logs": bot_instance.logs[-20:],
             "rooms": bot_instance.active_rooms,
-            "plugins": list(bot_instance.plugins.plugins.keys())
+            "plugins": list(bot_instance.plugins.plugins.keys()),
+            "http": utils.http_stats(),
+            "uploads": utils.UPLOAD_ROUTER.stats(),
+            "upload_cache": dict(utils.UPLOAD_CACHE_STATS, size=len(utils.UPLOAD_CACHE), pending=len(utils._url_dirty)),
+            "render": render_pool.RENDER_STATS,
+            "memory": memory_governor.stats(),
+            "sessions": game_session.stats(),
+            "music": music_resolver.stats()
         })
 
+    # Static upload backend ki images yahin se serve hoti hain
+    @app.route('/media/<path:name>')
+    def media(name):
+        return send_from_directory(os.path.abspath(utils.MEDIA_DIR), name, max_age=86400)
+
     @app.route('/api/stop', methods=['POST'])
     def stop_bot(): 
         bot_instance.disconnect()
@@ -4,41 +4,128 @@ import requests
 import urllib3
 import threading
 import time
-import gc
 import uuid
+import hashlib
 import logging
+import concurrent.futures
+from collections import OrderedDict
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from PIL import Image, ImageDraw, ImageFont
-from requests_toolbelt.multipart.encoder import MultipartEncoder
+import db
 # --- CONFIGURATION & SAFETY ---
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 font_lock = threading.Lock()
 print_lock = threading.Lock()
-FONT_CACHE = {}
-MAX_FONT_CACHE = 30 
+FONT_CACHE = OrderedDict()
+MAX_FONT_CACHE = 64 # plugins ke draw sizes + image_pm themes ke fit sizes (48..20) aaram se aa jayein
+FONT_STATS = {"hits": 0, "misses": 0, "evictions": 0}
+# (font, size) pairs the plugins draw with - warmed once at startup. 100 = text_layout.REF_SIZE
+# (har font ke glyphs isi size pe naape jaate hain), times/verdana image_pm themes ke.
+PRELOAD_FONTS = ([("arial.ttf", s) for s in (16, 20, 22, 25, 35, 40, 45, 50, 100)]
+                 + [(f, s) for f in ("times.ttf", "verdana.ttf") for s in (100, 48)])
+_FONT_PATHS = {}
+_MISSING = object()
 logging.basicConfig(level=logging.ERROR)
 
 def safe_print(msg):
     with print_lock: print(msg)
 
-# --- 1. FONT LOADER (Full) ---
+# --- 1. FONT LOADER (LRU) ---
+def _resolve_font_path(font_name):
+    """Font file ka path sirf ek baar dhoondo, phir yaad rakho"""
+    path = _FONT_PATHS.get(font_name, _MISSING)
+    if path is _MISSING:
+        search_paths = [f"fonts/{font_name}", font_name, f"/usr/share/fonts/truetype/dejavu/{font_name}"]
+        path = next((p for p in search_paths if os.path.exists(p)), None)
+        _FONT_PATHS[font_name] = path
+    return path
+
 def get_font(font_name="arial.ttf", size=20):
-    global FONT_CACHE
-    cache_key = f"{font_name}_{size}"
+    cache_key = (font_name, size)
+    # Hit path: no lock. dict/OrderedDict ops are atomic under the GIL.
+    font_obj = FONT_CACHE.get(cache_key, _MISSING)
+    if font_obj is not _MISSING:
+        try: FONT_CACHE.move_to_end(cache_key)
+        except KeyError: pass # evicted by a concurrent miss, still safe to use
+        FONT_STATS["hits"] += 1
+        return font_obj
     with font_lock:
-        if cache_key in FONT_CACHE: return FONT_CACHE[cache_key]
-        if len(FONT_CACHE) >= MAX_FONT_CACHE: FONT_CACHE.clear(); gc.collect()
-        search_paths = [f"fonts/{font_name}", font_name, f"/usr/share/fonts/truetype/dejavu/{font_name}"]
+        font_obj = FONT_CACHE.get(cache_key, _MISSING)
+        if font_obj is not _MISSING: return font_obj
+        FONT_STATS["misses"] += 1
         font_obj = None
-        for path in search_paths:
-            if os.path.exists(path):
-                try: font_obj = ImageFont.truetype(path, size); break
-                except: continue
+        path = _resolve_font_path(font_name)
+        if path:
+            try: font_obj = ImageFont.truetype(path, size)
+            except: pass
         if not font_obj:
             try: font_obj = ImageFont.load_default()
             except: pass
         FONT_CACHE[cache_key] = font_obj
+        while len(FONT_CACHE) > MAX_FONT_CACHE:
+            FONT_CACHE.popitem(last=False)
+            FONT_STATS["evictions"] += 1
         return font_obj
 
+def preload_fonts(pairs=None):
+    for font_name, size in (pairs or PRELOAD_FONTS): get_font(font_name, size)
+
+def font_stats():
+    hits, misses = FONT_STATS["hits"], FONT_STATS["misses"]
+    total = hits + misses
+    return dict(FONT_STATS, size=len(FONT_CACHE), hit_ratio=round(hits / total, 4) if total else 0.0)
+
+# --- 🌐 HTTP CLIENT (keep-alive pool per host) ---
+# Har upload/avatar pe naya DNS + TCP + TLS handshake mat karo. Ek host = ek Session.
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", 10))
+HTTP_MAX_PER_HOST = int(os.environ.get("HTTP_MAX_PER_HOST", 8))
+HTTP_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf"))
+HTTP_STATS = {}
+_http_sessions = {}
+_http_limits = {}
+http_lock = threading.Lock()
+
+def _host_client(host):
+    with http_lock:
+        if host not in _http_sessions:
+            s = requests.Session()
+            # POST pe sirf connect errors retry hote hain (body tab tak bheja hi nahi gaya)
+            retry = Retry(total=2, connect=2, read=1, status=2, backoff_factor=0.3,
+                          status_forcelist=(429, 500, 502, 503, 504))
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+            s.mount("https://", adapter); s.mount("http://", adapter)
+            s.headers["User-Agent"] = "Mozilla/5.0"
+            _http_sessions[host] = s
+            _http_limits[host] = threading.BoundedSemaphore(HTTP_MAX_PER_HOST)
+            HTTP_STATS[host] = {"count": 0, "errors": 0, "hist": {str(b): 0 for b in HTTP_BUCKETS_MS}}
+        return _http_sessions[host], _http_limits[host], HTTP_STATS[host]
+
+def http_request(method, url, **kwargs):
+    """Shared session se request. Exceptions caller tak jaate hain (pehle jaisa)."""
+    host = urlparse(url).netloc
+    session, limit, st = _host_client(host)
+    kwargs.setdefault("timeout", 30)
+    t0 = time.perf_counter()
+    ok = False
+    try:
+        with limit:
+            r = session.request(method, url, **kwargs)
+        ok = r.status_code < 500
+        return r
+    finally:
+        ms = (time.perf_counter() - t0) * 1000
+        st["count"] += 1
+        if not ok: st["errors"] += 1
+        st["hist"][str(next(b for b in HTTP_BUCKETS_MS if ms <= b))] += 1
+
+def http_get(url, **kwargs): return http_request("GET", url, **kwargs)
+def http_post(url, **kwargs): return http_request("POST", url, **kwargs)
+
+def http_stats():
+    return {host: dict(st, hist=dict(st["hist"])) for host, st in list(HTTP_STATS.items())}
+
 # --- 2. TEXT UTILS (Full) ---
 def fancy_text(text):
     n = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
@@ -48,17 +135,18 @@ def fancy_text(text):
 # --- 3. GRAPHIC ENGINE (Full) ---
 def create_canvas(w, h, color=(0,0,0)): return Image.new('RGB', (w,h), color)
 def draw_circle_avatar(canvas, url, x, y, size, **kwargs):
+    """Avatar paste hua to True; url nahi / fetch fail -> False (canvas jaisa tha waisa)"""
     try:
-        if not url: return
-        headers = {"User-Agent": "Mozilla/5.0"}
-        r = requests.get(url, headers=headers, timeout=5, verify=False)
-        if r.status_code != 200: return
+        if not url: return False
+        r = http_get(url, timeout=5, verify=False)
+        if r.status_code != 200: return False
         with io.BytesIO(r.content) as buf, Image.open(buf) as av_raw:
             av = av_raw.convert("RGBA").resize((size,size), Image.Resampling.LANCZOS)
             mask = Image.new("L", (size,size), 0); ImageDraw.Draw(mask).ellipse((0,0,size,size), fill=255)
             canvas.paste(av, (x,y), mask)
         if kwargs.get('border_width', 0) > 0: ImageDraw.Draw(canvas).ellipse([x-kwargs['border_width'],y-kwargs['border_width'],x+size+kwargs['border_width'],y+size+kwargs['border_width']], outline=kwargs['border_color'], width=kwargs['border_width'])
-    except: pass
+        return True
+    except: return False
 def draw_gradient_bg(canvas, start, end):
     w,h=canvas.size; base=Image.new('RGB',(w,h),start); top=Image.new('RGB',(w,h),end)
     mask=Image.new('L',(w,h)); d=[]
@@ -67,85 +155,475 @@ def draw_gradient_bg(canvas, start, end):
 def draw_rounded_rect(canvas, coords, r, color, **kwargs):
     ImageDraw.Draw(canvas).rounded_rectangle(coords, r, fill=color, **kwargs)
 
+# --- 🧱 ENCODER (render backends isko worker process me bhi chalate hain) ---
+# Image class ke hisab se format:
+#   "flat"  -> game boards / wheels / text cards: palette PNG (chhota + tez)
+#   "photo" -> avatars, gradients, board photo: baseline JPEG (no quantize pass)
+#   "anim"  -> shared-palette P frames ki list (frame.info["duration"] ms) -> GIF, ek baar play
+# Agar kisi class ka encode CPU time budget se upar chala jaye to fast settings use hoti hain.
+ENCODE_BUDGET_MS = float(os.environ.get("ENCODE_BUDGET_MS", 25))
+ENCODE_BUDGETS = {"anim": float(os.environ.get("ANIM_BUDGET_MS", 150))} # baaki kinds = ENCODE_BUDGET_MS
+ANIM_MAX_BYTES = int(os.environ.get("ANIM_MAX_BYTES", 1536 * 1024)) # isse bada GIF -> ValueError, caller static bheje
+ENCODE_WEBP = os.environ.get("ENCODE_WEBP") == "1" # client WebP dikhata ho tabhi on karo
+ENCODE_STATS = {}
+IMAGE_TYPES = {b"\x89PNG": ("png", "image/png"), b"\xff\xd8": ("jpg", "image/jpeg"),
+               b"GIF8": ("gif", "image/gif"), b"RIFF": ("webp", "image/webp")}
+
+def _encode_flat(image, buf, fast):
+    pal = image.convert("RGB").quantize(colors=64 if fast else 128, method=Image.Quantize.FASTOCTREE)
+    pal.save(buf, format="PNG", compress_level=1 if fast else 6)
+
+def _encode_photo(image, buf, fast):
+    img = image.convert("RGB")
+    if ENCODE_WEBP and not fast: img.save(buf, format="WEBP", quality=75, method=2)
+    else: img.save(buf, format="JPEG", quality=65 if fast else 70, optimize=not fast)
+
+def _encode_anim(frames, buf, fast):
+    if fast and len(frames) > 3:
+        # Har doosra frame chhodo, uska time pichle frame me jod do (total duration same)
+        kept = []
+        for i, f in enumerate(frames):
+            if i % 2 and i != len(frames) - 1: kept[-1].info["duration"] += f.info["duration"]
+            else: kept.append(f)
+        frames = kept
+    start = buf.tell()
+    frames[0].save(buf, format="GIF", save_all=True, append_images=frames[1:],
+                   duration=[f.info["duration"] for f in frames], disposal=1)
+    if buf.tell() - start > ANIM_MAX_BYTES:
+        raise ValueError(f"animation too large ({(buf.tell() - start) // 1024} KB)")
+
+ENCODERS = {"flat": _encode_flat, "photo": _encode_photo, "anim": _encode_anim}
+
+# --- 🪣 ENCODE BUFFER POOL ---
+# Har upload pe naya BytesIO + getvalue() copy nahi; buffers reuse hote hain aur upload
+# seedha unke memoryview se stream hota hai. Chhote Render instance pe fragmentation kam.
+MAX_POOLED_BUFFERS = int(os.environ.get("MAX_POOLED_BUFFERS", 8))
+MAX_POOLED_BUFFER_SIZE = 4 * 1024 * 1024 # isse bade buffers pool me wapas nahi jaate
+
+class BufferPool:
+    def __init__(self, max_buffers=MAX_POOLED_BUFFERS):
+        self.max_buffers = max_buffers
+        self.free = []
+        self.lock = threading.Lock()
+        self.stats = {"reused": 0, "created": 0, "dropped": 0}
+
+    def acquire(self):
+        with self.lock:
+            while self.free:
+                buf = self.free.pop()
+                try: buf.seek(0); buf.write(b"") # koi view abhi bhi zinda ho to BufferError
+                except BufferError:
+                    self.stats["dropped"] += 1
+                    continue
+                self.stats["reused"] += 1
+                return buf
+            self.stats["created"] += 1
+        return io.BytesIO()
+
+    def release(self, buf):
+        # truncate() nahi - wo memory free kar deta hai; purana tail data bas ignore hota hai
+        with self.lock:
+            if len(self.free) < self.max_buffers and buf.getbuffer().nbytes <= MAX_POOLED_BUFFER_SIZE:
+                self.free.append(buf)
+            else: self.stats["dropped"] += 1
+
+ENCODE_BUFFERS = BufferPool()
+
+class EncodedImage:
+    """Encoded bytes ka read-only view (pooled buffer ya plain bytes). Refcounted:
+    har user retain()/release() kare; aakhri release pe buffer pool me wapas."""
+    def __init__(self, buf=None, size=0, data=None):
+        self.buf = buf
+        self.refs = 1
+        self.lock = threading.Lock()
+        if buf is not None:
+            self._full = buf.getbuffer()
+            self.view = self._full[:size]
+        else:
+            self._full = None
+            self.view = memoryview(data)
+
+    def retain(self):
+        with self.lock: self.refs += 1
+        return self
+
+    def release(self):
+        with self.lock:
+            self.refs -= 1
+            if self.refs: return
+        self.view.release()
+        if self._full is not None:
+            self._full.release()
+            ENCODE_BUFFERS.release(self.buf)
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.release()
+
+def encode_pooled(image, kind="photo"):
+    """PIL image -> EncodedImage (pooled buffer me, format kind ke hisab se)"""
+    st = ENCODE_STATS.setdefault(kind, {"count": 0, "fast": 0, "ms": 0.0, "bytes": 0})
+    # Budget cross -> fast mode. Har 10th encode full settings pe dobara naapo taaki wapas aa sakein.
+    fast = st["ms"] > ENCODE_BUDGETS.get(kind, ENCODE_BUDGET_MS) and st["count"] % 10 != 0
+    buf = ENCODE_BUFFERS.acquire()
+    try:
+        t0 = time.thread_time()
+        ENCODERS[kind](image, buf, fast)
+        ms = (time.thread_time() - t0) * 1000
+    except Exception:
+        ENCODE_BUFFERS.release(buf)
+        raise
+    size = buf.tell()
+    st["count"] += 1; st["bytes"] = size
+    if fast: st["fast"] += 1
+    else: st["ms"] = ms if st["count"] == 1 else st["ms"] * 0.8 + ms * 0.2
+    return EncodedImage(buf, size)
+
+def encode_image(image, kind="photo"):
+    """PIL image -> encoded bytes (copy; process pool / bench ke liye)"""
+    with encode_pooled(image, kind) as enc:
+        return bytes(enc.view)
+
+def image_type(data):
+    """(extension, mime) encoded bytes ke magic se"""
+    return next((t for magic, t in IMAGE_TYPES.items() if data[:len(magic)] == magic), ("jpg", "image/jpeg"))
+
+# --- ♻️ UPLOAD CACHE (hash -> hosted URL, RAM LRU + DB) ---
+# Same bytes (empty board, same spin result, same profile) dobara upload nahi honge.
+# Lookups sirf RAM se (DB ek baar startup pe load_url_cache()), writes batch me writer thread pe -
+# upload path kabhi db_lock pe nahi rukta (wahi lock add_game_result bhi leta hai).
+# Host image hata de to: purane hit pe background HEAD, 404/410 aaye to forget_url().
+UPLOAD_CACHE = OrderedDict() # key -> [url, created, last verified]
+MAX_UPLOAD_CACHE = 512
+UPLOAD_CACHE_TTL = int(os.environ.get("UPLOAD_CACHE_TTL", 7 * 86400)) # host URL drop kar de to itne me expire
+UPLOAD_VERIFY_SEC = int(os.environ.get("UPLOAD_VERIFY_SEC", 6 * 3600)) # itna purana hit ho to HEAD se check
+UPLOAD_CACHE_FLUSH_MS = 1000
+UPLOAD_CACHE_STATS = {"hits": 0, "misses": 0, "expired": 0, "loaded": 0, "verified": 0, "dead": 0,
+                      "written": 0, "flush_errors": 0}
+_url_dirty = {} # key -> (url, created) ya None (delete)
+_url_dirty_lock = threading.Lock()
+_url_wake = threading.Event()
+_url_writer = None
+verify_executor = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="url-verify")
+
+def content_key(data):
+    return hashlib.sha1(data).hexdigest()
+
+def load_url_cache():
+    """Startup pe ek query: DB ke sabse naye (TTL ke andar) MAX_UPLOAD_CACHE entries RAM me"""
+    rows = db.load_cached_urls(int(time.time()) - UPLOAD_CACHE_TTL, MAX_UPLOAD_CACHE)
+    for key, url, created in reversed(rows): _remember_local(key, url, created)
+    UPLOAD_CACHE_STATS["loaded"] += len(rows)
+    return len(rows)
+
+def cached_url(key):
+    entry = UPLOAD_CACHE.get(key)
+    if entry is None:
+        UPLOAD_CACHE_STATS["misses"] += 1
+        return None
+    url, created, checked = entry
+    now = time.time()
+    if now - created > UPLOAD_CACHE_TTL:
+        UPLOAD_CACHE_STATS["expired"] += 1
+        forget_url(key=key)
+        return None
+    try: UPLOAD_CACHE.move_to_end(key)
+    except KeyError: pass
+    UPLOAD_CACHE_STATS["hits"] += 1
+    if now - checked > UPLOAD_VERIFY_SEC:
+        entry[2] = now # ek hi verify chale
+        verify_executor.submit(_verify_url, key, url)
+    return url
+
+def _verify_url(key, url):
+    """Host pe image abhi hai? Sirf saaf 404/410 pe bhoolo (network blip pe nahi)"""
+    try: r = http_request("HEAD", url, timeout=10, allow_redirects=True)
+    except Exception: return
+    UPLOAD_CACHE_STATS["verified"] += 1
+    if r.status_code in (404, 410):
+        UPLOAD_CACHE_STATS["dead"] += 1
+        forget_url(url=url)
+
+def _remember_local(key, url, created):
+    UPLOAD_CACHE[key] = [url, created, created]
+    try: UPLOAD_CACHE.move_to_end(key)
+    except KeyError: pass
+    while len(UPLOAD_CACHE) > MAX_UPLOAD_CACHE:
+        try: UPLOAD_CACHE.popitem(last=False)
+        except KeyError: break
+
+def _ephemeral(url):
+    """Static backend ki file (restart/deploy/prune pe gayab) - sirf RAM me yaad rakho"""
+    return bool(PUBLIC_BASE_URL) and url.startswith(PUBLIC_BASE_URL + "/media/")
+
+def remember_url(key, url):
+    created = int(time.time())
+    _remember_local(key, url, created)
+    if not _ephemeral(url): _queue_url(key, (url, created))
+
+def forget_url(key=None, url=None):
+    """Host ne image hata di ho to entry nikal do (key ya url se - same URL kai keys pe ho sakta hai)"""
+    keys = {key} if key else set()
+    if url: keys.update(k for k, e in list(UPLOAD_CACHE.items()) if e[0] == url)
+    for k in keys:
+        entry = UPLOAD_CACHE.pop(k, None)
+        if not (entry and _ephemeral(entry[0])): _queue_url(k, None)
+
+def _queue_url(key, row):
+    global _url_writer
+    with _url_dirty_lock:
+        _url_dirty[key] = row
+        if _url_writer is None:
+            _url_writer = threading.Thread(target=_url_write_loop, daemon=True, name="url-cache-writer")
+            _url_writer.start()
+    _url_wake.set()
+
+def _url_write_loop():
+    while True:
+        _url_wake.wait()
+        time.sleep(UPLOAD_CACHE_FLUSH_MS / 1000) # itni der ke uploads ek batch me
+        _url_wake.clear()
+        flush_url_cache()
+
+def flush_url_cache():
+    """Pending entries DB me ek transaction me (writer thread, ya shutdown/bench se seedha)"""
+    global _url_dirty
+    with _url_dirty_lock:
+        batch, _url_dirty = _url_dirty, {}
+    if not batch: return
+    rows = [(key,) + row for key, row in batch.items() if row]
+    deleted = [key for key, row in batch.items() if row is None]
+    if db.save_cached_urls(rows, deleted):
+        UPLOAD_CACHE_STATS["written"] += len(rows)
+        return
+    UPLOAD_CACHE_STATS["flush_errors"] += 1
+    with _url_dirty_lock:
+        for key, row in batch.items(): _url_dirty.setdefault(key, row)
+
+# --- 🛰️ UPLOAD BACKENDS ---
+# Har backend: upload(data, filename, mime, room) -> url ya None. Router inme se chunta hai.
+MEDIA_DIR = os.environ.get("MEDIA_DIR", "media")
+MEDIA_MAX_FILES = int(os.environ.get("MEDIA_MAX_FILES", 500))
+MEDIA_PRUNE_SEC = 60
+# Static backend opt-in: sirf jab PUBLIC_BASE_URL khud set karo (Render ki disk har deploy/restart pe saaf hoti hai)
+PUBLIC_BASE_URL = os.environ.get("PUBLIC_BASE_URL", "").rstrip("/")
+# chatp room uploads (is_private=no) default me nahi - chahiye to UPLOAD_BACKENDS me daalo
+UPLOAD_BACKENDS = os.environ.get("UPLOAD_BACKENDS", "catbox,static,local").split(",")
+UPLOAD_HEDGE_MS = float(os.environ.get("UPLOAD_HEDGE_MS", 2500)) # itni der me reply na aaye to doosra backend bhi try
+UPLOAD_JID = {"jid": None} # bot login pe set hota hai (chatp upload ke liye)
+
+class MultipartStream:
+    """multipart/form-data body jo file part ko memoryview slices me hi bhejta hai (koi copy nahi).
+    fields: {name: "value"} ya {name: (filename, bytes/memoryview, mime)}"""
+    def __init__(self, fields):
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        parts = []
+        for name, value in fields.items():
+            if isinstance(value, tuple):
+                filename, data, mime = value
+                parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                             f'Content-Type: {mime}\r\n\r\n'.encode())
+                parts.append(memoryview(data))
+                parts.append(b"\r\n")
+            else:
+                parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+        parts.append(f"--{boundary}--\r\n".encode())
+        self.parts = [memoryview(p) for p in parts]
+        self.length = sum(p.nbytes for p in self.parts)
+        self.seek(0)
+
+    def __len__(self): return self.length
+
+    def tell(self): return self.pos
+
+    def seek(self, pos, whence=0):
+        self.pos = pos if whence == 0 else self.length + pos if whence == 2 else self.pos + pos
+        self.idx, self.off = 0, self.pos
+        while self.idx < len(self.parts) and self.off >= self.parts[self.idx].nbytes:
+            self.off -= self.parts[self.idx].nbytes; self.idx += 1
+        return self.pos
+
+    def read(self, n=-1):
+        # Ek call me zyada se zyada ek part ka slice - http.client tab tak padhta hai jab tak b"" na mile
+        if self.idx >= len(self.parts): return b""
+        part = self.parts[self.idx]
+        end = part.nbytes if n is None or n < 0 else min(part.nbytes, self.off + n)
+        chunk = part[self.off:end]
+        self.pos += end - self.off
+        if end == part.nbytes: self.idx, self.off = self.idx + 1, 0
+        else: self.off = end
+        return chunk
+
+def _multipart_post(url, fields):
+    body = MultipartStream(fields)
+    return http_post(url, data=body, headers={'Content-Type': body.content_type})
+
+class UploadBackend:
+    name = "base"
+    def __init__(self):
+        self.ms = None; self.err = 0.0; self.served = 0; self.failed = 0
+
+    def available(self): return True
+
+    def score(self):
+        # Rolling latency, errors pe bhaari penalty
+        return (self.ms if self.ms is not None else 1000) * (1 + 10 * self.err)
+
+    def record(self, ms, ok):
+        if ok:
+            self.served += 1
+            self.ms = ms if self.ms is None else self.ms * 0.8 + ms * 0.2
+        else: self.failed += 1
+        self.err = self.err * 0.9 + (0.0 if ok else 0.1)
+
+    def stats(self):
+        return {"ms": round(self.ms or 0), "err": round(self.err, 3), "served": self.served, "failed": self.failed}
+
+class CatboxBackend(UploadBackend):
+    name = "catbox"
+    def upload(self, data, filename, mime, room=None):
+        r = _multipart_post('https://catbox.moe/user/api.php',
+                            {'reqtype': 'fileupload', 'fileToUpload': (filename, data, mime)})
+        if r.status_code == 200 and "http" in r.text: return r.text.strip()
+        safe_print(f"❌ Upload Fail (Catbox): {r.status_code}")
+
+class ChatpBackend(UploadBackend):
+    """chatp.net ka apna upload endpoint - PM images (upload_private_bytes). Room ke liye sirf opt-in."""
+    name = "chatp"
+    def available(self): return bool(UPLOAD_JID["jid"])
+
+    def upload(self, data, filename, mime, room=None, private=False, jid=None):
+        r = _multipart_post("https://chatp.net/api/upload", {
+            "file": (filename, data, mime),
+            "jid": jid or UPLOAD_JID["jid"],
+            "is_private": "yes" if private else "no",
+            "to": room or "",
+            "device_id": uuid.uuid4().hex
+        })
+        if r.status_code == 200: return r.text.strip()
+        safe_print(f"❌ Upload Fail (Chatp): {r.status_code}")
+
+class StaticBackend(UploadBackend):
+    """Apne Flask app se serve karo (/media/<file>). PUBLIC_BASE_URL chahiye.
+    Files ephemeral hain: URL cache inhe DB me nahi likhta, aur prune hui file ka URL cache se bhi hatta hai."""
+    name = "static"
+    def __init__(self):
+        super().__init__()
+        self.pruner = None
+
+    def available(self): return bool(PUBLIC_BASE_URL)
+
+    def upload(self, data, filename, mime, room=None):
+        os.makedirs(MEDIA_DIR, exist_ok=True)
+        with open(os.path.join(MEDIA_DIR, filename), "wb") as f: f.write(data)
+        if self.pruner is None:
+            self.pruner = threading.Thread(target=self._prune_loop, daemon=True, name="media-prune")
+            self.pruner.start()
+        return f"{PUBLIC_BASE_URL}/media/{filename}"
+
+    def _prune_loop(self):
+        while True:
+            time.sleep(MEDIA_PRUNE_SEC)
+            try: self.prune()
+            except Exception as e: safe_print(f"❌ Media Prune Error: {e}")
+
+    def prune(self):
+        """Sabse purani files MEDIA_MAX_FILES ke upar - upload path pe nahi, timer pe"""
+        files = sorted(os.scandir(MEDIA_DIR), key=lambda e: e.stat().st_mtime)
+        for old in files[:max(0, len(files) - MEDIA_MAX_FILES)]:
+            try: os.remove(old.path)
+            except OSError: continue
+            forget_url(url=f"{PUBLIC_BASE_URL}/media/{old.name}")
+
+class FormBackend(UploadBackend):
+    """Generic 'POST multipart, response body = URL' host. Tests me local stand-in server ke liye."""
+    def __init__(self, name, url, field="file"):
+        super().__init__()
+        self.name, self.url, self.field = name, url, field
+
+    def available(self): return bool(self.url)
+
+    def upload(self, data, filename, mime, room=None):
+        r = _multipart_post(self.url, {self.field: (filename, data, mime)})
+        if r.status_code == 200 and "http" in r.text: return r.text.strip()
+
+# --- 🧭 UPLOAD ROUTER (latency-aware + hedging) ---
+class UploadRouter:
+    def __init__(self, backends, hedge_ms=UPLOAD_HEDGE_MS):
+        self.backends = backends
+        self.hedge_ms = hedge_ms
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=8)
+
+    def ranked(self):
+        return sorted((b for b in self.backends if b.available()), key=lambda b: b.score())
+
+    def _attempt(self, backend, data, filename, mime, room):
+        t0 = time.perf_counter()
+        url = None
+        try: url = backend.upload(data.view if isinstance(data, EncodedImage) else data, filename, mime, room=room)
+        except Exception as e: safe_print(f"❌ Upload Error ({backend.name}): {e}")
+        finally:
+            if isinstance(data, EncodedImage): data.release()
+        backend.record((time.perf_counter() - t0) * 1000, bool(url))
+        return url
+
+    def upload(self, data, filename, mime, room=None):
+        """(url, backend_name). Best backend pehle; slow ho to hedge, fail ho to fallback.
+        data EncodedImage ho to har attempt apna retain() rakhta hai - jeetne ke baad bhi
+        hedged attempt chal raha ho to buffer tab tak pool me wapas nahi jayega."""
+        queue = self.ranked()
+        active = {}
+        while queue or active:
+            # Har round ek naya backend: pichla fail hua (fallback) ya hedge time tak chup raha (hedge)
+            if queue:
+                b = queue.pop(0)
+                if isinstance(data, EncodedImage): data.retain()
+                active[self.executor.submit(self._attempt, b, data, filename, mime, room)] = b
+            done, _ = concurrent.futures.wait(active, timeout=self.hedge_ms / 1000 if queue else None,
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+            for f in done:
+                b = active.pop(f)
+                if f.result(): return f.result(), b.name
+        return None, None
+
+    def stats(self):
+        return {b.name: dict(b.stats(), available=b.available()) for b in self.backends}
+
+CHATP_BACKEND = ChatpBackend()
+_ALL_BACKENDS = {"catbox": CatboxBackend(), "chatp": CHATP_BACKEND, "static": StaticBackend(),
+                 "local": FormBackend("local", os.environ.get("UPLOAD_LOCAL_URL", ""))}
+UPLOAD_ROUTER = UploadRouter([_ALL_BACKENDS[n] for n in UPLOAD_BACKENDS if n in _ALL_BACKENDS])
+
+def set_upload_identity(jid):
+    UPLOAD_JID["jid"] = jid
+
 # --- 🔥 THE ULTIMATE LIGHTWEIGHT UPLOADER 🔥 ---
-def upload_image(image):
-    url = None
-    buf = None
+def upload_bytes(data, prefix="bot", room=None):
+    """Already-encoded image (bytes ya EncodedImage) upload karo (cache hit pe upload skip)"""
+    raw = data.view if isinstance(data, EncodedImage) else data
+    key = content_key(raw)
+    url = cached_url(key)
+    if url: return url
     try:
-        buf = io.BytesIO()
-        
-        # 1. Convert to RGB (zaroori hai JPEG ke liye)
-        img_rgb = image.convert("RGB")
-        
-        # 2. Color Reduction (Quantize) - Size bohot kam kar dega
-        # Ye colors ko 256 tak limit kar dega
-        img_quantized = img_rgb.quantize(colors=256)
-        
-        # Quantize ke baad wapas RGB me convert karo taaki save ho sake
-        img_to_save = img_quantized.convert("RGB")
-
-        # 3. Save with Smart Quality & Progressive Scan
-        img_to_save.save(buf,
-                         format='JPEG',
-                         quality=75,       # 75% quality (Best balance)
-                         optimize=True,    # Faltu data hatao
-                         progressive=True) # Fast loading effect
-        
-        buf.seek(0)
-        files = {'reqtype':(None,'fileupload'), 'fileToUpload':(f'bot_{uuid.uuid4().hex}.jpg', buf, 'image/jpeg')}
-        
-        # Catbox fast hai, isliye wahi use karenge
-        r = requests.post('https://catbox.moe/user/api.php', files=files, headers={'Connection':'close'}, timeout=30)
-        
-        if r.status_code == 200 and "http" in r.text:
-            url = r.text.strip()
+        ext, mime = image_type(raw)
+        filename = f'{prefix}_{uuid.uuid4().hex}.{ext}'
+        t0 = time.perf_counter()
+        url, backend = UPLOAD_ROUTER.upload(data, filename, mime, room)
+        if url:
+            remember_url(key, url)
+            safe_print(f"🖼️ {filename} -> {backend} ({(time.perf_counter() - t0) * 1000:.0f}ms)")
         else:
-            safe_print(f"❌ Upload Fail (Catbox): {r.status_code}")
-
+            safe_print("❌ Upload Fail: all backends failed")
     except Exception as e:
         safe_print(f"❌ Internal Upload Error: {e}")
-    finally:
-        if buf: buf.close()
-        gc.collect()
-            
     return url
 
 # --- 🔐 PRIVATE IMAGE UPLOADER (PM ONLY) ---
-def upload_private_image(pil_image, bot_id, to_user):
-    from io import BytesIO
-
-    buf = None
+def upload_private_bytes(data, bot_id, to_user):
     try:
-        buf = BytesIO()
-        pil_image.save(buf, format="PNG")
-        buf.seek(0)
-
-        multipart_data = MultipartEncoder(
-            fields={
-                "file": ("pm.png", buf, "image/png"),
-                "jid": bot_id,
-                "is_private": "yes",
-                "to": to_user,
-                "device_id": uuid.uuid4().hex
-            }
-        )
-
-        r = requests.post(
-            "https://chatp.net/api/upload",
-            data=multipart_data,
-            headers={"Content-Type": multipart_data.content_type},
-            timeout=30
-        )
-
-        if r.status_code == 200:
-            return r.text.strip()
-
+        if isinstance(data, EncodedImage): data = data.view
+        ext, mime = image_type(data)
+        return CHATP_BACKEND.upload(data, f"pm.{ext}", mime, room=to_user, private=True, jid=bot_id)
     except Exception as e:
         safe_print(f"❌ Private Upload Error: {e}")
-
-    finally:
-        if buf:
-            buf.close()
-        gc.collect()
-
-    return None    
+    return None